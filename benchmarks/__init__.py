@@ -0,0 +1,22 @@
+import json
+import pathlib
+from typing import Iterable
+
+from tfl.infrastructure import airport
+
+AIRPORT_FIELDS = {
+    "country": "US", "latitude": 0, "longitude": 0, "reporting": True, "runways": [], "state": None,
+    "type": "small_airport",
+}
+
+
+def use_airports(directory: pathlib.Path, icaos: Iterable[str]) -> pathlib.Path:
+    """
+    Writes a bare airports.json with the given ICAO identifiers to a
+    directory and points the airport repository at it, so benchmarks never
+    read the airport database of a deployment.
+    """
+    path = directory / 'airports.json'
+    path.write_text(json.dumps({icao: dict(AIRPORT_FIELDS, icao=icao, name=icao) for icao in icaos if icao}))
+    airport.AIRPORTS_PATH = path
+    return path
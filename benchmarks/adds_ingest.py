@@ -0,0 +1,89 @@
+"""
+Compares the streaming and xmltodict ingest paths on a recorded ADDS cache file.
+
+Each mode runs in its own interpreter so the peak RSS figures do not bleed
+into each other.
+
+    python -m benchmarks.adds_ingest metar data/metars.cache.xml.gz
+    python -m benchmarks.adds_ingest taf data/tafs.cache.xml.gz
+"""
+import argparse
+import asyncio
+import json
+import resource
+import subprocess
+import sys
+import time
+from gzip import GzipFile
+
+from tfl.application_services.metar import MetarService
+from tfl.application_services.taf import TafService
+from tfl.infrastructure.http import HTTPClient
+from tfl.infrastructure.metar import MetarRepository
+from tfl.infrastructure.taf import TAFRepository
+
+MODES = ('streaming', 'xmltodict')
+
+
+def time_first_batch(service) -> dict:
+    """Records when the first batch of records has been parsed."""
+    timing = {'first': None}
+    parse_batch = service._parse_batch
+
+    async def timed(records):
+        result = await parse_batch(records)
+        if timing['first'] is None:
+            timing['first'] = time.perf_counter()
+        return result
+
+    service._parse_batch = timed
+    return timing
+
+
+async def run(kind: str, mode: str, path: str) -> dict:
+    streaming = mode == 'streaming'
+    if kind == 'metar':
+        repo = MetarRepository()
+        service = MetarService(repo, HTTPClient(), streaming=streaming)
+        parse = service._stream_metar_gzip if streaming else service._parse_metar_gzip
+    else:
+        repo = TAFRepository()
+        service = TafService(repo, HTTPClient(), streaming=streaming)
+        parse = service._stream_taf_gzip if streaming else service._parse_taf_gzip
+    timing = time_first_batch(service)
+    start = time.perf_counter()
+    with GzipFile(path) as gz:
+        await parse(gz)
+    end = time.perf_counter()
+    return {
+        'mode': mode,
+        'records': len(repo.repo),
+        'seconds': end - start,
+        'first_record_seconds': timing['first'] - start,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('kind', choices=('metar', 'taf'))
+    parser.add_argument('path')
+    parser.add_argument('--mode', choices=MODES, help='Run a single mode in this process')
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(asyncio.run(run(args.kind, args.mode, args.path))))
+        return
+
+    print(f"{'mode':<10} {'records':>8} {'total s':>9} {'first s':>9} {'peak RSS MB':>12}")
+    for mode in MODES:
+        out = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.adds_ingest', args.kind, args.path, '--mode', mode],
+            check=True, capture_output=True, text=True
+        ).stdout
+        r = json.loads(out.splitlines()[-1])
+        print(f"{r['mode']:<10} {r['records']:>8} {r['seconds']:>9.3f} {r['first_record_seconds']:>9.3f} {r['peak_rss_mb']:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Parses every timestamp of a recorded ADDS cache file with dateutil and with
+parse_adds_time, checks they agree and reports timestamps/s for both.
+
+    python -m benchmarks.adds_time data/tafs.cache.xml.gz --repeat 5
+"""
+import argparse
+import time
+from gzip import GzipFile
+from xml.etree import ElementTree as ET
+
+from dateutil.parser import parse
+
+from tfl.domain.services import weather
+
+TIME_FIELDS = {
+    'observation_time', 'issue_time', 'bulletin_time', 'valid_time_from', 'valid_time_to',
+    'fcst_time_from', 'fcst_time_to', 'time_becoming',
+}
+
+
+def load_timestamps(path: str) -> list:
+    with GzipFile(path) as gz:
+        return [elem.text for _, elem in ET.iterparse(gz) if elem.tag in TIME_FIELDS and elem.text]
+
+
+def throughput(func, values: list, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for value in values:
+            func(value)
+    return len(values) * repeat / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('path')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    values = load_timestamps(args.path)
+    mismatches = [v for v in values if weather.parse_adds_time(v) != parse(v)]
+    print(f"{len(values)} timestamps, {len(mismatches)} differ from dateutil, "
+          f"{weather.adds_time_fallbacks} fell back to dateutil")
+
+    slow = throughput(parse, values, args.repeat)
+    fast = throughput(weather.parse_adds_time, values, args.repeat)
+    print(f"dateutil         {slow:12,.0f} timestamps/s")
+    print(f"parse_adds_time  {fast:12,.0f} timestamps/s  ({fast / slow:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
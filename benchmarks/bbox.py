@@ -0,0 +1,50 @@
+"""
+Bytes and time to pull every METAR's flight category for a map: paging
+through /api/v2/metars 50 at a time against one /api/v2/metars/bbox request.
+
+    python -m benchmarks.bbox data/metars.cache.xml.gz
+"""
+import argparse
+import asyncio
+import time
+from gzip import GzipFile
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from tfl.api_v2.metars import router
+from tfl.instances import metar_repository, metar_service
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('path')
+    args = parser.parse_args()
+
+    with GzipFile(args.path) as gz:
+        asyncio.run(metar_service._stream_metar_gzip(gz))
+    app = FastAPI()
+    app.include_router(router, prefix='/api/v2')
+    client = TestClient(app)
+    total = len(metar_repository.repo)
+
+    start = time.perf_counter()
+    paged, requests = 0, 0
+    for offset in range(0, total, 50):
+        paged += int(client.get(f'/api/v2/metars?offset={offset}&limit=50').headers['content-length'])
+        requests += 1
+    paged_time = time.perf_counter() - start
+    print(f"paged   {requests:>4} requests  {paged / 1024:10.1f} KB  {paged_time * 1000:8.1f} ms")
+
+    url = '/api/v2/metars/bbox?south=-90&west=-180&north=90&east=180'
+    for encoding in ('identity', 'gzip'):
+        start = time.perf_counter()
+        response = client.get(url, headers={'Accept-Encoding': encoding})
+        elapsed = time.perf_counter() - start
+        # The body is already decompressed, the header has the bytes sent
+        sent = int(response.headers['content-length'])
+        print(f"bbox    {1:>4} request   {sent / 1024:10.1f} KB  {elapsed * 1000:8.1f} ms  ({encoding})")
+
+
+if __name__ == '__main__':
+    main()
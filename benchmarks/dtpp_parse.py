@@ -0,0 +1,75 @@
+"""
+Time and peak RSS of loading the plates of a d-tpp metafile: the streaming
+iterparse loader against the previous xmltodict one. Each loader runs in a
+fresh interpreter so their peaks do not mix.
+
+    python -m benchmarks.dtpp_parse data/d-tpp_Metafile.xml
+"""
+import argparse
+import resource
+import subprocess
+import sys
+import time
+
+
+def enforce_list(item):
+    if not isinstance(item, list):
+        return [item]
+    return item
+
+
+def parse_with_xmltodict(path):
+    """
+    The loader before the streaming parser: the whole file is read into a
+    dict and walked.
+    """
+    from tfl.domain.facilities import FAAPlate
+    from tfl.domain.services.dtpp import load_raw_plate_data
+
+    container = {}
+    d = load_raw_plate_data(path)
+    cycle = d['digital_tpp'].get('@Cycle')
+    if cycle is None:
+        cycle = d['digital_tpp']['@cycle']
+    for state_obj in enforce_list(d['digital_tpp']['state_code']):
+        for city in enforce_list(state_obj['city_name']):
+            for o in enforce_list(city['airport_name']):
+                icao = o['@icao_ident'].upper()
+                container.setdefault(icao, [])
+                for r in enforce_list(o['record']):
+                    if not isinstance(r, dict):
+                        continue
+                    container[icao].append(FAAPlate(
+                        tpp_cycle=cycle, icao=icao, code=r['chart_code'], name=r['chart_name'], pdf_name=r['pdf_name']
+                    ))
+    return container
+
+
+def run(loader: str, path: str):
+    from tfl.infrastructure.airport import parse_raw_plate_data
+
+    parse = parse_raw_plate_data if loader == 'streaming' else parse_with_xmltodict
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    plates = parse(path)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    count = sum(len(p) for p in plates.values())
+    print(f"{loader:>10}: {elapsed:.2f}s, peak RSS {peak / 1024:.0f} MiB (+{(peak - before) / 1024:.0f} MiB), "
+          f"{count} plates of {len(plates)} airports")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('path')
+    parser.add_argument('--loader', choices=['streaming', 'xmltodict'])
+    args = parser.parse_args()
+    if args.loader:
+        run(args.loader, args.path)
+        return
+    for loader in ('xmltodict', 'streaming'):
+        subprocess.run([sys.executable, '-m', 'benchmarks.dtpp_parse', args.path, '--loader', loader], check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+How long DTPP polling holds the event loop. The given metafile is saved as
+the current cycle, valid from yesterday for four weeks. The cache is cleaned
+as at startup and then polled twice with the airport repository loading the
+cycle, the second time as the polling task would after its sleep. A probe
+task measures how late the loop ran it during each step, which includes the
+time threads parsing the metafile hold the GIL.
+
+    python -m benchmarks.dtpp_poll data/d-tpp_Metafile.xml
+"""
+import argparse
+import asyncio
+import pathlib
+import re
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks import use_airports
+from tfl.application_services.dtpp import DTPPService
+from tfl.application_services.loop_blocking import LoopBlocking
+from tfl.infrastructure.airport import AirportRepository, load_plate_data
+from tfl.infrastructure.http import HTTPClient
+
+
+async def probe(interval: float, lags: list):
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def measure(service: DTPPService, label: str, coro):
+    lags = []
+    task = asyncio.create_task(probe(0.001, lags))
+    blocking = LoopBlocking()
+    parsed = service.headers.parsed
+    start = time.perf_counter()
+    await blocking.measure(coro)
+    elapsed = time.perf_counter() - start
+    task.cancel()
+    print(f"{label}: {elapsed:.2f}s, loop blocked {blocking}, worst probe lag {max(lags, default=0) * 1e3:.1f}ms, "
+          f"{service.headers.parsed - parsed} headers parsed")
+
+
+async def run(directory: pathlib.Path):
+    repo = AirportRepository()
+    http = HTTPClient()
+    service = DTPPService(directory, http)
+
+    async def on_change(header, version):
+        await repo.load_dtpp(version.file_path)
+
+    service.register_callback(on_change)
+    await measure(service, "clean cache", service.clean_cache())
+    await measure(service, " first poll", service._poll_and_notify())
+    await measure(service, "  next poll", service._poll_and_notify())
+    await http.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('path', type=pathlib.Path)
+    args = parser.parse_args()
+
+    now = datetime.now(timezone.utc)
+    valid_from, valid_to = now - timedelta(days=1), now + timedelta(days=27)
+    text = args.path.read_text(encoding='utf-8')
+    text = re.sub(r'from_edate="[^"]*"', f'from_edate="{valid_from:%H%M}Z  {valid_from:%m/%d/%y}"', text, count=1)
+    text = re.sub(r'to_edate="[^"]*"', f'to_edate="{valid_to:%H%M}Z  {valid_to:%m/%d/%y}"', text, count=1)
+    with tempfile.TemporaryDirectory() as directory:
+        directory = pathlib.Path(directory)
+        use_airports(directory, load_plate_data(args.path))
+        (directory / f"DTPP_{datetime.utcnow():%y%m}.xml").write_text(text, encoding='utf-8')
+        asyncio.run(run(directory))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Event loop time of a DTPP cycle switchover: loading the next cycle's
+metafile at the switchover against loading one staged ahead of it. The next
+cycle is the given metafile with its cycle number bumped.
+
+    python -m benchmarks.dtpp_switch data/d-tpp_Metafile.xml
+"""
+import argparse
+import asyncio
+import pathlib
+import re
+import tempfile
+import time
+
+from benchmarks import use_airports
+from tfl.infrastructure.airport import AirportRepository, load_plate_data
+
+
+async def switch(current: pathlib.Path, upcoming: pathlib.Path, staged: bool) -> float:
+    repo = AirportRepository()
+    await repo.load_dtpp(current)
+    if staged:
+        await repo.stage_dtpp(upcoming)
+    start = time.perf_counter()
+    await repo.load_dtpp(upcoming)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('path', type=pathlib.Path)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        use_airports(pathlib.Path(directory), load_plate_data(args.path))
+        text = args.path.read_text(encoding='utf-8')
+        cycle = int(re.search(r'[Cc]ycle="(\d+)"', text).group(1))
+        upcoming = pathlib.Path(directory) / f"DTPP_{cycle + 1}.xml"
+        upcoming.write_text(re.sub(r'([Cc]ycle=)"\d+"', rf'\1"{cycle + 1}"', text, count=1), encoding='utf-8')
+        for staged in (False, True):
+            elapsed = asyncio.run(switch(args.path, upcoming, staged))
+            print(f"{'staged' if staged else 'at switchover'}: {elapsed:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Memory of 48 hours of METAR history: the encoded per-station store against
+keeping the parsed Metar models. Every station of the cache file is given a
+report every 30 minutes.
+
+    python -m benchmarks.history data/metars.cache.xml.gz
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from gzip import GzipFile
+
+from tfl.application_services.adds import iter_records
+from tfl.application_services.metar import parse_metar
+from tfl.infrastructure.history import WeatherHistory
+from tfl.infrastructure.metar import decode_metar_record, encode_metar_record
+
+HOURS = 48
+PER_HOUR = 2
+
+
+def cycles(records):
+    now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    for i in range(HOURS * PER_HOUR):
+        stamp = now - timedelta(minutes=(HOURS * PER_HOUR - 1 - i) * 60 // PER_HOUR)
+        observation_time = stamp.strftime('%Y-%m-%dT%H:%M:%SZ')
+        day_time = stamp.strftime('%d%H%MZ')
+        yield [
+            {**m, 'observation_time': observation_time, 'raw_text': f"{m['station_id']} {day_time}{m['raw_text'][len(m['station_id']) + 8:]}"}
+            for m in records
+        ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('path')
+    parser.add_argument('--sample', type=int, default=200, help="Stations parsed to estimate the model memory")
+    args = parser.parse_args()
+
+    with GzipFile(args.path) as gz:
+        records = list(iter_records(gz, 'METAR'))
+    all_cycles = list(cycles(records))
+    reports = len(records) * len(all_cycles)
+
+    history = WeatherHistory('metars', encode_metar_record, decode_metar_record, 'observation_time')
+    tracemalloc.start()
+    start = time.perf_counter()
+    for cycle in all_cycles:
+        asyncio.run(history.append(cycle))
+    elapsed = time.perf_counter() - start
+    stored, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    models = [parse_metar(m) for cycle in all_cycles for m in cycle[:args.sample]]
+    sampled, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    estimated = sampled * len(records) / args.sample
+
+    station = records[0]['station_id']
+    start = time.perf_counter()
+    series = history.series(station)
+    series_time = time.perf_counter() - start
+
+    print(f"{reports} reports, {len(history)} stored in {elapsed:.2f}s")
+    print(f"history:      {stored / 2 ** 20:8.1f} MiB ({stored / reports:.0f} bytes per report)")
+    print(f"Metar models: {estimated / 2 ** 20:8.1f} MiB estimated from {len(models)} parsed reports")
+    print(f"series of {station}: {len(series)} records in {series_time * 1000:.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Per-fetch latency of a fresh aiohttp.ClientSession per request against the
+shared, pooled HTTPClient. A local aiohttp server stands in for the upstream
+so the numbers only reflect connection setup and reuse.
+
+    python -m benchmarks.http_pool --requests 500 --size 65536
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from tfl.infrastructure.http import HTTPClient
+
+
+async def fresh_session(url: str) -> bytes:
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url) as response:
+            return await response.read()
+
+
+def shared_session(http: HTTPClient):
+    async def fetch(url: str) -> bytes:
+        async with http.session.get(url) as response:
+            return await response.read()
+    return fetch
+
+
+async def measure(fetch, url: str, requests: int) -> list:
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await fetch(url)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(name: str, timings: list):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{name:<8} mean {statistics.mean(timings):7.3f} ms  p50 {statistics.median(timings):7.3f} ms  p95 {p95:7.3f} ms")
+
+
+async def run(requests: int, size: int):
+    payload = b'x' * size
+
+    async def handler(request):
+        return web.Response(body=payload)
+
+    app = web.Application()
+    app.router.add_get('/metars.cache.xml.gz', handler)
+    async with TestServer(app) as server:
+        url = str(server.make_url('/metars.cache.xml.gz'))
+        http = HTTPClient()
+        report('fresh', await measure(fresh_session, url, requests))
+        report('shared', await measure(shared_session(http), url, requests))
+        await http.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--size', type=int, default=64 * 1024, help='Response body size in bytes')
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.size))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Request latency while a METAR or TAF ingest is running.
+
+A reader task issues the same repository queries the /api/v2 endpoints do
+every few milliseconds while a full ingest of a recorded cache file runs, once
+parsing inline on the event loop and once in a ProcessPoolExecutor.
+
+    python -m benchmarks.ingest_latency metar data/metars.cache.xml.gz --workers 4
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from gzip import GzipFile
+
+from tfl.application_services.metar import MetarService
+from tfl.application_services.taf import TafService
+from tfl.infrastructure.http import HTTPClient
+from tfl.infrastructure.metar import MetarRepository
+from tfl.infrastructure.taf import TAFRepository
+
+
+async def reader(repo, interval: float, timings: list, done: asyncio.Event):
+    while not done.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        await repo.all(0, 50)
+        # Anything past the requested interval is time the loop was blocked
+        timings.append((time.perf_counter() - start - interval) * 1000)
+
+
+async def run(kind: str, path: str, executor, interval: float) -> tuple:
+    if kind == 'metar':
+        repo = MetarRepository()
+        service = MetarService(repo, HTTPClient(), executor=executor)
+        ingest = service._stream_metar_gzip
+    else:
+        repo = TAFRepository()
+        service = TafService(repo, HTTPClient(), executor=executor)
+        ingest = service._stream_taf_gzip
+    timings = []
+    done = asyncio.Event()
+    task = asyncio.create_task(reader(repo, interval, timings, done))
+    start = time.perf_counter()
+    with GzipFile(path) as gz:
+        await ingest(gz)
+    elapsed = time.perf_counter() - start
+    done.set()
+    await task
+    return elapsed, timings
+
+
+def report(name: str, elapsed: float, timings: list):
+    timings = sorted(timings)
+    p99 = timings[max(int(len(timings) * 0.99) - 1, 0)]
+    print(
+        f"{name:<8} ingest {elapsed:6.2f}s  requests {len(timings):>5}  "
+        f"p50 {statistics.median(timings):8.2f} ms  p99 {p99:8.2f} ms  max {timings[-1]:8.2f} ms"
+    )
+
+
+async def main_async(args):
+    report('inline', *await run(args.kind, args.path, None, args.interval))
+    with ProcessPoolExecutor(args.workers) as executor:
+        report('process', *await run(args.kind, args.path, executor, args.interval))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('kind', choices=('metar', 'taf'))
+    parser.add_argument('path')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--interval', type=float, default=0.005, help='Seconds between requests')
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
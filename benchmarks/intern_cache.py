@@ -0,0 +1,69 @@
+"""
+Full cache file ingest with the WeatherFactory interning caches on and off.
+
+Each run parses every record of a recorded cache file inline, so the difference
+is only the value object construction. The hit rate of each cache is printed
+for the interned run.
+
+    python -m benchmarks.intern_cache metar data/metars.cache.xml.gz --repeat 3
+"""
+import argparse
+import asyncio
+import time
+from gzip import GzipFile
+
+from tfl.application_services.metar import MetarService
+from tfl.application_services.taf import TafService
+from tfl.domain.factories.weather import WeatherFactory
+from tfl.infrastructure.http import HTTPClient
+from tfl.infrastructure.metar import MetarRepository
+from tfl.infrastructure.taf import TAFRepository
+
+
+async def ingest(kind: str, path: str) -> dict:
+    if kind == 'metar':
+        repo = MetarRepository()
+        service = MetarService(repo, HTTPClient())
+        parse = service._stream_metar_gzip
+    else:
+        repo = TAFRepository()
+        service = TafService(repo, HTTPClient())
+        parse = service._stream_taf_gzip
+    with GzipFile(path) as gz:
+        await parse(gz)
+    return repo.snapshot.items
+
+
+def run(kind: str, path: str, intern: bool, repeat: int) -> tuple:
+    WeatherFactory.intern = intern
+    WeatherFactory.cache_clear()
+    timings = []
+    items = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        items = asyncio.run(ingest(kind, path))
+        timings.append(time.perf_counter() - start)
+    return min(timings), items
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('kind', choices=('metar', 'taf'))
+    parser.add_argument('path')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    off, plain = run(args.kind, args.path, False, args.repeat)
+    on, interned = run(args.kind, args.path, True, args.repeat)
+    same = {k: v.dict() for k, v in plain.items()} == {k: v.dict() for k, v in interned.items()}
+    print(f"{len(interned)} records, output identical: {same}")
+    print(f"intern off  {off:6.2f}s")
+    print(f"intern on   {on:6.2f}s  ({off / on:.2f}x)")
+    for name, info in WeatherFactory.cache_info().items():
+        lookups = info.hits + info.misses
+        rate = info.hits / lookups if lookups else 0
+        print(f"  {name:<14} size {info.currsize:>5}  hits {info.hits:>7}  misses {info.misses:>6}  hit rate {rate:6.1%}")
+
+
+if __name__ == '__main__':
+    main()
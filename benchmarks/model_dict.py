@@ -0,0 +1,89 @@
+"""
+Serialises every METAR of a recorded cache file with the previous TFLModel,
+which walked dir(cls) and wrote the properties into __dict__ on every dict()
+call, and with the current one, and reports objects/s for both.
+
+    python -m benchmarks.model_dict data/metars.cache.xml.gz --repeat 3
+"""
+import argparse
+import asyncio
+import time
+from gzip import GzipFile
+
+from pydantic import BaseModel
+
+from tfl.application_services.metar import MetarService
+from tfl.domain.core import TFLModel
+from tfl.infrastructure.http import HTTPClient
+from tfl.infrastructure.metar import MetarRepository
+
+
+def legacy_get_properties(cls):
+    return [
+        prop for prop in dir(cls)
+        if isinstance(getattr(cls, prop), property) and prop not in ("__values__", "fields")
+    ]
+
+
+def legacy_dict(self, *args, **kwargs):
+    self.__dict__.update({prop: getattr(self, prop) for prop in self.get_properties()})
+    return BaseModel.dict(self, *args, **kwargs)
+
+
+class legacy_model:
+    """Swaps the previous TFLModel serialisation in for the duration of the block."""
+
+    def __enter__(self):
+        self.saved = TFLModel.__dict__['get_properties'], TFLModel.__dict__['_iter']
+        TFLModel.get_properties = classmethod(legacy_get_properties)
+        TFLModel.dict = legacy_dict
+        TFLModel._iter = BaseModel._iter
+
+    def __exit__(self, *exc):
+        TFLModel.get_properties, TFLModel._iter = self.saved
+        del TFLModel.dict
+
+
+async def load(path: str) -> list:
+    repo = MetarRepository()
+    with GzipFile(path) as gz:
+        await MetarService(repo, HTTPClient())._stream_metar_gzip(gz)
+    return list(repo.snapshot.items.values())
+
+
+def count_models(value) -> int:
+    if isinstance(value, BaseModel):
+        return 1 + sum(count_models(v) for _, v in value)
+    if isinstance(value, (list, tuple)):
+        return sum(count_models(v) for v in value)
+    return 0
+
+
+def throughput(metars: list, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for metar in metars:
+            metar.dict()
+    return repeat / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('path')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    metars = asyncio.run(load(args.path))
+    objects = sum(count_models(m) for m in metars)
+    current = [m.dict() for m in metars]
+    new = throughput(metars, args.repeat)
+    with legacy_model():
+        legacy = [m.dict() for m in metars]
+        old = throughput(metars, args.repeat)
+    print(f"{len(metars)} METARs, {objects} model objects, identical output: {current == legacy}")
+    print(f"previous TFLModel  {old * objects:12,.0f} objects/s")
+    print(f"current TFLModel   {new * objects:12,.0f} objects/s  ({new / old:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Loading the plates of a DTPP metafile cold, parsing the XML and writing the
+binary index, against warm, reading the index written by the cold load. Each
+load runs in a fresh interpreter and reports its time, peak RSS and the
+resident memory still held once the plates are loaded (Linux only).
+
+    python -m benchmarks.plate_index data/d-tpp_Metafile.xml
+"""
+import argparse
+import gc
+import pathlib
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def resident() -> int:
+    with open('/proc/self/statm') as fh:
+        return int(fh.read().split()[1]) * resource.getpagesize()
+
+
+def run(path: pathlib.Path, mode: str):
+    from tfl.infrastructure.airport import load_plate_data
+
+    gc.collect()
+    before, before_peak = resident(), resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    plates = load_plate_data(path)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    retained = resident() - before
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before_peak
+    count = sum(len(p) for p in plates.values())
+    print(f"{mode}: {elapsed:.2f}s, peak RSS +{peak / 1024:.0f} MiB, resident after load +{retained / 2 ** 20:.0f} MiB, "
+          f"{count} plates of {len(plates)} airports")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('path', type=pathlib.Path)
+    parser.add_argument('--mode', choices=['cold', 'warm'])
+    args = parser.parse_args()
+    if args.mode:
+        run(args.path, args.mode)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = pathlib.Path(directory) / args.path.name
+        shutil.copy2(args.path, path)
+        for mode in ('cold', 'warm'):
+            subprocess.run([sys.executable, '-m', 'benchmarks.plate_index', str(path), '--mode', mode], check=True)
+        index = path.with_suffix('.idx')
+        print(f"metafile {path.stat().st_size / 2 ** 20:.1f} MiB, index {index.stat().st_size / 2 ** 20:.1f} MiB")
+
+
+if __name__ == '__main__':
+    main()
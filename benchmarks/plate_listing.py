@@ -0,0 +1,80 @@
+"""
+The /api/v1/plates listing over every airport of a d-tpp metafile: slicing
+pages out of the catalog built when the plates load, against collecting all
+plates of all airports on each request as before. A sync job pages through
+every plate and fetches the ICAO identifiers.
+
+    python -m benchmarks.plate_listing data/d-tpp_Metafile.xml
+"""
+import argparse
+import asyncio
+import pathlib
+import tempfile
+import time
+
+from benchmarks import use_airports
+from tfl.domain.services.plate_catalog import PlateCatalog
+from tfl.infrastructure.airport import AirportRepository, load_plate_data
+
+PAGE = 500
+
+
+def previous_page(airports, icao_only=False, limit=20, offset=0):
+    if icao_only:
+        icaos = []
+        for a in airports:
+            for plate in a.plates:
+                if plate.icao not in icaos:
+                    icaos.append(plate.icao)
+        return icaos
+    plates = [plate for a in airports for plate in a.plates]
+    return plates[offset:limit + offset]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('path', type=pathlib.Path)
+    args = parser.parse_args()
+
+    plates = load_plate_data(args.path)
+    with tempfile.TemporaryDirectory() as directory:
+        use_airports(pathlib.Path(directory), plates)
+        repo = AirportRepository()
+        asyncio.run(repo.load_dtpp(args.path))
+    airports = list(repo.repo.values())
+    catalog = repo.plate_catalog
+
+    start = time.perf_counter()
+    PlateCatalog([(a.icao, a.plates) for a in airports], catalog.cycle)
+    print(f"catalog of {len(catalog.plates)} plates at {len(catalog.icaos)} airports built in "
+          f"{time.perf_counter() - start:.3f}s")
+
+    start = time.perf_counter()
+    previous_page(airports)
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    offset = 0
+    while previous_page(airports, limit=PAGE, offset=offset):
+        offset += PAGE
+    pages = time.perf_counter() - start
+    start = time.perf_counter()
+    previous_page(airports, icao_only=True)
+    icaos = time.perf_counter() - start
+    print(f"  per request: first page {first * 1e3:.2f}ms, all pages of {PAGE} {pages * 1e3:.2f}ms, icao_only {icaos * 1e3:.2f}ms")
+
+    start = time.perf_counter()
+    catalog.plate_page()
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    position = 0
+    while position is not None:
+        position = catalog.plate_page(position, limit=PAGE).next
+    pages = time.perf_counter() - start
+    start = time.perf_counter()
+    catalog.icao_page()
+    icaos = time.perf_counter() - start
+    print(f"      catalog: first page {first * 1e3:.2f}ms, all pages of {PAGE} {pages * 1e3:.2f}ms, icao_only {icaos * 1e3:.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
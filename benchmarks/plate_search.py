@@ -0,0 +1,68 @@
+"""
+Plate name queries against every airport of a d-tpp metafile: the search
+index built when the plates load against the previous approaches, rescoring
+every plate name with fuzzywuzzy's partial_ratio as `get_best_plates` did,
+and the case-insensitive substring scan of the plate endpoints.
+
+    python -m benchmarks.plate_search data/d-tpp_Metafile.xml
+"""
+import argparse
+import pathlib
+import re
+import time
+
+from fuzzywuzzy import process, fuzz
+
+from tfl.domain.services.plate_search import build_plate_search
+from tfl.infrastructure.airport import load_plate_data
+
+QUERIES = ["ILS 27", "RNAV Z rwy 9L", "rnav gps 18", "VOR 36", "takeoff minimums", "airport diagram", "hot spot"]
+
+
+def rescore(query, names):
+    """
+    The matching before the index: every name sanitised and scored.
+    """
+    pattern = r"\s(runway|rwy|or)\s"
+    mapping = {re.sub(pattern, ' ', name): name for name in names}
+    ratios = process.extract(re.sub(pattern, ' ', query), tuple(mapping), scorer=fuzz.partial_ratio)
+    return [mapping[name] for name, ratio in ratios if ratios[0][1] - ratio < 7]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('path', type=pathlib.Path)
+    args = parser.parse_args()
+
+    plates = load_plate_data(args.path)
+    names = {icao: [p.name for p in airport_plates] for icao, airport_plates in plates.items() if airport_plates}
+    count = sum(len(n) for n in names.values())
+
+    start = time.perf_counter()
+    search = build_plate_search(plates)
+    print(f"index of {count} plates at {len(names)} airports built in {time.perf_counter() - start:.2f}s")
+
+    for query in QUERIES:
+        lowered = query.lower()
+        timings = {}
+        start = time.perf_counter()
+        hits = sum(len(search[icao].search(query)) for icao in names)
+        timings['index'] = time.perf_counter() - start
+        start = time.perf_counter()
+        for icao in names:
+            search[icao].best(query)
+        timings['index best'] = time.perf_counter() - start
+        start = time.perf_counter()
+        for airport_names in names.values():
+            rescore(query, airport_names)
+        timings['partial_ratio'] = time.perf_counter() - start
+        start = time.perf_counter()
+        substring = sum(1 for airport_names in names.values() for name in airport_names if lowered in name.lower())
+        timings['substring'] = time.perf_counter() - start
+        print(f"{query!r:>20}: " + ", ".join(
+            f"{label} {elapsed * 1e6 / len(names):.1f}us" for label, elapsed in timings.items()
+        ) + f" per airport; {hits} index hits, {substring} substring hits")
+
+
+if __name__ == '__main__':
+    main()
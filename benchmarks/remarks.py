@@ -0,0 +1,53 @@
+"""
+Checks the single pass remarks engine against the pipeline for every RMK
+section in a recorded METAR cache file and reports throughput of both.
+
+    python -m benchmarks.remarks data/metars.cache.xml.gz --repeat 5
+"""
+import argparse
+import time
+from gzip import GzipFile
+
+from tfl.application_services.adds import iter_records
+from tfl.application_services.metar import REMARKS_PATTERN
+from tfl.domain.remarks import parse_remarks, pipeline_remarks
+
+
+def load_remarks(path: str) -> list:
+    remarks = []
+    with GzipFile(path) as gz:
+        for m in iter_records(gz, 'METAR'):
+            match = REMARKS_PATTERN.search(m['raw_text'])
+            if match is not None:
+                remarks.append(match.groups()[0])
+    return remarks
+
+
+def throughput(func, remarks: list, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in remarks:
+            func(text)
+    return len(remarks) * repeat / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('path')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    remarks = load_remarks(args.path)
+    mismatches = [text for text in remarks if parse_remarks(text) != pipeline_remarks(text)]
+    print(f"{len(remarks)} remarks, {len(mismatches)} differ from the pipeline")
+    for text in mismatches[:10]:
+        print(f"  {text}")
+
+    pipeline = throughput(pipeline_remarks, remarks, args.repeat)
+    single_pass = throughput(parse_remarks, remarks, args.repeat)
+    print(f"pipeline     {pipeline:12,.0f} remarks/s")
+    print(f"single pass  {single_pass:12,.0f} remarks/s  ({single_pass / pipeline:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
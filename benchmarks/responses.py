@@ -0,0 +1,71 @@
+"""
+Per-station response cost with and without the pre-rendered ResponseCache.
+
+Ingests a recorded cache file, then serves every station the way a route with
+response_model does on each request and from the cache, checking the bodies
+are identical.
+
+    python -m benchmarks.responses metar data/metars.cache.xml.gz
+"""
+import argparse
+import asyncio
+import time
+from gzip import GzipFile
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+
+from tfl.application_services.metar import MetarService
+from tfl.application_services.responses import ResponseCache, response_field
+from tfl.application_services.taf import TafService
+from tfl.domain.weather import Metar, TAF
+from tfl.infrastructure.http import HTTPClient
+from tfl.infrastructure.metar import MetarRepository
+from tfl.infrastructure.taf import TAFRepository
+
+
+async def run(kind: str, path: str):
+    if kind == 'metar':
+        repo = MetarRepository()
+        responses = ResponseCache(Metar)
+        service = MetarService(repo, HTTPClient(), responses=responses)
+        ingest = service._stream_metar_gzip
+    else:
+        repo = TAFRepository()
+        responses = ResponseCache(TAF)
+        service = TafService(repo, HTTPClient(), responses=responses)
+        ingest = service._stream_taf_gzip
+    start = time.perf_counter()
+    with GzipFile(path) as gz:
+        await ingest(gz)
+    print(f"ingest including render {time.perf_counter() - start:6.2f}s")
+
+    items = list(repo.snapshot.items.values())
+    field = response_field(responses.model)
+
+    start = time.perf_counter()
+    rendered = []
+    for item in items:
+        content = await serialize_response(field=field, response_content=item)
+        rendered.append(JSONResponse(content=content).body)
+    model_path = (time.perf_counter() - start) / len(items)
+
+    start = time.perf_counter()
+    cached = [responses.response(item).body for item in items]
+    cache_path = (time.perf_counter() - start) / len(items)
+
+    print(f"{len(items)} stations, identical bodies: {rendered == cached}")
+    print(f"response_model  {model_path * 1e6:10.1f} us/request")
+    print(f"ResponseCache   {cache_path * 1e6:10.1f} us/request  ({model_path / cache_path:.0f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('kind', choices=('metar', 'taf'))
+    parser.add_argument('path')
+    args = parser.parse_args()
+    asyncio.run(run(args.kind, args.path))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Request latency of the sorted METAR and TAF endpoints.
+
+Loads recorded cache files into the application's repositories and requests
+each sorted endpoint through the ASGI app. For reference, the cost of sorting
+the whole repository per request, as the endpoints did before the snapshot
+indexes, is measured at the repository level.
+
+    python -m benchmarks.sorted_queries data/metars.cache.xml.gz data/tafs.cache.xml.gz
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from gzip import GzipFile
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from tfl.api_v1.weather import router as v1_router
+from tfl.api_v2.metars import router as metars_router
+from tfl.api_v2.tafs import router as tafs_router
+from tfl.exception_handlers import init_exception_handlers
+from tfl.infrastructure.metar import METAR_ORDERS
+from tfl.infrastructure.taf import TAF_ORDERS
+from tfl.instances import metar_repository, metar_service, taf_repository, taf_service
+
+ENDPOINTS = [
+    '/api/v2/metars/longest',
+    '/api/v2/metars?sort=longest&offset=100&limit=50',
+    '/api/v2/metars?sort=newest',
+    '/api/v2/metars?sort=flight_rule',
+    '/api/v1/metar?longest=10',
+    '/api/v2/tafs/longest',
+    '/api/v2/tafs?sort=newest',
+]
+
+
+async def load(metar_path: str, taf_path: str):
+    with GzipFile(metar_path) as gz:
+        await metar_service._stream_metar_gzip(gz)
+    with GzipFile(taf_path) as gz:
+        await taf_service._stream_taf_gzip(gz)
+
+
+def timed(func, repeat: int) -> list:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('metars')
+    parser.add_argument('tafs')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    asyncio.run(load(args.metars, args.tafs))
+    app = FastAPI()
+    app.include_router(v1_router, prefix='/api/v1')
+    app.include_router(metars_router, prefix='/api/v2')
+    app.include_router(tafs_router, prefix='/api/v2')
+    init_exception_handlers(app)
+    client = TestClient(app)
+
+    print(f"{len(metar_repository.repo)} METARs, {len(taf_repository.repo)} TAFs")
+    for path in ENDPOINTS:
+        timings = timed(lambda: client.get(path).raise_for_status(), args.repeat)
+        p99 = timings[max(int(len(timings) * 0.99) - 1, 0)]
+        print(f"{path:<50} p50 {statistics.median(timings):7.2f} ms  p99 {p99:7.2f} ms")
+
+    print("per request sort the indexes replace")
+    loop = asyncio.new_event_loop()
+    for name, repo, orders in (('metar', metar_repository, METAR_ORDERS), ('taf', taf_repository, TAF_ORDERS)):
+        for order, sorting in orders.items():
+            full = timed(lambda: loop.run_until_complete(repo.all(sorting=sorting)), 20)
+            indexed = timed(lambda: loop.run_until_complete(repo.all(sorting=order)), 20)
+            print(f"{name:<5} {order.value:<12} full sort {statistics.median(full):7.3f} ms  "
+                  f"index {statistics.median(indexed):7.3f} ms")
+    loop.close()
+
+
+if __name__ == '__main__':
+    main()
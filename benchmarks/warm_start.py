@@ -0,0 +1,71 @@
+"""
+Time from process start to the first successful /api/v2/metars/{icao}/latest
+response, cold against restored from a saved snapshot. Each start runs in a
+fresh interpreter. The cold start parses the cache file given on the command
+line, so it leaves out the download a real first poll also waits for.
+
+    python -m benchmarks.warm_start data/metars.cache.xml.gz
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def start(mode: str, path: str):
+    started = time.perf_counter()
+    from gzip import GzipFile
+
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from tfl.api_v2.metars import router
+    from tfl.exception_handlers import init_exception_handlers
+    from tfl.instances import metar_service
+
+    app = FastAPI()
+    app.include_router(router, prefix='/api/v2')
+    init_exception_handlers(app)
+    client = TestClient(app)
+    imported = time.perf_counter()
+
+    async def startup():
+        if mode == 'warm':
+            await metar_service.restore()
+        else:
+            with GzipFile(path) as gz:
+                await metar_service._stream_metar_gzip(gz)
+
+    if mode == 'save':
+        asyncio.run(startup())
+        return
+    # Requests made while the repository is still empty are 404s
+    assert client.get('/api/v2/metars/K000/latest').status_code == 404
+    asyncio.run(startup())
+    response = client.get('/api/v2/metars/K000/latest')
+    assert response.status_code == 200, response.text
+    finished = time.perf_counter()
+    print(f"{mode}: {finished - started:.2f}s to first response ({finished - imported:.2f}s after imports)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('path')
+    parser.add_argument('--mode', choices=['cold', 'warm', 'save'])
+    args = parser.parse_args()
+    if args.mode:
+        start(args.mode, args.path)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = {**os.environ, 'WEATHER_SNAPSHOT_DIR': directory, 'WEATHER_HISTORY_HOURS': '0'}
+        for mode in ('save', 'cold', 'warm'):
+            subprocess.run([sys.executable, '-m', 'benchmarks.warm_start', args.path, '--mode', mode], env=env, check=True)
+        print(f"snapshot: {os.path.getsize(os.path.join(directory, 'metars.snapshot')) / 2 ** 20:.1f} MiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,7 @@ from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 
 from tfl.api_v1.weather import router as weather_router
-from tfl.events import on_dtpp_change
+from tfl.events import on_dtpp_change, on_dtpp_stage
 from tfl.instances import metar_service, taf_service
 from tfl.middleware import installed_middleware
 from tfl.site_routing import static_page_routes
@@ -11,13 +11,16 @@ import os
 import sys
 from logging import StreamHandler, FileHandler
 import logging
-from tfl.instances import dtpp_service, dcs_path
+from tfl.instances import dtpp_service, dcs_path, http_client, weather_executor, metar_history, taf_history, ingest_lock
+from tfl.application_services.ingest import IngestCoordinator
+from tfl.configuration import INGEST_FOLLOW_SECONDS
 from tfl.application_services.dcs import NoChartSupplementError, start_polling_dcs
 from fastapi.responses import JSONResponse
 from tfl.api_v2.metars import router as metars_router
 from tfl.api_v2.dcs import router as dcs_router
 from tfl.api_v2.tafs import router as tafs_router
 from tfl.api_v2.procedures import router as procedures_router
+from tfl.api_v2.airports import router as airports_router
 from tfl.exception_handlers import init_exception_handlers
 
 BASE_DIR = os.path.normpath(os.path.dirname(os.path.realpath(__file__)))
@@ -61,19 +64,48 @@ app.include_router(metars_router, prefix='/api/v2')
 app.include_router(tafs_router, prefix='/api/v2')
 app.include_router(dcs_router, prefix='/api/v2')
 app.include_router(procedures_router, prefix='/api/v2')
+app.include_router(airports_router, prefix='/api/v2')
 app.mount("/static", StaticFiles(directory="./tfl/site/static"), name="static")
 init_exception_handlers(app)
 
 
-@app.on_event("startup")
-async def startup_event():
+async def start_polling():
     log.info("Starting Metar/TAF Pollers now")
     await metar_service.poller.start()
     await taf_service.poller.start()
     log.info("Starting DTPP Service")
-    dtpp_service.register_callback(on_dtpp_change)
     dtpp_service.start()
-    start_polling_dcs(dcs_path)
+    start_polling_dcs(dcs_path, http_client)
+
+
+async def follow_polling():
+    await metar_service.refresh()
+    await taf_service.refresh()
+    await dtpp_service.refresh()
+
+
+ingest = IngestCoordinator(ingest_lock, start_polling, follow_polling, interval=INGEST_FOLLOW_SECONDS)
+
+
+@app.on_event("startup")
+async def startup_event():
+    await http_client.start()
+    for history in (metar_history, taf_history):
+        if history is not None:
+            await history.reload()
+    await metar_service.restore()
+    await taf_service.restore()
+    dtpp_service.register_callback(on_dtpp_change)
+    dtpp_service.register_stage_callback(on_dtpp_stage)
+    await ingest.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    ingest.stop()
+    await http_client.close()
+    if weather_executor is not None:
+        weather_executor.shutdown(wait=False, cancel_futures=True)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,122 @@
+import asyncio
+import io
+
+import xmltodict
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from tfl.application_services.adds import ADDSPolling, iter_records
+from tfl.infrastructure.http import HTTPClient
+
+sample_xml = b"""<?xml version="1.0" encoding="UTF-8"?>
+<response xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" version="1.2">
+  <request_index>1</request_index>
+  <data_source name="metars" />
+  <errors />
+  <data num_results="2">
+    <METAR>
+      <raw_text>KLGB 181253Z 00000KT 10SM CLR 16/12 A2992 RMK AO2 SLP131 T01560122</raw_text>
+      <station_id>KLGB</station_id>
+      <observation_time>2022-05-18T12:53:00Z</observation_time>
+      <latitude>33.8117</latitude>
+      <longitude>-118.1464</longitude>
+      <wind_dir_degrees>0</wind_dir_degrees>
+      <wind_speed_kt>0</wind_speed_kt>
+      <visibility_statute_mi>10+</visibility_statute_mi>
+      <quality_control_flags>
+        <auto_station>TRUE</auto_station>
+      </quality_control_flags>
+      <sky_condition sky_cover="CLR" />
+      <flight_category>VFR</flight_category>
+    </METAR>
+    <METAR>
+      <raw_text>KSNA 181253Z 16004KT 3SM -RA BR FEW007 BKN015 OVC030 15/13 A2990</raw_text>
+      <station_id>KSNA</station_id>
+      <observation_time>2022-05-18T12:53:00Z</observation_time>
+      <wx_string>-RA BR</wx_string>
+      <sky_condition sky_cover="FEW" cloud_base_ft_agl="700" />
+      <sky_condition sky_cover="BKN" cloud_base_ft_agl="1500" />
+      <sky_condition sky_cover="OVC" cloud_base_ft_agl="3000" />
+      <flight_category>MVFR</flight_category>
+    </METAR>
+  </data>
+</response>"""
+
+
+def test_iter_records_matches_xmltodict():
+    expected = xmltodict.parse(sample_xml)['response']['data']['METAR']
+    records = list(iter_records(io.BytesIO(sample_xml), 'METAR'))
+    assert len(records) == 2
+    assert records == [dict(e) for e in expected]
+    assert records[0]['sky_condition'] == {'@sky_cover': 'CLR'}
+    assert len(records[1]['sky_condition']) == 3
+
+
+sample_taf_xml = b"""<?xml version="1.0" encoding="UTF-8"?>
+<response version="1.2">
+  <data num_results="2">
+    <TAF>
+      <raw_text>TAF KLGB 181120Z 1812/1912 VRB04KT P6SM SKC</raw_text>
+      <station_id>KLGB</station_id>
+      <forecast>
+        <fcst_time_from>2022-05-18T12:00:00Z</fcst_time_from>
+        <fcst_time_to>2022-05-19T12:00:00Z</fcst_time_to>
+        <sky_condition sky_cover="SKC" />
+      </forecast>
+    </TAF>
+    <TAF>
+      <raw_text>TAF KSNA 181120Z 1812/1912 16004KT P6SM BKN015 FM181800 27010KT P6SM SCT020</raw_text>
+      <station_id>KSNA</station_id>
+      <forecast>
+        <fcst_time_from>2022-05-18T12:00:00Z</fcst_time_from>
+        <fcst_time_to>2022-05-18T18:00:00Z</fcst_time_to>
+        <sky_condition sky_cover="BKN" cloud_base_ft_agl="1500" />
+      </forecast>
+      <forecast>
+        <fcst_time_from>2022-05-18T18:00:00Z</fcst_time_from>
+        <fcst_time_to>2022-05-19T12:00:00Z</fcst_time_to>
+        <change_indicator>FM</change_indicator>
+        <sky_condition sky_cover="SCT" cloud_base_ft_agl="2000" />
+      </forecast>
+    </TAF>
+  </data>
+</response>"""
+
+
+def test_iter_records_nested_forecasts():
+    expected = xmltodict.parse(sample_taf_xml)['response']['data']['TAF']
+    records = list(iter_records(io.BytesIO(sample_taf_xml), 'TAF'))
+    assert records == [dict(e) for e in expected]
+    assert isinstance(records[0]['forecast'], dict)
+    assert len(records[1]['forecast']) == 2
+
+
+def test_conditional_fetch():
+    etag = '"abc123"'
+    requests = []
+
+    async def cache_file(request: web.Request):
+        requests.append(request.headers.get('If-None-Match'))
+        if request.headers.get('If-None-Match') == etag:
+            return web.Response(status=304)
+        return web.Response(body=sample_xml, headers={'ETag': etag})
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/metars.cache.xml', cache_file)
+        async with TestServer(app) as server:
+            poller = ADDSPolling(HTTPClient(), path=str(server.make_url('/')))
+            poller.add_file('metars.cache.xml', None)
+            polling_file = poller._polling_files[0]
+            first = await poller.fetch(polling_file)
+            second = await poller.fetch(polling_file)
+            polling_file.reset_validators()
+            third = await poller.fetch(polling_file)
+            await poller.http.close()
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert first == sample_xml
+    assert second is None
+    assert third == sample_xml
+    assert requests == [None, etag, None]
@@ -0,0 +1,266 @@
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from dateutil.relativedelta import relativedelta
+
+from tfl.application_services.dtpp import DTPPService
+from tfl.application_services.loop_blocking import LoopBlocking
+from tfl.domain.services.dtpp import DTPPHeaderCache, diff_airport_plates, iter_plates
+from tfl.infrastructure import airport
+from tfl.infrastructure.airport import AirportRepository, load_plate_data, parse_raw_plate_data
+from tfl.infrastructure.http import HTTPClient
+from tfl.infrastructure.plate_index import PlateIndex, index_path
+
+metafile = """<?xml version="1.0" encoding="UTF-8"?>
+<digital_tpp Cycle="2205" from_edate="0901Z  05/19/22" to_edate="0901Z  06/16/22">
+  <state_code ID="CA" state_fullname="California">
+    <city_name ID="LONG BEACH" volume="SW-3">
+      <airport_name ID="LONG BEACH /DAUGHERTY FIELD/" military="N" apt_ident="LGB" icao_ident="KLGB" alnum="236">
+        <record>
+          <chartseq>10100</chartseq>
+          <chart_code>MIN</chart_code>
+          <chart_name>TAKEOFF MINIMUMS</chart_name>
+          <pdf_name>SW3TO.PDF</pdf_name>
+          <civil> </civil>
+        </record>
+        <record>
+          <chart_code>STAR</chart_code>
+          <chart_name> BAUBB TWO (RNAV) </chart_name>
+          <pdf_name>00236BAUBB.PDF</pdf_name>
+        </record>
+      </airport_name>
+    </city_name>
+    <city_name ID="SANTA ANA" volume="SW-4">
+      <airport_name ID="JOHN WAYNE" military="N" apt_ident="SNA" icao_ident="ksna" alnum="580">
+        <record>
+          <chart_code>APD</chart_code>
+          <chart_name>AIRPORT DIAGRAM</chart_name>
+          <pdf_name>00580AD.PDF</pdf_name>
+        </record>
+        <record></record>
+      </airport_name>
+      <airport_name ID="HELIPORT" military="N" apt_ident="1CA" icao_ident="" alnum="9999">
+        <record>
+          <chart_code>HOT</chart_code>
+          <chart_name>HOT SPOT</chart_name>
+          <pdf_name>09999HOT.PDF</pdf_name>
+        </record>
+      </airport_name>
+    </city_name>
+  </state_code>
+</digital_tpp>
+"""
+
+
+def test_iter_plates(tmp_path):
+    path = tmp_path / 'd-tpp_Metafile.xml'
+    path.write_text(metafile)
+    airports = list(iter_plates(path))
+    assert [icao for icao, _ in airports] == ['KLGB', 'KSNA', '']
+    klgb = airports[0][1]
+    assert [(p.tpp_cycle, p.code, p.name, p.pdf_name) for p in klgb] == [
+        (2205, 'MIN', 'TAKEOFF MINIMUMS', 'SW3TO.PDF'),
+        (2205, 'STAR', 'BAUBB TWO (RNAV)', '00236BAUBB.PDF'),
+    ]
+    assert klgb[1].plate_url == "https://aeronav.faa.gov/d-tpp/2205/00236BAUBB.PDF"
+    # The empty record is skipped
+    assert len(airports[1][1]) == 1
+
+
+def test_parse_raw_plate_data(tmp_path):
+    path = tmp_path / 'd-tpp_Metafile.xml'
+    path.write_text(metafile.replace('Cycle="2205"', 'cycle="2206"'))
+    plates = parse_raw_plate_data(path)
+    assert list(plates) == ['KLGB', 'KSNA', '']
+    assert {p.tpp_cycle for ps in plates.values() for p in ps} == {2206}
+
+
+next_metafile = metafile.replace('Cycle="2205"', 'Cycle="2206"').replace(
+    "<chart_name> BAUBB TWO (RNAV) </chart_name>", "<chart_name>BAUBB THREE (RNAV)</chart_name>"
+).replace("<pdf_name>09999HOT.PDF</pdf_name>", "<pdf_name>09999HOT2.PDF</pdf_name>")
+
+airports = {
+    icao: {
+        "country": "US", "icao": icao, "latitude": 33.8, "longitude": -118.1, "name": icao, "reporting": True,
+        "runways": [], "city": None, "elevation_ft": None, "elevation_m": None, "iata": None, "note": None,
+        "state": "CA", "type": "large_airport", "website": None, "wiki": None,
+    }
+    for icao in ("KLGB", "KSNA")
+}
+
+
+def test_diff_airport_plates(tmp_path):
+    (tmp_path / 'old.xml').write_text(metafile)
+    (tmp_path / 'new.xml').write_text(next_metafile)
+    old, new = parse_raw_plate_data(tmp_path / 'old.xml'), parse_raw_plate_data(tmp_path / 'new.xml')
+    # Only the cycle changed
+    assert diff_airport_plates(old['KSNA'], new['KSNA']) is None
+    klgb = diff_airport_plates(old['KLGB'], new['KLGB'])
+    assert (klgb.added, klgb.removed) == ([], [])
+    assert [(o.name, n.name) for o, n in klgb.renamed] == [('BAUBB TWO (RNAV)', 'BAUBB THREE (RNAV)')]
+    heliport = diff_airport_plates(old[''], new[''])
+    assert [p.pdf_name for p in heliport.added] == ['09999HOT2.PDF']
+    assert [p.pdf_name for p in heliport.removed] == ['09999HOT.PDF']
+
+
+def test_staged_cycle_is_swapped_in(tmp_path, monkeypatch):
+    (tmp_path / 'airports.json').write_text(json.dumps(airports))
+    monkeypatch.setattr(airport, 'AIRPORTS_PATH', tmp_path / 'airports.json')
+    current, upcoming = tmp_path / 'DTPP_2205.xml', tmp_path / 'DTPP_2206.xml'
+    current.write_text(metafile)
+    upcoming.write_text(next_metafile)
+
+    async def run():
+        repo = AirportRepository()
+        await repo.load_dtpp(current)
+        klgb = await repo.find('KLGB')
+        ksna_plates = repo.repo['KSNA'].plates
+        changes = await repo.stage_dtpp(upcoming)
+        before = [p.tpp_cycle for p in klgb.plates]
+        staged = repo._staged.plates
+        ksna_search = repo.plate_search['KSNA']
+        await repo.load_dtpp(upcoming)
+        return repo, klgb, ksna_plates, ksna_search, changes, before, staged
+
+    repo, klgb, ksna_plates, ksna_search, changes, before, staged = asyncio.run(run())
+    assert sorted(changes) == ['', 'KLGB']
+    # The applied cycle is served until the switchover
+    assert before == [2205, 2205]
+    assert repo.dtpp['KLGB'] is staged['KLGB']
+    assert [p.tpp_cycle for p in klgb.plates] == [2206, 2206]
+    # An airport without chart changes gets the plates of the new cycle and
+    # keeps its search tokens, the plates of the old cycle are left as they were
+    assert repo.repo['KSNA'].plates is staged['KSNA']
+    assert [p.plate_url for p in repo.repo['KSNA'].plates] == ["https://aeronav.faa.gov/d-tpp/2206/00580AD.PDF"]
+    assert [p.tpp_cycle for p in ksna_plates] == [2205]
+    assert repo.plate_search['KSNA']._postings is ksna_search._postings
+    assert repo.plate_search['KSNA'].search('diagram') == staged['KSNA']
+    assert repo.dtpp_changes is changes
+    assert [p.name for p in repo.plate_search['KLGB'].search('baubb')] == ['BAUBB THREE (RNAV)']
+    assert repo.plate_catalog.cycle == 2206
+    assert repo.plate_catalog.icaos == ['KLGB', 'KSNA']
+    assert repo.plate_catalog.plates == klgb.plates + repo.repo['KSNA'].plates
+
+
+def test_plate_index(tmp_path):
+    path = tmp_path / 'DTPP_2205.xml'
+    path.write_text(metafile)
+    parsed = load_plate_data(path)
+    assert index_path(path).exists()
+    index = PlateIndex(index_path(path))
+    assert index.cycle == 2205
+    assert len(index) == 3
+    assert index.to_dict() == parsed
+    path.write_text(metafile.replace("<chart_name>HOT SPOT</chart_name>", "<chart_name>HOT SPOTS</chart_name>"))
+    os.utime(path, ns=(0, path.stat().st_mtime_ns + 1))
+    # A replaced metafile is parsed again
+    assert load_plate_data(path)[''][0].name == 'HOT SPOTS'
+    index_path(path).write_bytes(b'TFLP')
+    assert load_plate_data(path)[''][0].name == 'HOT SPOTS'
+    # and the broken index is rewritten
+    assert PlateIndex(index_path(path)).to_dict()[''][0].name == 'HOT SPOTS'
+
+
+def test_dtpp_header_cache(tmp_path):
+    path = tmp_path / 'DTPP_2205.xml'
+    path.write_text(metafile)
+    headers = DTPPHeaderCache()
+    assert headers.get(path).cycle == 2205
+    assert headers.get(path).cycle == 2205
+    assert headers.parsed == 1
+    path.write_text(metafile.replace('Cycle="2205"', 'Cycle="2206"'))
+    os.utime(path, ns=(0, path.stat().st_mtime_ns + 1))
+    assert headers.get(path).cycle == 2206
+    assert headers.parsed == 2
+    path.unlink()
+    assert headers.get(path) is None
+
+
+def dated_metafile(valid_from: datetime, valid_to: datetime) -> str:
+    return metafile.replace('0901Z  05/19/22', f"{valid_from:%H%M}Z  {valid_from:%m/%d/%y}").replace(
+        '0901Z  06/16/22', f"{valid_to:%H%M}Z  {valid_to:%m/%d/%y}"
+    )
+
+
+def test_dtpp_poll_reads_cached_headers(tmp_path):
+    now = datetime.now(timezone.utc)
+    (tmp_path / 'DTPP_2001.xml').write_text(dated_metafile(now - timedelta(days=60), now - timedelta(days=30)))
+    current = tmp_path / f"DTPP_{datetime.utcnow():%y%m}.xml"
+    current.write_text(dated_metafile(now - timedelta(days=1), now + timedelta(days=27)))
+    upcoming = tmp_path / f"DTPP_{datetime.utcnow() + relativedelta(months=1):%y%m}.xml"
+    upcoming.write_text(dated_metafile(now + timedelta(days=27), now + timedelta(days=55)))
+
+    async def run():
+        http = HTTPClient()
+        service = DTPPService(tmp_path, http)
+        # Nothing is read until the cache is cleaned on the event loop
+        assert (tmp_path / 'DTPP_2001.xml').exists()
+        await service.clean_cache()
+        first = await service._poll()
+        parsed = service.headers.parsed
+        second = await service._poll()
+        await http.close()
+        return service, first, second, parsed
+
+    service, (header, version), second, parsed = asyncio.run(run())
+    assert not (tmp_path / 'DTPP_2001.xml').exists()
+    # The staged next cycle is not valid yet but is kept
+    assert upcoming.exists()
+    assert version.file_path == current and header.is_valid
+    assert second[0] == header
+    assert parsed == 3
+    assert service.headers.parsed == parsed
+
+
+def test_failed_staging_is_retried(tmp_path):
+    now = datetime.now(timezone.utc)
+    current = tmp_path / f"DTPP_{datetime.utcnow():%y%m}.xml"
+    current.write_text(dated_metafile(now - timedelta(days=1), now + timedelta(days=27)))
+    upcoming = tmp_path / f"DTPP_{datetime.utcnow() + relativedelta(months=1):%y%m}.xml"
+    upcoming.write_text(dated_metafile(now + timedelta(days=27), now + timedelta(days=55)))
+    calls = []
+
+    async def stage(header, version):
+        calls.append(header)
+        if len(calls) == 1:
+            raise ValueError("Staging failed")
+
+    async def run():
+        http = HTTPClient()
+        service = DTPPService(tmp_path, http)
+        service.register_stage_callback(stage)
+        first = await service._poll_and_notify()
+        failed_header = service.staged_header
+        second = await service._poll_and_notify()
+        await http.close()
+        return service, first, second, failed_header
+
+    service, first, second, failed_header = asyncio.run(run())
+    # The current cycle is still polled and the next one staged again
+    assert first == second == service.current_valid_header
+    assert failed_header is None
+    assert len(calls) == 2 and service.staged_header == calls[1]
+
+
+def test_loop_blocking():
+    async def work():
+        time.sleep(0.02)
+        await asyncio.sleep(0)
+        await asyncio.to_thread(time.sleep, 0.05)
+        return 'done'
+
+    async def fail():
+        await asyncio.sleep(0)
+        raise KeyError('x')
+
+    blocking = LoopBlocking()
+    assert asyncio.run(blocking.measure(work())) == 'done'
+    assert blocking.steps >= 3
+    # The sleep in the thread did not hold the loop
+    assert 0.02 <= blocking.longest <= blocking.total < 0.05
+    with pytest.raises(KeyError):
+        asyncio.run(LoopBlocking().measure(fail()))
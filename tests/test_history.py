@@ -0,0 +1,102 @@
+import asyncio
+import io
+from datetime import datetime, timedelta
+
+from tfl.application_services.adds import iter_records
+from tfl.application_services.metar import MetarService, parse_metar
+from tfl.infrastructure.history import ENTRY_HEADER, WeatherHistory
+from tfl.infrastructure.http import HTTPClient
+from tfl.infrastructure.metar import MetarRepository, decode_metar_record, encode_metar_record
+from tests.test_adds import sample_xml
+
+# The sample reports are from 2022
+RETENTION = timedelta(days=365 * 100)
+
+later_xml = sample_xml.replace(
+    b"KSNA 181253Z 16004KT 3SM -RA BR FEW007 BKN015 OVC030 15/13 A2990",
+    b"KSNA 181353Z 16006KT 5SM BR FEW007 BKN015 15/13 A2991"
+).replace(
+    b"<observation_time>2022-05-18T12:53:00Z</observation_time>\n      <wx_string>",
+    b"<observation_time>2022-05-18T13:53:00Z</observation_time>\n      <wx_string>"
+)
+
+
+def metar_history(path=None) -> WeatherHistory:
+    return WeatherHistory(
+        'metars', encode_metar_record, decode_metar_record, 'observation_time', retention=RETENTION, path=path
+    )
+
+
+def test_metar_record_roundtrip():
+    for m in iter_records(io.BytesIO(sample_xml), 'METAR'):
+        assert parse_metar(decode_metar_record(encode_metar_record(m))) == parse_metar(m)
+
+
+def test_history_series_by_time(tmp_path):
+    async def run():
+        history = metar_history(tmp_path)
+        service = MetarService(MetarRepository(), HTTPClient(), history=history)
+        await service._ingest(iter_records(io.BytesIO(sample_xml), 'METAR'))
+        await service._ingest(iter_records(io.BytesIO(sample_xml), 'METAR'))
+        await service._ingest(iter_records(io.BytesIO(later_xml), 'METAR'))
+        return (
+            history,
+            await service.metar_history('KSNA'),
+            await service.metar_history('ksna', end=datetime(2022, 5, 18, 13)),
+            await service.metar_history('KSNA', start=datetime(2022, 5, 19)),
+            await service.metar_history('KSNA'),
+        )
+
+    history, series, before, after, again = asyncio.run(run())
+    # The repeated cycle is not stored twice
+    assert len(history) == 3
+    assert [m.raw_text[:11] for m in series] == ['KSNA 181353', 'KSNA 181253']
+    assert [m.raw_text[:11] for m in before] == ['KSNA 181253']
+    assert after == []
+    # The older report is parsed once and reused by the next request
+    assert again[1] is series[1]
+
+    reloaded = metar_history(tmp_path)
+    assert reloaded.load() == 3
+    assert reloaded.series('KSNA') == history.series('KSNA')
+
+
+def test_parsed_series_is_bounded():
+    history = WeatherHistory(
+        'metars', encode_metar_record, decode_metar_record, 'observation_time', retention=RETENTION, max_parsed=2
+    )
+
+    async def run():
+        await history.append(iter_records(io.BytesIO(sample_xml), 'METAR'))
+        await history.append(iter_records(io.BytesIO(later_xml), 'METAR'))
+        ksna = await history.parsed_series('KSNA', parse_metar)
+        klgb = await history.parsed_series('KLGB', parse_metar)
+        return ksna, klgb, await history.parsed_series('KSNA', parse_metar)
+
+    ksna, klgb, again = asyncio.run(run())
+    assert len(history._parsed) == 2
+    # The least recently requested report was dropped and parsed again
+    assert again == ksna
+    assert again[0] is not ksna[0] and again[1] is ksna[1]
+
+
+def test_history_load_ignores_truncated_record(tmp_path):
+    history = metar_history(tmp_path)
+    records = list(iter_records(io.BytesIO(sample_xml), 'METAR'))
+    asyncio.run(history.append(records))
+    segment = next(tmp_path.iterdir())
+    data = segment.read_bytes()
+    segment.write_bytes(data[:-5])
+
+    reloaded = metar_history(tmp_path)
+    assert reloaded.load() == 1
+    assert len(data) == 2 * ENTRY_HEADER.size + sum(len(encode_metar_record(m)) for m in records)
+
+
+def test_history_retention():
+    history = WeatherHistory(
+        'metars', encode_metar_record, decode_metar_record, 'observation_time', retention=timedelta(hours=48)
+    )
+    records = list(iter_records(io.BytesIO(sample_xml), 'METAR'))
+    assert asyncio.run(history.append(records)) == 0
+    assert history.series('KLGB') == []
@@ -0,0 +1,106 @@
+import asyncio
+import io
+from datetime import timedelta
+
+from tfl.application_services.adds import iter_records
+from tfl.application_services.ingest import IngestCoordinator
+from tfl.application_services.metar import MetarService
+from tfl.domain.weather import Metar
+from tfl.infrastructure.history import WeatherHistory
+from tfl.infrastructure.http import HTTPClient
+from tfl.infrastructure.lock import FileLock
+from tfl.infrastructure.metar import MetarRepository, decode_metar_record, encode_metar_record
+from tfl.infrastructure.snapshot_file import SnapshotFile
+from tests.test_adds import sample_xml
+from tests.test_history import later_xml
+
+
+def test_file_lock_is_exclusive(tmp_path):
+    first, second = FileLock(tmp_path / 'ingest.lock'), FileLock(tmp_path / 'ingest.lock')
+    assert first.acquire()
+    assert not second.acquire()
+    first.release()
+    assert second.acquire()
+    second.release()
+
+
+def test_follower_takes_over_from_leader(tmp_path):
+    async def run():
+        calls = []
+
+        def coordinator(name):
+            async def lead():
+                calls.append(f"{name} leads")
+
+            async def follow():
+                calls.append(f"{name} follows")
+            return IngestCoordinator(FileLock(tmp_path / 'ingest.lock'), lead, follow, interval=0.01)
+
+        leader, follower = coordinator('a'), coordinator('b')
+        await leader.start()
+        await follower.start()
+        await asyncio.sleep(0.05)
+        leader.stop()
+        await asyncio.sleep(0.05)
+        roles = leader.is_leader, follower.is_leader
+        follower.stop()
+        return calls, roles
+
+    calls, roles = asyncio.run(run())
+    assert calls[:3] == ['a leads', 'b follows', 'b follows']
+    assert calls[-1] == 'b leads'
+    assert roles == (False, True)
+
+
+def test_failed_takeover_releases_the_lock(tmp_path):
+    async def run():
+        calls = []
+
+        async def lead():
+            calls.append('lead')
+            raise RuntimeError("First ingest failed")
+
+        async def follow():
+            calls.append('follow')
+
+        lock = FileLock(tmp_path / 'ingest.lock')
+        coordinator = IngestCoordinator(lock, lead, follow, interval=0.01)
+        other = FileLock(tmp_path / 'ingest.lock')
+        assert other.acquire()
+        await coordinator.start()
+        other.release()
+        await asyncio.sleep(0.05)
+        state = coordinator.is_leader, lock.held, coordinator._task.done()
+        coordinator.stop()
+        return calls, state
+
+    calls, (is_leader, held, done) = asyncio.run(run())
+    # The failed lead is retried while the worker keeps following
+    assert calls.count('lead') > 1 and 'follow' in calls[calls.index('lead'):]
+    assert not is_leader and not held and not done
+
+
+def test_follower_refreshes_from_leader_snapshot(tmp_path):
+    def service():
+        history = WeatherHistory(
+            'metars', encode_metar_record, decode_metar_record, 'observation_time',
+            retention=timedelta(days=365 * 100), path=tmp_path
+        )
+        return MetarService(MetarRepository(), HTTPClient(), history=history, snapshot_file=SnapshotFile(tmp_path / 'metars.snapshot', Metar))
+
+    async def run():
+        leader, follower = service(), service()
+        await leader._ingest(iter_records(io.BytesIO(sample_xml), 'METAR'))
+        first = await follower.refresh()
+        klgb = await follower.metar('KLGB')
+        again = await follower.refresh()
+        await leader._ingest(iter_records(io.BytesIO(later_xml), 'METAR'))
+        second = await follower.refresh()
+        return first, again, second, klgb, follower
+
+    first, again, second, klgb, follower = asyncio.run(run())
+    assert (first, again, second) == (True, False, True)
+    # Unchanged stations keep their instance and cached response
+    assert follower._repo.snapshot.items['klgb'] is klgb
+    assert follower._repo.snapshot.items['ksna'].raw_text.startswith('KSNA 181353Z')
+    assert len(follower.history) == 3
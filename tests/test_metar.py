@@ -0,0 +1,252 @@
+import asyncio
+import gzip
+import io
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from gzip import GzipFile
+
+import pytest
+
+from tfl.application_services.adds import iter_records
+from tfl.application_services import metar, taf
+from tfl.application_services.metar import MetarService, parse_metar
+from tfl.application_services.taf import TafService
+from tfl.domain.factories.weather import WeatherFactory
+from tfl.domain.weather import MetarOrder
+from tfl.infrastructure.http import HTTPClient
+from tfl.infrastructure.metar import MetarRepository
+from tfl.infrastructure.taf import TAFRepository
+from tests.test_adds import sample_xml
+
+
+def test_ingest_only_changed_metars():
+    changed_xml = sample_xml.replace(
+        b"KSNA 181253Z 16004KT 3SM -RA BR FEW007 BKN015 OVC030 15/13 A2990",
+        b"KSNA 181353Z 16006KT 5SM BR FEW007 BKN015 15/13 A2991"
+    )
+    removed_xml = changed_xml.replace(
+        b"<station_id>KLGB</station_id>", b"<station_id>KLAX</station_id>"
+    ).replace(b"KLGB 181253Z", b"KLAX 181253Z")
+
+    async def run():
+        service = MetarService(MetarRepository(), HTTPClient())
+
+        async def ingest(xml):
+            return await service._ingest(iter_records(io.BytesIO(xml), 'METAR'))
+
+        first = await ingest(sample_xml)
+        klgb = await service.metar('KLGB')
+        second = await ingest(sample_xml)
+        third = await ingest(changed_xml)
+        unchanged = await service.metar('KLGB') is klgb
+        fourth = await ingest(removed_xml)
+        return first, second, third, fourth, unchanged, await service.metar('KLGB')
+
+    first, second, third, fourth, unchanged, removed = asyncio.run(run())
+    assert (first.new, first.changed, first.unchanged, first.removed) == (2, 0, 0, 0)
+    assert (second.new, second.changed, second.unchanged, second.removed) == (0, 0, 2, 0)
+    assert (third.new, third.changed, third.unchanged, third.removed) == (0, 1, 1, 0)
+    assert (fourth.new, fourth.changed, fourth.unchanged, fourth.removed) == (1, 0, 1, 1)
+    assert unchanged
+    assert removed is None
+
+
+def test_ingest_keeps_cache_file_order():
+    changed_xml = sample_xml.replace(b"KLGB 181253Z", b"KLGB 181353Z")
+
+    async def run():
+        service = MetarService(MetarRepository(), HTTPClient())
+        await service._ingest(iter_records(io.BytesIO(sample_xml), 'METAR'))
+        stats = await service._ingest(iter_records(io.BytesIO(changed_xml), 'METAR'))
+        return stats, list(service._repo.snapshot.items)
+
+    stats, order = asyncio.run(run())
+    # The re-parsed station stays where the cache file lists it
+    assert stats.changed == 1
+    assert order == ['klgb', 'ksna']
+
+
+def test_ingest_in_executor_matches_inline():
+    async def run(executor):
+        service = MetarService(MetarRepository(), HTTPClient(), executor=executor, batch_size=1)
+        await service._ingest(iter_records(io.BytesIO(sample_xml), 'METAR'))
+        return service._repo.repo
+
+    with ThreadPoolExecutor(2) as executor:
+        threaded = asyncio.run(run(executor))
+    inline = asyncio.run(run(None))
+    assert threaded == inline
+    assert set(inline.keys()) == {'klgb', 'ksna'}
+
+
+def test_ingest_counts_time_fallbacks_of_pool_processes():
+    irregular_xml = sample_xml.replace(
+        b"2022-05-18T12:53:00Z</observation_time>", b"2022-05-18T12:53:00.000Z</observation_time>"
+    )
+
+    async def run(executor):
+        service = MetarService(MetarRepository(), HTTPClient(), executor=executor)
+        return await service._ingest(iter_records(io.BytesIO(irregular_xml), 'METAR'))
+
+    with ProcessPoolExecutor(1) as executor:
+        pooled = asyncio.run(run(executor))
+    assert pooled.time_fallbacks == asyncio.run(run(None)).time_fallbacks == 2
+
+
+def test_ingest_publishes_snapshot():
+    async def run():
+        repo = MetarRepository()
+        service = MetarService(repo, HTTPClient())
+        before = repo.snapshot
+        await service._ingest(iter_records(io.BytesIO(sample_xml), 'METAR'))
+        return before, repo.snapshot
+
+    before, after = asyncio.run(run())
+    assert before.version == 0
+    assert before.items == {}
+    assert after.version == 1
+    assert after.built_at is not None
+    assert after.info()['count'] == 2
+
+
+def test_parse_metar_interns_value_objects():
+    records = list(iter_records(io.BytesIO(sample_xml), 'METAR'))
+    WeatherFactory.cache_clear()
+    first = parse_metar(records[1])
+    second = parse_metar(records[1])
+    assert second.wx_codes[0] is first.wx_codes[0]
+    assert second.sky_condition[2] is first.sky_condition[2]
+    assert second.wind is first.wind
+    assert WeatherFactory.cache_info()['wx_code'].hits == 2
+
+    WeatherFactory.intern = False
+    try:
+        uncached = parse_metar(records[1])
+    finally:
+        WeatherFactory.intern = True
+    assert uncached.wx_codes[0] is not first.wx_codes[0]
+    assert uncached.dict() == first.dict()
+
+
+def test_parse_adds_time_matches_dateutil():
+    from dateutil.parser import parse
+    from tfl.domain.services import weather
+
+    fallbacks = weather.adds_time_fallbacks
+    for value in ('2022-05-18T12:53:00Z', '2024-02-29T00:00:00Z'):
+        fast = weather.parse_adds_time(value)
+        assert fast == parse(value)
+        assert fast.isoformat() == parse(value).isoformat()
+    assert weather.adds_time_fallbacks == fallbacks
+
+    for value in ('2022-05-18 12:53:00Z', '2022-05-18T12:53:00.000Z', '2022-05-18T12:53:00+01:00'):
+        assert weather.parse_adds_time(value) == parse(value)
+    assert weather.adds_time_fallbacks == fallbacks + 3
+
+
+def test_ingest_renders_response_cache():
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from tfl.application_services.responses import ResponseCache
+    from tfl.domain.weather import Metar
+
+    async def run():
+        repo = MetarRepository()
+        service = MetarService(repo, HTTPClient(), responses=ResponseCache(Metar))
+        await service._ingest(iter_records(io.BytesIO(sample_xml), 'METAR'))
+        first = service.responses.body(await service.metar('KSNA'))
+        await service._ingest(iter_records(io.BytesIO(sample_xml), 'METAR'))
+        return repo, service.responses, first
+
+    repo, responses, first = asyncio.run(run())
+    app = FastAPI()
+
+    @app.get('/{icao}', response_model=Metar)
+    async def route(icao: str):
+        return repo.repo[icao]
+
+    assert responses.version == repo.snapshot.version == 2
+    assert responses.body(repo.repo['ksna']) is first
+    assert TestClient(app).get('/ksna').content == first
+
+
+def test_model_dict_adds_properties_without_mutating():
+    from tfl.domain.weather import SkyCondition, Wind
+
+    wind = Wind(dir=270, at=10, gusting=20)
+    assert wind.dict() == {'dir': 270, 'at': 10, 'gusting': 20, 'text': '270 @ 10kts gusting 20kts'}
+    assert 'text' not in wind.__dict__
+    assert wind.dict(exclude={'text'}) == {'dir': 270, 'at': 10, 'gusting': 20}
+    assert wind.dict(include={'at', 'text'}) == {'at': 10, 'text': '270 @ 10kts gusting 20kts'}
+    sky = SkyCondition(coverage='BKN', bases=1500)
+    assert list(sky.dict()) == ['coverage', 'bases', 'text']
+
+
+def test_all_selects_requested_stations_in_order():
+    async def run():
+        repo = MetarRepository()
+        await MetarService(repo, HTTPClient())._ingest(iter_records(io.BytesIO(sample_xml), 'METAR'))
+        return (
+            await repo.all(stations='KSNA,klgb,KXXX,ksna'),
+            await repo.all(offset=1, limit=1, stations='KSNA, KLGB'),
+            await repo.all(stations='KSNA,KLGB', sorting=(lambda m: len(m.raw_text), False)),
+        )
+
+    requested, paginated, ordered = asyncio.run(run())
+    assert [m.station_id for m in requested] == ['KSNA', 'KLGB']
+    assert [m.station_id for m in paginated] == ['KLGB']
+    assert [m.station_id for m in ordered] == ['KSNA', 'KLGB']
+
+
+def test_sorted_indexes_follow_snapshot():
+    from tfl.domain.weather import MetarOrder
+
+    async def run():
+        repo = MetarRepository()
+        await MetarService(repo, HTTPClient())._ingest(iter_records(io.BytesIO(sample_xml), 'METAR'))
+        return (
+            repo,
+            await repo.all(sorting=MetarOrder.longest),
+            await repo.all(sorting='flight_rule'),
+            await repo.all(offset=1, sorting=MetarOrder.longest),
+            await repo.longest_metars(1),
+        )
+
+    repo, longest, flight_rule, paginated, top = asyncio.run(run())
+    expected = sorted(repo.repo.values(), key=lambda m: len(m.raw_text), reverse=True)
+    assert longest == expected
+    assert [m.flight_rule.code for m in flight_rule] == ['MVFR', 'VFR']
+    assert paginated == expected[1:]
+    assert top == expected[:1]
+
+
+def test_repository_changes_publish_a_new_snapshot():
+    async def run():
+        repo = MetarRepository()
+        await MetarService(repo, HTTPClient())._ingest(iter_records(io.BytesIO(sample_xml), 'METAR'))
+        ingested = repo.snapshot
+        ksna = await repo.find('ksna')
+        await repo.delete(ksna)
+        deleted = repo.snapshot
+        await repo.create(ksna)
+        return ingested, deleted, repo.snapshot
+
+    ingested, deleted, created = asyncio.run(run())
+    # Published snapshots are never changed in place
+    assert sorted(ingested.items) == ['klgb', 'ksna']
+    assert sorted(deleted.items) == ['klgb']
+    assert (ingested.version, deleted.version, created.version) == (1, 2, 3)
+    assert [m.station_id for m in created.indexes[MetarOrder.longest]] == \
+        [m.station_id for m in ingested.indexes[MetarOrder.longest]]
+    assert len(created.spatial) == len(ingested.spatial)
+
+
+def test_truncated_download_is_a_bad_response():
+    truncated = gzip.compress(sample_xml)[:-20]
+
+    async def run():
+        with pytest.raises(metar.BadResponseError):
+            await MetarService(MetarRepository(), HTTPClient())._stream_metar_gzip(GzipFile(fileobj=io.BytesIO(truncated)))
+        with pytest.raises(taf.BadResponseError):
+            await TafService(TAFRepository(), HTTPClient())._stream_taf_gzip(GzipFile(fileobj=io.BytesIO(truncated)))
+
+    asyncio.run(run())
@@ -4,6 +4,8 @@ import pytest
 import pathlib
 
 from tfl.domain.facilities import FAAPlate
+from tfl.domain.services.plate_catalog import PlateCatalog, StaleCursorError
+from tfl.domain.services.plate_search import PlateSearchIndex, tokenise
 from tfl.domain.services.weather import get_string_ratios, get_best_plates
 from tfl.infrastructure.airport import parse_raw_plate_data
 from tfl.domain.services.dtpp import load_raw_plate_data
@@ -259,3 +261,60 @@ data = json.loads("""[
     "plate_url": "https://aeronav.faa.gov/d-tpp/2205/00236ZOOMM_C.PDF"
   }
 ]""")
+
+
+plates = [FAAPlate(**plate) for plate in data]
+
+
+def test_tokenise():
+    assert tokenise("ILS OR LOC RWY 09L") == ['ILS', 'LOC', '9L']
+    assert tokenise("rnav (gps) z runway 9l") == ['RNAV', 'GPS', 'Z', '9L']
+
+
+def test_plate_search():
+    index = PlateSearchIndex(plates)
+    names = lambda query: [p.name for p in index.search(query)]
+    assert names("ILS 30") == ['ILS OR LOC RWY 30']
+    assert names("rnav z rwy 30") == ['RNAV (GPS) Z RWY 30']
+    # A runway without a side matches each of its sides
+    assert names("rnav 26") == ['RNAV (RNP) RWY 26R']
+    assert names("RNP 30") == ['RNAV (RNP) Y RWY 30']
+    # Prefixes and misspellings
+    assert names("dsn") == ['DSNEE FIVE (RNAV)', 'DSNEE FIVE (RNAV), CONT.1']
+    assert names("takeof minimum") == ['TAKEOFF MINIMUMS']
+    assert names("ILS 27") == []
+    assert names("") == []
+
+
+def test_get_best_plates():
+    names = [p.name for p in plates]
+    assert get_best_plates("ils rwy 30", names) == ['ILS OR LOC RWY 30']
+    assert get_best_plates("visual 30", names) == ['ARSENAL VISUAL RWY 30']
+
+
+def test_plate_catalog():
+    ksna = FAAPlate(tpp_cycle=2205, icao='KSNA', code='IAP', name='ILS RWY 20R', pdf_name='00580IL20R.PDF')
+    catalog = PlateCatalog([('KLGB', plates), ('KXXX', []), ('KSNA', [ksna])], cycle=2205)
+    assert catalog.icaos == ['KLGB', 'KSNA']
+    page = catalog.plate_page(limit=20)
+    assert (page.items, page.total) == (plates[:20], 32)
+    rest = catalog.plate_page(catalog.position(catalog.cursor(page.next)), limit=20)
+    assert (rest.items, rest.next) == (plates[20:] + [ksna], None)
+    # Positions are rows of all plates, so they carry over to a chart code
+    approaches = [p for p in plates + [ksna] if p.code == 'IAP']
+    page = catalog.plate_page(offset=1, limit=3, code='iap')
+    assert (page.items, page.total) == (approaches[1:4], 9)
+    assert catalog.plate_page(page.next, limit=10, code='IAP').items == approaches[4:]
+    assert catalog.icao_page(code='IAP').items == ['KLGB', 'KSNA']
+    assert catalog.icao_page(code='APD').items == ['KLGB']
+    assert catalog.plate_page(code='NOPE') == ([], 0, None)
+    with pytest.raises(StaleCursorError):
+        catalog.position(f'2206.{catalog.build}.3')
+    with pytest.raises(ValueError):
+        catalog.position('3')
+    # A rebuild of the same plates takes the cursors of the previous one,
+    # a rebuild with other plates in the same cycle does not
+    cursor = catalog.cursor(20)
+    assert PlateCatalog([('KLGB', plates), ('KSNA', [ksna])], cycle=2205).position(cursor) == 20
+    with pytest.raises(StaleCursorError):
+        PlateCatalog([('KLGB', plates[1:]), ('KSNA', [ksna])], cycle=2205).position(cursor)
@@ -1,3 +1,8 @@
+import pathlib
+from gzip import GzipFile
+
+from tfl.application_services.adds import iter_records
+from tfl.application_services.metar import REMARKS_PATTERN
 from tfl.domain.remarks import *
 
 
@@ -92,4 +97,35 @@ def test_temp_dewpoint():
     s = "AO2 PK WND 09029/0616 SNE18 WSHFT 0715 P0000 FZRANO 20221 30217 4/023 401121084 RAB0715E22 T00640036"
     ht = hourly_temp_dew(s)
     assert ht.code == 'T00640036'
-    assert ht.text == 'Hourly Temp 6.4C and Dewpoint 3.6C'
\ No newline at end of file
+    assert ht.text == 'Hourly Temp 6.4C and Dewpoint 3.6C'
+
+def test_parse_remarks_matches_pipeline():
+    samples = [
+        "",
+        "AO2 SLP131 T01560122",
+        "AO2 PK WND 09029/0616 SNE18 P0000 FZRANO",
+        "AO2 PK WND 28045/15 WSHFT 1530 FROPA TWR VIS 1/2 SFC VIS 3",
+        "AO2 RAB0715E22 TSB15 SLP012 P0000 60012 T00640036 10072 20011 58005 $",
+        "AO1 3//// 401121084 4/023 VIRGA PRESFR RVRNO PWINO PNO TSNO",
+        "AO2 PK WND 10021/15 10033 21012 30217",
+        "ao2 virga CIG 005V010 BINOVC SLPNO",
+        # Repeated groups
+        "AO2 PK WND 10021/15 PK WND 10021/15",
+        "AO2 PK WND 20011/15 SLP131 PK WND 20011/15 AO2",
+        "10072 10072 T00640036",
+    ]
+    for s in samples:
+        assert parse_remarks(s) == pipeline_remarks(s), s
+
+
+def test_parse_remarks_matches_pipeline_on_cache_file():
+    with GzipFile(pathlib.Path(__file__).parent / 'data' / 'metars.cache.xml.gz') as gz:
+        sections = [match.group(1) for m in iter_records(gz, 'METAR') if (match := REMARKS_PATTERN.search(m['raw_text']))]
+    assert len(sections) > 800
+    for s in sections:
+        assert parse_remarks(s) == pipeline_remarks(s), s
+
+
+def test_parse_remarks_does_not_clobber_later_groups():
+    remarks = parse_remarks("10211 T10211006")
+    assert [r.code for r in remarks] == ["10211", "T10211006"]
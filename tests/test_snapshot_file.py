@@ -0,0 +1,55 @@
+import asyncio
+import io
+import pickle
+from datetime import timedelta
+
+from tfl.application_services.adds import iter_records
+from tfl.application_services.metar import MetarService
+from tfl.domain.weather import Metar, TAF
+from tfl.infrastructure.http import HTTPClient
+from tfl.infrastructure.metar import MetarRepository
+from tfl.infrastructure.snapshot_file import SnapshotFile
+from tests.test_adds import sample_xml
+
+
+def test_restore_saved_snapshot(tmp_path):
+    path = tmp_path / 'metars.snapshot'
+
+    async def run():
+        first = MetarService(MetarRepository(), HTTPClient(), snapshot_file=SnapshotFile(path, Metar))
+        await first._ingest(iter_records(io.BytesIO(sample_xml), 'METAR'))
+        repo = MetarRepository()
+        second = MetarService(repo, HTTPClient(), snapshot_file=SnapshotFile(path, Metar))
+        restored = await second.restore()
+        snapshot = repo.snapshot
+        stats = await second._ingest(iter_records(io.BytesIO(sample_xml), 'METAR'))
+        return first._repo.snapshot, snapshot, restored, stats
+
+    saved, snapshot, restored, stats = asyncio.run(run())
+    assert restored
+    assert snapshot.built_at == saved.built_at
+    assert snapshot.items == saved.items
+    assert len(snapshot.spatial) == 1
+    # The first ingest after a restart only parses what changed
+    assert (stats.new, stats.changed, stats.unchanged) == (0, 0, 2)
+    assert not list(tmp_path.glob('*.partial'))
+
+
+def test_stale_or_unknown_snapshot_is_ignored(tmp_path):
+    path = tmp_path / 'metars.snapshot'
+
+    async def run():
+        service = MetarService(MetarRepository(), HTTPClient(), snapshot_file=SnapshotFile(path, Metar))
+        await service._ingest(iter_records(io.BytesIO(sample_xml), 'METAR'))
+
+    asyncio.run(run())
+
+    assert SnapshotFile(path, Metar).load() is not None
+    # Saved by code with another model
+    assert SnapshotFile(path, TAF).load() is None
+    assert SnapshotFile(path, Metar, max_age=timedelta(0)).load() is None
+    path.write_bytes(pickle.dumps({'format': -1}))
+    assert SnapshotFile(path, Metar).load() is None
+    path.write_bytes(b'not a pickle')
+    assert SnapshotFile(path, Metar).load() is None
+    assert SnapshotFile(tmp_path / 'missing', Metar).load() is None
@@ -0,0 +1,79 @@
+import asyncio
+import io
+import random
+
+from tfl.application_services.adds import iter_records
+from tfl.application_services.metar import MetarService
+from tfl.domain.services.spatial import SpatialIndex, distance_nm
+from tfl.infrastructure.http import HTTPClient
+from tfl.infrastructure.metar import MetarRepository
+from tests.test_adds import sample_xml
+
+
+def test_distance_nm():
+    # KLAX to KJFK is roughly 2150 nm
+    assert 2140 < distance_nm(33.9425, -118.4081, 40.6398, -73.7789) < 2160
+    assert distance_nm(10, 179.9, 10, -179.9) < 12
+
+
+def test_near_matches_brute_force():
+    rng = random.Random(7)
+    points = [(rng.uniform(-90, 90), rng.uniform(-180, 180), i) for i in range(2000)]
+    index = SpatialIndex(points)
+    for _ in range(50):
+        lat, lon = rng.uniform(-90, 90), rng.uniform(-180, 180)
+        radius = rng.choice([30, 300, 3000])
+        distances = sorted((distance_nm(lat, lon, a, b), i) for a, b, i in points)
+        assert [i for _, i in index.near(lat, lon, radius)] == [i for d, i in distances if d <= radius]
+        assert [i for _, i in index.near(lat, lon, limit=3)] == [i for _, i in distances[:3]]
+
+
+def test_within_crosses_antimeridian():
+    index = SpatialIndex([(10, 179.5, 'east'), (10, -179.5, 'west'), (10, 0, 'greenwich')])
+    assert sorted(index.within(5, 179, 15, -179)) == ['east', 'west']
+    assert index.within(5, -10, 15, 10) == ['greenwich']
+
+
+def test_metar_repository_near():
+    async def run():
+        repo = MetarRepository()
+        await MetarService(repo, HTTPClient())._ingest(iter_records(io.BytesIO(sample_xml), 'METAR'))
+        return await repo.near(33.8, -118.1, 10), await repo.near(0, 0, limit=1), await repo.near(0, 0, 10)
+
+    within, nearest, empty = asyncio.run(run())
+    assert [m.station_id for m in within] == ['KLGB']
+    # KSNA has no location in the sample so only KLGB is indexed
+    assert [m.station_id for m in nearest] == ['KLGB']
+    assert empty == []
+
+
+def test_metars_within_as_columns():
+    import gzip
+    import json
+    from tfl.application_services.metar import METAR_COLUMNS
+    from tfl.application_services.responses import accepts_gzip, columnar_body, compressed_response
+
+    async def run():
+        repo = MetarRepository()
+        await MetarService(repo, HTTPClient())._ingest(iter_records(io.BytesIO(sample_xml), 'METAR'))
+        return await repo.within(33, -119, 34, -118), await repo.within(0, 0, 1, 1)
+
+    within, empty = asyncio.run(run())
+    body = columnar_body(within, METAR_COLUMNS, ['station_id', 'latitude', 'flight_rule'], version=1)
+    assert json.loads(body) == {
+        'version': 1,
+        'count': 1,
+        'columns': {'station_id': ['KLGB'], 'latitude': [33.8117], 'flight_rule': ['VFR']},
+    }
+    assert empty == []
+    large = columnar_body(within * 100, METAR_COLUMNS, ['raw_text'])
+    response = compressed_response(large, 'gzip, deflate')
+    assert response.headers['content-encoding'] == 'gzip'
+    assert gzip.decompress(response.body) == large
+    assert 'content-encoding' not in compressed_response(body, 'gzip').headers
+    assert 'content-encoding' not in compressed_response(large, 'br, gzip;q=0').headers
+    assert accepts_gzip('deflate, GZIP;q=0.5')
+    assert accepts_gzip('*')
+    assert not accepts_gzip('gzip; q=0, *')
+    assert not accepts_gzip('identity')
+    assert not accepts_gzip('')
@@ -1,9 +1,11 @@
 from typing import Optional, List
 
+from fastapi import HTTPException
 from fastapi.routing import APIRouter
 from fastapi.responses import Response
 
 from tfl.domain.facilities import FAAPlate
+from tfl.domain.services.plate_catalog import StaleCursorError
 from tfl.domain.services.weather import get_best_plates
 from tfl.instances import metar_service, taf_service, airport_repository, dcs_service
 import io
@@ -32,25 +34,44 @@ async def airport_get(icao: str):
     return airport
 
 @router.get('/plates')
-async def plates_get_main(icao_only: bool = False, limit: int = 20, offset: int = 0):
-    airports = await airport_repository.all()
+async def plates_get_main(
+        response: Response,
+        icao_only: bool = False,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        code: Optional[str] = None,
+        cursor: Optional[str] = None
+):
+    """
+    Plates of every airport, or the ICAO identifiers of the airports with
+    plates, optionally of one chart code. Pages continue from the cursor in
+    the X-Next-Cursor header of the previous one, X-Total-Count is the number
+    of matching plates or identifiers.
+    """
+    catalog = airport_repository.plate_catalog
+    start = 0
+    if cursor is not None:
+        try:
+            start = catalog.position(cursor)
+        except StaleCursorError as e:
+            raise HTTPException(status_code=410, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
     if icao_only:
-        icaos = []
-        for airport in airports:
-            for plate in airport.plates:
-                if plate.icao not in icaos:
-                    icaos.append(plate.icao)
-        return icaos
-    plates: List[FAAPlate] = [plate for airport in airports for plate in airport.plates]
-    return plates[offset:limit+offset]
+        page = catalog.icao_page(start, offset, limit, code)
+    else:
+        page = catalog.plate_page(start, offset, limit if limit is not None else 20, code)
+    response.headers['X-Total-Count'] = str(page.total)
+    if page.next is not None:
+        response.headers['X-Next-Cursor'] = catalog.cursor(page.next)
+    return page.items
 
 @router.get('/plates/{icao}')
 async def plates_get(icao: str, name: Optional[str] = None) -> List[FAAPlate]:
+    if name is not None:
+        return await airport_repository.search_plates(icao, name)
     airport = await airport_repository.find(icao)
-    plates = airport.plates
-    if name is None:
-        return plates
-    return [p for p in plates if name.lower() in p.name.lower()]
+    return airport.plates
 
 @router.get('/dcs/{icao}')
 async def dcs_get(icao: str) -> list[io.BytesIO]:
@@ -0,0 +1,31 @@
+from fastapi import HTTPException, Query
+from fastapi.routing import APIRouter
+from tfl.instances import airport_repository
+from tfl.domain.facilities import Airport
+
+router = APIRouter()
+
+
+async def resolve_point(lat: float | None, lon: float | None, icao: str | None) -> tuple[float, float]:
+    """
+    The point a nearby query is centered on. Either given directly or the
+    location of an airport.
+    """
+    if icao is not None:
+        airport = await airport_repository.find(icao)
+        return float(airport.latitude), float(airport.longitude)
+    if lat is None or lon is None:
+        raise HTTPException(status_code=422, detail="Either lat and lon or icao is required")
+    return lat, lon
+
+
+@router.get("/airports/near", response_model=list[Airport], response_model_exclude={'plates'})
+async def list_airports_near(
+        lat: float | None = Query(None, ge=-90, le=90),
+        lon: float | None = Query(None, ge=-180, le=180),
+        icao: str | None = None,
+        radius: float | None = Query(None, gt=0, description="Search radius in nautical miles"),
+        limit: int = Query(50, ge=1, le=500)
+):
+    latitude, longitude = await resolve_point(lat, lon, icao)
+    return await airport_repository.near(latitude, longitude, radius, limit)
@@ -1,30 +1,74 @@
+from datetime import datetime
+
+from fastapi import HTTPException, Query, Request
 from fastapi.routing import APIRouter
-from tfl.instances import metar_repository
-from tfl.domain.weather import Metar
+from tfl.api_v2.airports import resolve_point
+from tfl.application_services.metar import METAR_COLUMNS
+from tfl.application_services.responses import columnar_body, compressed_response
+from tfl.instances import metar_repository, metar_responses, metar_service
+from tfl.domain.weather import Metar, MetarOrder
 
 router = APIRouter()
 
 @router.get("/metars", response_model=list[Metar])
-async def list_metars(offset: int = 0, limit: int = 50, stations: str | None = None):
-    return await metar_repository.all(offset, limit, stations)
+async def list_metars(offset: int = 0, limit: int = 50, stations: str | None = None, sort: MetarOrder | None = None):
+    return metar_responses.list_response(await metar_repository.all(offset, limit, stations, sort))
 
 @router.get('/metars/longest', response_model=list[Metar])
 async def list_longest_metars(offset: int = 0, limit: int = 10, stations: str | None = None):
-    sorting = (lambda o: len(o.raw_text), True)
-    return await metar_repository.all(
+    return metar_responses.list_response(await metar_repository.all(
         offset=offset, 
         limit=limit, 
         stations=stations, 
-        sorting=sorting
-    )
+        sorting=MetarOrder.longest
+    ))
+
+@router.get("/metars/snapshot")
+async def get_metar_snapshot():
+    info = metar_repository.snapshot.info()
+    info['responses_version'] = metar_responses.version
+    return info
+
+@router.get("/metars/near", response_model=list[Metar])
+async def list_metars_near(
+        lat: float | None = Query(None, ge=-90, le=90),
+        lon: float | None = Query(None, ge=-180, le=180),
+        icao: str | None = None,
+        radius: float | None = Query(None, gt=0, description="Search radius in nautical miles"),
+        limit: int = Query(50, ge=1, le=500)
+):
+    latitude, longitude = await resolve_point(lat, lon, icao)
+    return metar_responses.list_response(await metar_repository.near(latitude, longitude, radius, limit))
+
+@router.get("/metars/bbox")
+async def get_metars_bbox(
+        request: Request,
+        south: float = Query(..., ge=-90, le=90),
+        west: float = Query(..., ge=-180, le=180),
+        north: float = Query(..., ge=-90, le=90),
+        east: float = Query(..., ge=-180, le=180),
+        fields: str = Query('station_id,latitude,longitude,flight_rule', description=', '.join(METAR_COLUMNS))
+):
+    names = [name.strip() for name in fields.split(',') if name.strip()]
+    unknown = [name for name in names if name not in METAR_COLUMNS]
+    if unknown or not names:
+        raise HTTPException(status_code=422, detail=f"Unknown fields {unknown}. Available: {', '.join(METAR_COLUMNS)}")
+    if south > north:
+        raise HTTPException(status_code=422, detail="south must not be greater than north")
+    version = metar_repository.snapshot.version
+    metars = await metar_repository.within(south, west, north, east)
+    body = columnar_body(metars, METAR_COLUMNS, names, version=version)
+    return compressed_response(body, request.headers.get('accept-encoding', ''))
 
 @router.get("/metars/{icao}", response_model=list[Metar])
 
-async def get_icao_metars(icao: str):
-    # TODO: Store multiple metars. Simulate response
-    return [await metar_repository.find(icao)]
+async def get_icao_metars(icao: str, start: datetime | None = None, end: datetime | None = None):
+    if start is None and end is None:
+        # Without a time range only the current report is listed
+        return metar_responses.list_response([await metar_repository.find(icao)])
+    return metar_responses.list_response(await metar_service.metar_history(icao, start, end))
 
 @router.get("/metars/{icao}/latest", response_model=Metar)
 async def get_icao_latest_metar(icao: str):
-    return await metar_repository.find(icao)
+    return metar_responses.response(await metar_repository.find(icao))
 
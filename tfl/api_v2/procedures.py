@@ -6,9 +6,8 @@ router = APIRouter()
 
 @router.get("/procedures/{icao}")
 async def list_icao_procedures(icao: str, name: str | None = None):
-    airport = await airport_repository.find(icao)
-    procedures = airport.plates
     if name is not None:
-        procedures = [p for p in procedures if name.lower() in p.name.lower()]
-    return procedures
+        return await airport_repository.search_plates(icao, name)
+    airport = await airport_repository.find(icao)
+    return airport.plates
 
@@ -1,29 +1,38 @@
+from datetime import datetime
+
 from fastapi.routing import APIRouter
-from tfl.instances import taf_repository
-from tfl.domain.weather import TAF
+from tfl.instances import taf_repository, taf_responses, taf_service
+from tfl.domain.weather import TAF, TAFOrder
 
 router = APIRouter()
 
 @router.get("/tafs", response_model=list[TAF])
-async def list_tafs(offset: int = 0, limit: int = 50, stations: str | None = None):
-    return await taf_repository.all(offset, limit, stations)
+async def list_tafs(offset: int = 0, limit: int = 50, stations: str | None = None, sort: TAFOrder | None = None):
+    return taf_responses.list_response(await taf_repository.all(offset, limit, stations, sort))
 
 @router.get('/tafs/longest', response_model=list[TAF])
 async def list_longest_tafs(offset: int = 0, limit: int = 10, stations: str | None = None):
-    sorting = (lambda o: len(o.raw_text), True)
-    return await taf_repository.all(
+    return taf_responses.list_response(await taf_repository.all(
         offset=offset, 
         limit=limit, 
         stations=stations, 
-        sorting=sorting
-    )
+        sorting=TAFOrder.longest
+    ))
+
+@router.get("/tafs/snapshot")
+async def get_taf_snapshot():
+    info = taf_repository.snapshot.info()
+    info['responses_version'] = taf_responses.version
+    return info
 
 @router.get("/tafs/{icao}", response_model=list[TAF])
 
-async def get_icao_tafs(icao: str):
-    # TODO: Store multiple metars. Simulate response
-    return [await taf_repository.find(icao)]
+async def get_icao_tafs(icao: str, start: datetime | None = None, end: datetime | None = None):
+    if start is None and end is None:
+        # Without a time range only the current report is listed
+        return taf_responses.list_response([await taf_repository.find(icao)])
+    return taf_responses.list_response(await taf_service.taf_history(icao, start, end))
 
 @router.get("/tafs/{icao}/latest", response_model=TAF)
 async def get_icao_latest_taf(icao: str):
-    return await taf_repository.find(icao)
\ No newline at end of file
+    return taf_responses.response(await taf_repository.find(icao))
\ No newline at end of file
@@ -1,30 +1,154 @@
-from typing import Callable, Optional, List, Dict
+from typing import Callable, Optional, List, Dict, Any, BinaryIO, Iterator, Union
 
 import asyncio
+from concurrent.futures import Executor
 from datetime import datetime
 import logging
 import time
 from dataclasses import dataclass
+from xml.etree import ElementTree as ET
 
 import htmllistparse
 
+from tfl.infrastructure.http import HTTPClient
+
 log = logging.getLogger(__name__)
 
 #DEFAULT_ADDS_PATH = 'https://aviationweather.gov/adds/dataserver_current/current/'
 DEFAULT_ADDS_PATH = 'https://aviationweather.gov/data/cache/'
 
 
+def element_to_dict(elem: ET.Element) -> Union[Dict[str, Any], str, None]:
+    """
+    Converts a single element into the same structure xmltodict produces for it.
+    Attributes are prefixed with '@', repeated children become lists and
+    text-only elements collapse to their stripped text.
+    Parameters
+    ----------
+    elem
+        The element to convert
+    Returns
+    -------
+    Union[Dict[str, Any], str, None]
+
+    """
+    text = elem.text.strip() if elem.text else ''
+    if not elem.attrib and len(elem) == 0:
+        return text or None
+    data: Dict[str, Any] = {f"@{k}": v for k, v in elem.attrib.items()}
+    for child in elem:
+        value = element_to_dict(child)
+        if child.tag not in data:
+            data[child.tag] = value
+        elif isinstance(data[child.tag], list):
+            data[child.tag].append(value)
+        else:
+            data[child.tag] = [data[child.tag], value]
+    if text:
+        data['#text'] = text
+    return data
+
+
+def iter_records(source: BinaryIO, tag: str) -> Iterator[Dict[str, Any]]:
+    """
+    Incrementally parses an ADDS cache document and yields each record element
+    as a dictionary as soon as its closing tag has been read. Processed elements
+    are detached from the tree so memory does not grow with the document size.
+    Parameters
+    ----------
+    source
+        A file-like object such as the GzipFile of a cache file
+    tag
+        The record tag to yield, ie: METAR or TAF
+    Returns
+    -------
+    Iterator[Dict[str, Any]]
+
+    """
+    parents: List[ET.Element] = []
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            parents.append(elem)
+            continue
+        parents.pop()
+        if elem.tag == tag:
+            yield element_to_dict(elem)
+            if parents:
+                parents[-1].remove(elem)
+
+
+async def run_batch(func: Callable[..., List[Any]], batch: List[Any], executor: Optional[Executor] = None, *args) -> List[Any]:
+    """
+    Runs a batch parsing function either inline or in an executor so the
+    event loop can keep serving requests during an ingest.
+    Parameters
+    ----------
+    func
+        A picklable function that takes the batch as its first argument
+    batch
+        The raw records to parse
+    executor
+        The executor to run in. When None the batch is parsed inline.
+    args
+        Additional arguments passed to func
+    Returns
+    -------
+    List[Any]
+
+    """
+    if executor is None:
+        return func(batch, *args)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, func, batch, *args)
+
+
+@dataclass
+class IngestStats:
+    """Counters describing how a polling cycle changed a repository."""
+    changed: int = 0
+    unchanged: int = 0
+    new: int = 0
+    removed: int = 0
+    # Timestamps of the parsed records that fell back to dateutil
+    time_fallbacks: int = 0
+
+    @property
+    def total(self) -> int:
+        """Records seen in the cycle."""
+        return self.changed + self.unchanged + self.new
+
+
 @dataclass
 class PollingFile:
     path: str
     name: str
     callback: Callable
     last_polled: Optional[datetime] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
 
     @property
     def filename(self):
         return self.path + self.name
 
+    @property
+    def conditional_headers(self) -> Dict[str, str]:
+        """
+        Request headers that let the server answer 304 Not Modified if the
+        file has not changed since it was last downloaded.
+        """
+        headers = {}
+        if self.etag is not None:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified is not None:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def reset_validators(self):
+        """Forget the cached validators so the next fetch downloads the file."""
+        self.etag = None
+        self.last_modified = None
+
 
 class ADDSPolling:
     """
@@ -32,11 +156,13 @@ class ADDSPolling:
     Aviation Weather ADDS server.
     """
 
-    def __init__(self, path=None, delay=5*60, loop=None):
+    def __init__(self, http: HTTPClient, path=None, delay=5*60, loop=None):
         """
 
         Parameters
         ----------
+        http
+            The shared HTTP client used to download files.
         path
             The path to the directory listing. This relies on Apache style
             directory listings.
@@ -46,6 +172,7 @@ class ADDSPolling:
             The event loop
         """
         self.path = path or DEFAULT_ADDS_PATH
+        self.http = http
         self.loop: asyncio.AbstractEventLoop = loop if loop is not None else asyncio.get_event_loop()
         self.task: Optional[asyncio.Task] = None
         self.delay = delay
@@ -76,6 +203,33 @@ class ADDSPolling:
         )
         self._polling_files.append(o)
 
+    async def fetch(self, polling_file: PollingFile) -> Optional[bytes]:
+        """
+        Conditionally downloads a polled file using the ETag and Last-Modified
+        validators from the previous download.
+        Parameters
+        ----------
+        polling_file
+            The PollingFile to fetch
+        Returns
+        -------
+        Optional[bytes]
+            The file contents or None if the server reports it has not been
+            modified.
+
+        """
+        session = self.http.session
+        async with session.get(polling_file.filename, headers=polling_file.conditional_headers) as response:
+            if response.status == 304:
+                log.debug(f"{polling_file.filename} not modified. Skipping")
+                return
+            response.raise_for_status()
+            data = await response.read()
+            polling_file.etag = response.headers.get('ETag')
+            polling_file.last_modified = response.headers.get('Last-Modified')
+            polling_file.last_polled = datetime.utcnow()
+            return data
+
     def _file_entry(self, file_entry: htmllistparse.FileEntry):
         """
         We use a third-party library to help parse the directory structure of
@@ -137,7 +291,13 @@ class ADDSPolling:
                     # call back
                     #await polling_file.callback(polling_file, **kwargs)
                 # Quick fix to just poll cache files on delay due to aviationweather.gov change 10/16/23
-                await polling_file.callback(polling_file, **kwargs)
+                # Callbacks use fetch() so unchanged files are skipped with a 304.
+                try:
+                    await polling_file.callback(polling_file, **kwargs)
+                except Exception:
+                    # Make sure a failed ingest is retried with a full download
+                    polling_file.reset_validators()
+                    raise
         except Exception as e:
             log.error(e,exc_info=True)
             self.last_polling_succeeded = False
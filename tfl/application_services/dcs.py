@@ -3,7 +3,6 @@ from __future__ import annotations
 from datetime import date, timedelta
 import asyncio
 import pathlib
-import aiohttp
 import io
 import logging
 from functools import partial
@@ -14,6 +13,7 @@ from dataclasses import dataclass
 from typing import Generator
 import os
 from tfl import pdf
+from tfl.infrastructure.http import HTTPClient
 import aiofiles
 
 log = logging.getLogger(__name__)
@@ -43,14 +43,13 @@ def get_schedule(query_date: date, offset = 0) -> date:
     key_date = _start_date + timedelta(days=56 * cycle)
     return key_date
 
-async def download_dcs(edition_date: date, path: str) -> str:
+async def download_dcs(edition_date: date, path: str, http: HTTPClient) -> str:
     url = _download_mapping[edition_date]
     fn = _folder_fmt.format(edition_date=date_to_string(edition_date)) + ".zip"
-    async with aiohttp.ClientSession(raise_for_status=True) as session:
-        async with session.get(url) as response:
-            async with aiofiles.open(path / fn, 'wb') as f:
-                async for chunk in response.content.iter_chunked(1024*4):
-                    await f.write(chunk)
+    async with http.session.get(url, raise_for_status=True) as response:
+        async with aiofiles.open(path / fn, 'wb') as f:
+            async for chunk in response.content.iter_chunked(1024*4):
+                await f.write(chunk)
     return path / fn
 
 
@@ -76,14 +75,14 @@ def editions_available(path, query_date: date = date.today()) -> Generator[date,
     if not edition_path(next).exists() and next - timedelta(days=cycle_publish_days) <= query_date:
         yield next
     
-async def _poll(path: pathlib.Path):
+async def _poll(path: pathlib.Path, http: HTTPClient):
     while True:
         log.info("Polling for DCS updates")
         query = date.today()
         prior_path = _edition_path(get_schedule(query, offset=-1), path)
         for edition_date in editions_available(path):
             log.info(f"Downloading DCS {date_to_string(edition_date)}")
-            zip_path = await download_dcs(edition_date, path)
+            zip_path = await download_dcs(edition_date, path, http)
             _subfolder = _folder_fmt.format(edition_date=date_to_string(edition_date))
             catalogue_dcs(path / _subfolder, zip_path)
             os.remove(zip_path)
@@ -103,8 +102,8 @@ def _dcs_task_done(task: asyncio.Task):
     else:
         log.info("DCS polling task completed successfully.")
 
-def start_polling_dcs(edition_path: pathlib.Path) -> asyncio.Task:
-    task = asyncio.create_task(_poll(edition_path))
+def start_polling_dcs(edition_path: pathlib.Path, http: HTTPClient) -> asyncio.Task:
+    task = asyncio.create_task(_poll(edition_path, http))
     task.add_done_callback(_dcs_task_done)
     return task
 
@@ -7,15 +7,26 @@ from typing import Union, Optional
 import dateutil.relativedelta
 import aiohttp
 
+from tfl.application_services.loop_blocking import LoopBlocking
 from tfl.domain.facilities import DTPPHeader
-from tfl.domain.services.dtpp import get_dtpp_header
+from tfl.domain.services.dtpp import DTPPHeaderCache
+from tfl.infrastructure.http import HTTPClient
+from tfl.infrastructure.plate_index import index_path
 import logging
 
 log = logging.getLogger(__name__)
 
+# Longest sleep of the polling task, so the next cycle is staged soon after
+# it is published instead of at the switchover
+STAGE_POLLING_SECONDS = 6 * 60 * 60
+# Sleep of the polling task after a failed poll
+RETRY_POLLING_SECONDS = 10 * 60
+
 class DTPPVersionFile:
-    def __init__(self, cached_files_path: pathlib.Path, from_date = datetime.utcnow(), override_version: Optional[int] = None):
+    def __init__(self, cached_files_path: pathlib.Path, http: HTTPClient, from_date = datetime.utcnow(), override_version: Optional[int] = None, headers: Optional[DTPPHeaderCache] = None):
         self._cached_files_path = cached_files_path
+        self._http = http
+        self._headers = headers if headers is not None else DTPPHeaderCache()
         self._from_date = from_date
         self._remote_path = "https://aeronav.faa.gov/d-tpp/{version_date}/xml_data/d-tpp_Metafile.xml"
         if override_version:
@@ -23,7 +34,6 @@ class DTPPVersionFile:
         else:
             self.value = int(self._from_date.strftime("%y%m"))
         self.file_path = self._cached_files_path / f"DTPP_{self.value}.xml"
-        self.file_exists = self.file_path.exists()
         self.month_value = int(str(self.value)[2:])
         self.year_value = int(str(self.value)[:2])
 
@@ -32,56 +42,101 @@ class DTPPVersionFile:
     def previous(self) -> 'DTPPVersionFile':
         return self.__class__(
             cached_files_path=self._cached_files_path,
-            from_date=self._from_date + dateutil.relativedelta.relativedelta(months=-1)
+            from_date=self._from_date + dateutil.relativedelta.relativedelta(months=-1),
+            http=self._http,
+            headers=self._headers
         )
 
     @property
     def next(self) -> 'DTPPVersionFile':
         return self.__class__(
             cached_files_path=self._cached_files_path,
-            from_date=self._from_date + dateutil.relativedelta.relativedelta(months=1)
+            from_date=self._from_date + dateutil.relativedelta.relativedelta(months=1),
+            http=self._http,
+            headers=self._headers
         )
     def override_version(self, number: int) -> 'DTPPVersionFile':
         return self.__class__(
             cached_files_path=self._cached_files_path,
-            override_version=number
+            override_version=number,
+            http=self._http,
+            headers=self._headers
         )
-    def read_header(self) -> Optional[DTPPHeader]:
-        return get_dtpp_header(self.file_path)
 
+    @property
+    def file_exists(self) -> bool:
+        return self.file_path.exists()
+
+    async def exists(self) -> bool:
+        return await asyncio.to_thread(self.file_path.exists)
 
+    def read_header(self) -> Optional[DTPPHeader]:
+        return self._headers.get(self.file_path)
 
+    async def header(self) -> Optional[DTPPHeader]:
+        """
+        The header of the cycle's metafile, read in a thread unless it is
+        cached for the current file.
+        """
+        return await asyncio.to_thread(self.read_header)
 
     @property
     def is_valid(self):
-        header = get_dtpp_header(self.file_path)
+        header = self.read_header()
         return header and header.is_valid
 
+    @property
+    def is_expired(self):
+        """
+        Whether the cycle has ended. A staged upcoming cycle is not valid
+        yet but is not expired either.
+        """
+        header = self.read_header()
+        return header is None or header.is_expired
+
     def get(self):
         with self.file_path.open(mode='r') as f:
             return f.read()
 
     async def fetch_and_save(self, force_remote: bool = False) -> str:
-        async with aiohttp.ClientSession(raise_for_status=True) as session:
-            async with session.get(self._remote_path.format(version_date=self.value)) as resp:
-                data = await resp.text()
-                with self.file_path.open(mode='w') as f:
-                    f.write(data)
-                return data
+        session = self._http.session
+        async with session.get(self._remote_path.format(version_date=self.value), raise_for_status=True) as resp:
+            data = await resp.text()
+            await asyncio.to_thread(self._save, data)
+            return data
+
+    def _save(self, data: str):
+        # Written next to the file and renamed over it so a worker
+        # following the ingest never reads half a file
+        partial = self.file_path.with_name(f"{self.file_path.name}.partial")
+        with partial.open(mode='w') as f:
+            f.write(data)
+        os.replace(partial, self.file_path)
+
+    @property
+    def index_path(self) -> pathlib.Path:
+        return index_path(self.file_path)
 
     def remove_cached_file(self):
         self.file_path.unlink(missing_ok=True)
+        self.index_path.unlink(missing_ok=True)
+        self._headers.discard(self.file_path)
 
 
 class DTPPService:
 
-    def __init__(self, cached_files_path: pathlib.Path):
+    def __init__(self, cached_files_path: pathlib.Path, http: HTTPClient):
         self.cached_files_path = cached_files_path
+        self.http = http
         self._callbacks = []
+        self._stage_callbacks = []
         self._task: Optional[asyncio.Task] = None
         self.path = "https://aeronav.faa.gov/d-tpp/{version_date}/xml_data/d-tpp_Metafile.xml"
         self.current_valid_header: Optional[DTPPHeader] = None
-        self.clean_cache()
+        self.staged_header: Optional[DTPPHeader] = None
+        self.headers = DTPPHeaderCache()
+        # How long the last poll held the event loop
+        self.last_poll_blocking: Optional[LoopBlocking] = None
 
     def _task_callback(self, task: asyncio.Future):
         try:
@@ -98,21 +153,33 @@ class DTPPService:
     def register_callback(self, func):
         self._callbacks.append(func)
 
+    def register_stage_callback(self, func):
+        """
+        Registers a callback awaited with the header and version of the next
+        cycle once it is published, ahead of its switchover.
+        """
+        self._stage_callbacks.append(func)
+
     def save_xml(self, version: int, data: str):
         with self.cached_filepath(version).open(mode='w') as f:
             f.write(data)
 
     @property
     def version(self):
-        return DTPPVersionFile(cached_files_path=self.cached_files_path)
+        return DTPPVersionFile(cached_files_path=self.cached_files_path, http=self.http, headers=self.headers)
 
     def get_version(self, version: Union[int, str]) -> DTPPVersionFile:
         try:
             dt = datetime.strptime(str(version), "%y%m")
-            version_file = DTPPVersionFile(cached_files_path=self.cached_files_path, from_date=dt)
+            version_file = DTPPVersionFile(
+                cached_files_path=self.cached_files_path, from_date=dt, http=self.http, headers=self.headers
+            )
         except ValueError:
             # Unstandard 13 period
-            version_file = DTPPVersionFile(cached_files_path=self.cached_files_path, override_version=int(version))
+            version_file = DTPPVersionFile(
+                cached_files_path=self.cached_files_path, override_version=int(version), http=self.http,
+                headers=self.headers
+            )
         return version_file
 
 
@@ -120,15 +187,26 @@ class DTPPService:
     def cached_versions(self):
         return [self.get_version(fn.name.split('_')[1][:-4]) for fn in self.cached_files_path.glob("DTPP_*.xml")]
 
-    def clean_cache(self):
-        for version_cache in [cv for cv in self.cached_versions if not cv.is_valid]:
-                version_cache.remove_cached_file()
+    def _clean_cache(self):
+        for version_cache in [cv for cv in self.cached_versions if cv.is_expired]:
+            log.info(f"Removing expired DTPP {version_cache.file_path.name}")
+            version_cache.remove_cached_file()
 
-    def valid_version_from_file(self) -> Optional[DTPPVersionFile]:
+    async def clean_cache(self):
+        """
+        Removes the cached metafiles of cycles that have ended. The staged
+        next cycle is kept.
+        """
+        await asyncio.to_thread(self._clean_cache)
+
+    def _valid_version_from_file(self) -> Optional[DTPPVersionFile]:
         for version in self.cached_versions:
             if version.is_valid:
                 return version
 
+    async def valid_version_from_file(self) -> Optional[DTPPVersionFile]:
+        return await asyncio.to_thread(self._valid_version_from_file)
+
     async def _notify(self, header: DTPPHeader, version: DTPPVersionFile):
         log.info("Notifying observers of DTPP update")
         for cb in self._callbacks:
@@ -137,41 +215,83 @@ class DTPPService:
     async def _poll(self) -> (DTPPHeader, DTPPVersionFile):
         log.info("Polling for DTPP Updates")
         # Pull possibly the next months and have it ready
-        if not self.version.file_exists:
-            await self.version.fetch_and_save()
+        version = self.version
+        if not await version.exists():
+            await version.fetch_and_save()
 
         # Find the current
         version = await self.seek_valid_version()
-        header = version.read_header()
+        header = await version.header()
         return header, version
 
+    async def _stage_next(self, version: DTPPVersionFile):
+        if not self._stage_callbacks:
+            return
+        upcoming = version.next
+        if upcoming.file_path == version.file_path:
+            return
+        if not await upcoming.exists():
+            try:
+                await upcoming.fetch_and_save()
+            except aiohttp.ClientError as e:
+                log.debug(f"Next DTPP cycle {upcoming.value} is not available yet: {e}")
+                return
+        header = await upcoming.header()
+        if header is None or header == self.staged_header or header.valid_from <= datetime.now(timezone.utc):
+            return
+        log.info(f"Staging DTPP cycle {header.cycle} valid from {header.valid_from}")
+        for cb in self._stage_callbacks:
+            await cb(header, upcoming)
+        # Only set once every callback succeeded, so a failure is retried
+        self.staged_header = header
+
+    async def _poll_and_notify(self) -> DTPPHeader:
+        header, version = await self._poll()
+        if header != self.current_valid_header:
+            await self._notify(header, version)
+            self.current_valid_header = header
+        try:
+            await self._stage_next(version)
+        except Exception:
+            # The current cycle is still polled and switched over
+            log.exception("Staging the next DTPP cycle failed, retrying at the next poll")
+        return header
+
     async def _polling_task(self):
+        await self.clean_cache()
         while True:
-            header, version = await self._poll()
-            if header != self.current_valid_header:
-                self.current_valid_header = header
-                await self._notify(header, version)
+            blocking = LoopBlocking()
+            parsed = self.headers.parsed
+            try:
+                header = await blocking.measure(self._poll_and_notify())
+            except Exception:
+                log.exception(f"DTPP poll failed, retrying in {RETRY_POLLING_SECONDS}s")
+                await asyncio.sleep(RETRY_POLLING_SECONDS)
+                continue
+            self.last_poll_blocking = blocking
+            log.info(f"DTPP poll blocked the event loop for {blocking}, "
+                     f"{self.headers.parsed - parsed} metafile headers parsed")
             now = datetime.now(timezone.utc)
             next_polling_seconds = (header.valid_to - now).total_seconds() + 10
-            await asyncio.sleep(next_polling_seconds)
+            await asyncio.sleep(min(next_polling_seconds, STAGE_POLLING_SECONDS))
 
-    def header_is_valid(self, version: DTPPVersionFile):
-        header = version.read_header()
+    async def header_is_valid(self, version: DTPPVersionFile):
+        header = await version.header()
         return header and header.is_valid
-    
+
     async def seek_valid_version(self):
         version = self.version
         for i in range(2):
-            if not version.file_exists:
+            if not await version.exists():
                 await version.fetch_and_save()
-            if self.header_is_valid(version):
+            if await self.header_is_valid(version):
                 return version
             else:
                 now = datetime.now(timezone.utc)
-                header = version.read_header()
+                header = await version.header()
                 version = version.next if now > header.valid_to else version.previous
                 log.debug(f"Else version is: {version.file_path}")
-                if self.header_is_valid(version):
+                if await self.header_is_valid(version):
                     log.debug("shows as valid")
                     return version
                 elif version.previous.month_value == 12:
@@ -181,12 +301,25 @@ class DTPPService:
                     log.debug(f"trying {version.file_path}")
                     try:
                         await version.fetch_and_save()
-                        if self.header_is_valid(version):
+                        if await self.header_is_valid(version):
                             return version
                     except aiohttp.ClientResponseError:
                         continue              
         raise RuntimeError("No Valid version found")
 
+    async def refresh(self):
+        """
+        Notifies observers when a valid cycle saved by another process, the
+        ingest leader, replaces the current one. Nothing is downloaded.
+        """
+        version = await self.valid_version_from_file()
+        if version is None:
+            return
+        header = await version.header()
+        if header != self.current_valid_header:
+            self.current_valid_header = header
+            await self._notify(header, version)
+
     def start(self):
         if self._task:
             return
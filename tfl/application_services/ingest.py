@@ -0,0 +1,86 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+from tfl.infrastructure.lock import FileLock
+
+log = logging.getLogger(__name__)
+
+
+class IngestCoordinator:
+    """
+    Elects one of the workers sharing a data directory to poll ADDS, DTPP and
+    the chart supplements. The leader saves what it ingests to the data
+    directory and the other workers follow by reloading it, so N workers do
+    not download and parse everything N times. A follower takes over when the
+    leader exits and releases the lock.
+    """
+
+    def __init__(
+            self,
+            lock: Optional[FileLock],
+            lead: Callable[[], Awaitable[None]],
+            follow: Callable[[], Awaitable[None]],
+            interval: float = 15
+    ):
+        """
+
+        Parameters
+        ----------
+        lock
+            The lock held by the leader. Without one this process always
+            leads.
+        lead
+            Starts the pollers
+        follow
+            Reloads what the leader saved
+        interval
+            Seconds between a follower's reloads and attempts to take over
+        """
+        self.lock = lock
+        self.lead = lead
+        self.follow = follow
+        self.interval = interval
+        self.is_leader = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self.lock is None or self.lock.acquire():
+            await self._lead()
+            return
+        log.info("Following the ingest of another worker")
+        await self._follow()
+        self._task = asyncio.create_task(self._following_task())
+
+    async def _lead(self):
+        self.is_leader = True
+        log.info("Leading the ingest")
+        await self.lead()
+
+    async def _follow(self):
+        try:
+            await self.follow()
+        except Exception:
+            log.exception("Could not reload the ingest of the leader")
+
+    async def _following_task(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if self.lock.acquire():
+                try:
+                    await self._lead()
+                    return
+                except Exception:
+                    # Another worker may manage to lead, this one keeps following
+                    log.exception("Could not take over the ingest, releasing the lock")
+                    self.lock.release()
+                    self.is_leader = False
+            await self._follow()
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self.lock is not None:
+            self.lock.release()
+        self.is_leader = False
@@ -0,0 +1,56 @@
+import time
+import types
+from dataclasses import dataclass
+from typing import Any, Coroutine, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class LoopBlocking:
+    """
+    How long a coroutine held the event loop: the time of each step it ran
+    between two awaits. Work it awaits in a thread is not counted.
+    """
+    total: float = 0.0
+    longest: float = 0.0
+    steps: int = 0
+
+    def add(self, elapsed: float):
+        self.total += elapsed
+        self.longest = max(self.longest, elapsed)
+        self.steps += 1
+
+    async def measure(self, coro: Coroutine[Any, Any, T]) -> T:
+        """
+        Awaits a coroutine, timing every step of it.
+        """
+        return await _timed(coro, self)
+
+    def __str__(self) -> str:
+        return f"{self.total * 1e3:.1f}ms in {self.steps} steps, longest {self.longest * 1e3:.1f}ms"
+
+
+@types.coroutine
+def _timed(coro: Coroutine, blocking: LoopBlocking):
+    # Drives the coroutine like a task would, passing what it awaits up to
+    # the real task and the results back in
+    value, error = None, None
+    while True:
+        start = time.perf_counter()
+        try:
+            if error is not None:
+                awaited = coro.throw(error)
+            else:
+                awaited = coro.send(value)
+        except StopIteration as e:
+            blocking.add(time.perf_counter() - start)
+            return e.value
+        except BaseException:
+            blocking.add(time.perf_counter() - start)
+            raise
+        blocking.add(time.perf_counter() - start)
+        try:
+            value, error = (yield awaited), None
+        except BaseException as e:
+            value, error = None, e
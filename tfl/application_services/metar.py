@@ -1,39 +1,169 @@
+import asyncio
 import io
+from concurrent.futures import Executor
 from gzip import GzipFile
-from typing import Callable, Union
+from typing import Callable
 
-import aiohttp
 import xmltodict
-from dateutil.parser import parse
 
-from tfl.application_services.adds import ADDSPolling, PollingFile
-from tfl.domain.exceptions import EntityExistsError, EntityNotFoundError
+from tfl.application_services.adds import ADDSPolling, PollingFile, IngestStats, iter_records, run_batch
+from tfl.application_services.responses import ResponseCache
+from tfl.infrastructure.history import WeatherHistory
+from tfl.infrastructure.snapshot_file import SnapshotFile
+from tfl.domain.core import Snapshot
+from tfl.infrastructure.http import HTTPClient
+from tfl.domain.exceptions import EntityNotFoundError
 from tfl.domain.factories.weather import WeatherFactory
 from tfl.domain.interfaces.weather import IMetarRepository
-from tfl.domain.remarks import remarks_pipeline
-from tfl.domain.services.weather import string_to_decimal_rounded
+from tfl.domain.remarks import parse_remarks
+from tfl.domain.services import weather as weather_services
+from tfl.domain.services.weather import as_utc, parse_adds_time, string_to_decimal_rounded
 from tfl.domain.weather import *
 from tfl.domain.weather_translations import *
 from tfl.infrastructure.metar import MetarRepository
 import re
 import logging
+from xml.etree.ElementTree import ParseError
 
 log = logging.getLogger(__name__)
 
 REMARKS_PATTERN = re.compile(r"RMK (.+)")
+
+# Value of each column the columnar METAR endpoints can return for a Metar
+METAR_COLUMNS: t.Dict[str, Callable[[Metar], t.Any]] = {
+    'station_id': lambda m: m.station_id,
+    'latitude': lambda m: float(m.location.latitude) if m.location else None,
+    'longitude': lambda m: float(m.location.longitude) if m.location else None,
+    'flight_rule': lambda m: m.flight_rule.code if m.flight_rule else None,
+    'time': lambda m: m.time.isoformat(),
+    'raw_text': lambda m: m.raw_text,
+    'temperature': lambda m: float(m.temperature.celsius) if m.temperature else None,
+    'dewpoint': lambda m: float(m.dewpoint.celsius) if m.dewpoint else None,
+    'wind_dir': lambda m: m.wind.dir if m.wind else None,
+    'wind_speed': lambda m: m.wind.at if m.wind else None,
+    'wind_gust': lambda m: m.wind.gusting if m.wind else None,
+    'visibility': lambda m: float(m.visibility.sm) if m.visibility else None,
+    'altimeter': lambda m: float(m.altimeter.inhg) if m.altimeter else None,
+}
 class BadResponseError(Exception):
     pass
 
 
+def parse_metar(m: t.Dict[str, t.Any], last_polling_succeeded: bool = True) -> Metar:
+    latitude = m.get('latitude')
+    longitude = m.get('longitude')
+    altimeter = m.get('altim_in_hg')
+    wx_string = m.get('wx_string', "")
+    wx_codes = WeatherFactory.wx_codes(wx_string)
+    flight_rule = m.get('flight_category')
+    sky_condition = WeatherFactory.sky_condition(m)
+    visibility = WeatherFactory.visibility(m)
+    wind = WeatherFactory.wind(m)
+    temp = WeatherFactory.temperature(m)
+    dewpoint = WeatherFactory.dewpoint(m)
+    if flight_rule is not None:
+        flight_rule = FlightRule(code=flight_rule, text=wx_flight_rules[flight_rule])
+
+    location = None
+    if latitude is not None and longitude is not None:
+        location = Point(latitude=latitude, longitude=longitude)
+    if altimeter is not None:
+        inhg = string_to_decimal_rounded(altimeter, precision='0.01')
+        altimeter = AltimeterSetting(inhg=inhg)
+    remark_match = re.search(REMARKS_PATTERN, m['raw_text'])
+    remarks_text = remark_match.groups()[0] if remark_match is not None else ''
+    remarks = parse_remarks(remarks_text)
+    metar = Metar(
+        raw_text=m['raw_text'],
+        station_id=m['station_id'],
+        time=parse_adds_time(m['observation_time']),
+        location=location,
+        temperature=temp,
+        visibility=visibility,
+        wind=wind,
+        altimeter=altimeter,
+        dewpoint=dewpoint,
+        wx_codes=wx_codes,
+        sky_condition=sky_condition,
+        flight_rule=flight_rule,
+        remarks=remarks,
+        last_polling_succeeded=last_polling_succeeded
+
+    )
+    return metar
+
+
+def parse_metar_batch(
+        records: List[t.Dict[str, t.Any]],
+        last_polling_succeeded: bool = True
+) -> t.Tuple[List[Metar], int]:
+    """
+    Parses a batch of raw METAR records. This is a module level function so it
+    can be pickled and run in a ProcessPoolExecutor.
+    Returns
+    -------
+    Tuple[List[Metar], int]
+        The METARs and how many of their timestamps fell back to dateutil,
+        counted here as the counter of a pool process never reaches the
+        parent.
+    """
+    fallbacks = weather_services.adds_time_fallbacks
+    metars = [parse_metar(m, last_polling_succeeded) for m in records]
+    return metars, weather_services.adds_time_fallbacks - fallbacks
+
+
 class MetarService:
     """
     Service for METAR Functionality and updating of the repository.
     """
 
-    def __init__(self, repo: IMetarRepository):
+    def __init__(
+            self,
+            repo: IMetarRepository,
+            http: HTTPClient,
+            streaming: bool = True,
+            executor: Optional[Executor] = None,
+            batch_size: int = 250,
+            responses: Optional[ResponseCache] = None,
+            history: Optional[WeatherHistory] = None,
+            snapshot_file: Optional[SnapshotFile] = None
+    ):
+        """
+
+        Parameters
+        ----------
+        repo
+            The repository the parsed METARs are saved to.
+        http
+            The shared HTTP client used to download the cache file.
+        streaming
+            Parse the cache file incrementally one <METAR> at a time instead of
+            loading the whole document with xmltodict.
+        executor
+            Optional executor, typically a ProcessPoolExecutor, that parses
+            batches of METARs off the event loop.
+        batch_size
+            Number of METARs handed to each parsing batch.
+        responses
+            Optional cache the JSON responses of each new snapshot are
+            rendered into before it is published.
+        history
+            Optional store every new report is appended to.
+        snapshot_file
+            Optional file every published snapshot is saved to and restored
+            from at startup.
+        """
         self._repo = repo
-        self.poller = ADDSPolling()
+        self.streaming = streaming
+        self.executor = executor
+        self.batch_size = batch_size
+        self.responses = responses
+        self.history = history
+        self.snapshot_file = snapshot_file
+        self._snapshot_modified: Optional[int] = None
+        self.poller = ADDSPolling(http=http)
         self.poller.add_file('metars.cache.xml.gz', self._file_updated)
+        self.last_ingest_stats: Optional[IngestStats] = None
 
     async def metar(self, icao) -> t.Optional[Metar]:
         """
@@ -55,18 +185,59 @@ class MetarService:
         except EntityNotFoundError:
             return
     
+    async def metar_history(
+            self,
+            icao: str,
+            start: Optional[datetime] = None,
+            end: Optional[datetime] = None
+    ) -> List[Metar]:
+        """
+        The reports of a station between two times, newest first.
+        Parameters
+        ----------
+        icao
+            The string identifier of the airport.
+        start
+            Oldest observation time returned. Naive times are taken as UTC.
+        end
+            Newest observation time returned. Naive times are taken as UTC.
+        Returns
+        -------
+        List[Metar]
+
+        Raises
+        -------
+        EntityNotFoundError
+            The station has no current report.
+        """
+        latest = await self._repo.find(icao)
+        start = as_utc(start) if start is not None else None
+        end = as_utc(end) if end is not None else None
+        records = await self.history.parsed_series(icao, parse_metar, start, end) if self.history is not None else []
+        if not records:
+            in_range = (start is None or latest.time >= start) and (end is None or latest.time <= end)
+            return [latest] if in_range else []
+        # The current report is served as the repository's instance so its
+        # cached response body is reused
+        return [latest if m.raw_text == latest.raw_text else m for m in records]
+
     async def find_longest_metars(self, max_number: int) -> list[Metar]:
         return await self._repo.longest_metars(max_number)
 
     async def _file_updated(self, polling_file: PollingFile):
-        gz = await self._fetch_metar(polling_file.filename)
-        await self._parse_metar_gzip(gz)
+        gz = await self._fetch_metar(polling_file)
+        if gz is None:
+            return
+        if self.streaming:
+            await self._stream_metar_gzip(gz)
+        else:
+            await self._parse_metar_gzip(gz)
 
-    async def _fetch_metar(self, url) -> GzipFile:
-        async with aiohttp.ClientSession() as session:
-            response = await session.get(url)
-            data = io.BytesIO(await response.read())
-            return GzipFile(fileobj=data)
+    async def _fetch_metar(self, polling_file: PollingFile) -> Optional[GzipFile]:
+        data = await self.poller.fetch(polling_file)
+        if data is None:
+            return
+        return GzipFile(fileobj=io.BytesIO(data))
 
     async def _parse_metar_gzip(self, gz_metar: GzipFile):
        
@@ -76,77 +247,153 @@ class MetarService:
         except KeyError:
             raise BadResponseError("Invalid Response from aviationweather.gov")
         except EOFError:
-            log.error("EOF Error from Gzip Stream on TAF. Ignoring")
-            return
+            # Raised so the poller drops the validators of the truncated download
+            raise BadResponseError("Truncated gzip stream of METARs from aviationweather.gov")
 
-        for m in data:
-            metar = self._parse_metar(m)
-            try:
-                await self._repo.create(metar)
-            except EntityExistsError:
-                await self._repo.update(metar)
+        await self._ingest(data)
 
-    def _parse_metar(self, m: t.Dict[str, t.Any]) -> Metar:
-        latitude = m.get('latitude')
-        longitude = m.get('longitude')
-        altimeter = m.get('altim_in_hg')
-        wx_string = m.get('wx_string', "")
-        wx_codes = WeatherFactory.wx_codes(wx_string)
-        flight_rule = m.get('flight_category')
-        sky_condition = WeatherFactory.sky_condition(m)
-        visibility = WeatherFactory.visibility(m)
-        wind = WeatherFactory.wind(m)
-        temp = WeatherFactory.temperature(m)
-        dewpoint = WeatherFactory.dewpoint(m)
-        if flight_rule is not None:
-            flight_rule = FlightRule(code=flight_rule, text=wx_flight_rules[flight_rule])
-
-        location = None
-        if latitude is not None and longitude is not None:
-            location = Point(latitude=latitude, longitude=longitude)
-        if altimeter is not None:
-            inhg = string_to_decimal_rounded(altimeter, precision='0.01')
-            altimeter = AltimeterSetting(inhg=inhg)
-        remark_match = re.search(REMARKS_PATTERN, m['raw_text'])
-        remarks_text = remark_match.groups()[0] if remark_match is not None else ''
-        remarks = self.get_remarks(remarks_text, remarks_pipeline)
-        metar = Metar(
-            raw_text=m['raw_text'],
-            station_id=m['station_id'],
-            time=parse(m['observation_time']),
-            location=location,
-            temperature=temp,
-            visibility=visibility,
-            wind=wind,
-            altimeter=altimeter,
-            dewpoint=dewpoint,
-            wx_codes=wx_codes,
-            sky_condition=sky_condition,
-            flight_rule=flight_rule,
-            remarks=remarks,
-            last_polling_succeeded=self.poller.last_polling_succeeded
-
-        )
-        return metar
-
-    def get_remarks(self, remark_str: str, callables: List[Callable[[str], Union[Optional[Remark], List[Remark]]]]) -> List[Remark]:
-        remarks = []
-        for func in callables:
-            if remark_str == '':
-                return remarks
-            value = func(remark_str)
-            if isinstance(value, list):
-                for v in value:
-                    remarks.append(v)
-                    remark_str = remark_str.replace(v.code, '')
-            if isinstance(value, Remark):
-                remarks.append(value)
-                remark_str = remark_str.replace(value.code, '')
-        return remarks
+    async def _stream_metar_gzip(self, gz_metar: GzipFile):
+        try:
+            stats = await self._ingest(iter_records(gz_metar, 'METAR'))
+        except ParseError:
+            raise BadResponseError("Invalid Response from aviationweather.gov")
+        except EOFError:
+            # Raised so the poller drops the validators of the truncated download
+            raise BadResponseError("Truncated gzip stream of METARs from aviationweather.gov")
+        if stats.total == 0:
+            raise BadResponseError("Invalid Response from aviationweather.gov")
+
+    async def _ingest(self, records: t.Iterable[t.Dict[str, t.Any]]) -> IngestStats:
+        """
+        Builds a new snapshot from a cycle of raw METAR records and publishes
+        it to the repository in one swap. Only stations whose report changed
+        since the previous snapshot are parsed; unchanged stations carry their
+        existing Metar over and stations missing from the cycle are dropped.
+        Parameters
+        ----------
+        records
+            The raw METAR dictionaries of the cache file
+        Returns
+        -------
+        IngestStats
+
+        """
+        stats = IngestStats()
+        previous = self._repo.snapshot.items
+        items: t.Dict[str, Metar] = {}
+        batch = []
+        pending = []
+        reports = []
+        try:
+            for m in records:
+                icao = m['station_id'].lower()
+                existing = previous.get(icao)
+                # The observation time is part of the raw text so this also
+                # catches a new report issued with an otherwise identical body.
+                if existing is not None and existing.raw_text == m['raw_text']:
+                    items[icao] = existing
+                    stats.unchanged += 1
+                    continue
+                if existing is None:
+                    stats.new += 1
+                else:
+                    stats.changed += 1
+                # Hold the station's place so the snapshot keeps the order of
+                # the cache file, the parsed report replaces it below
+                items[icao] = existing
+                batch.append(m)
+                reports.append(m)
+                if len(batch) >= self.batch_size:
+                    pending.append(asyncio.ensure_future(self._parse_batch(batch)))
+                    batch = []
+                    # Give requests a chance to run between batches
+                    await asyncio.sleep(0)
+            if batch:
+                pending.append(asyncio.ensure_future(self._parse_batch(batch)))
 
+            for task in pending:
+                metars, fallbacks = await task
+                stats.time_fallbacks += fallbacks
+                for metar in metars:
+                    items[metar.station_id.lower()] = metar
+        except BaseException:
+            for task in pending:
+                task.cancel()
+            raise
 
+        if stats.total == 0:
+            return stats
+        stats.removed = len(previous.keys() - items.keys())
+        bodies = await self.responses.build(items) if self.responses is not None else None
+        snapshot = self._repo.publish(items)
+        if bodies is not None:
+            self.responses.publish(snapshot.version, bodies)
+        if self.history is not None:
+            await self.history.append(reports)
+        if self.snapshot_file is not None:
+            await self._save_snapshot(snapshot)
+        self.last_ingest_stats = stats
+        log.info(f"METAR ingest {stats} published snapshot {snapshot.version}")
+        return stats
 
+    async def restore(self, render: bool = False) -> bool:
+        """
+        Publishes the snapshot saved by this or another process so METARs
+        are served before the first poll completes. Items that did not change
+        from the current snapshot are kept.
+        Parameters
+        ----------
+        render
+            Render the response cache for the restored snapshot. Otherwise
+            responses are rendered on demand until the next ingest.
+        Returns
+        -------
+        bool
+            Whether a snapshot was restored
+
+        """
+        if self.snapshot_file is None:
+            return False
+        self._snapshot_modified = self.snapshot_file.modified()
+        saved = await asyncio.to_thread(self.snapshot_file.load)
+        if saved is None:
+            return False
+        previous = self._repo.snapshot.items
+        items = {}
+        for icao, item in saved.items.items():
+            existing = previous.get(icao)
+            items[icao] = existing if existing is not None and existing.raw_text == item.raw_text else item
+        bodies = await self.responses.build(items) if render and self.responses is not None else None
+        snapshot = self._repo.publish(items, built_at=saved.built_at)
+        if bodies is not None:
+            self.responses.publish(snapshot.version, bodies)
+        log.info(f"Restored {len(items)} METARs built at {saved.built_at}")
+        return True
 
+    async def refresh(self) -> bool:
+        """
+        Restores the snapshot file and reads the new history when another
+        process, the ingest leader, saved a new one.
+        Returns
+        -------
+        bool
+            Whether a new snapshot was restored
 
+        """
+        if self.snapshot_file is None or self.snapshot_file.modified() == self._snapshot_modified:
+            return False
+        if self.history is not None:
+            await self.history.reload()
+        return await self.restore(render=True)
 
+    async def _save_snapshot(self, snapshot: Snapshot):
+        try:
+            await asyncio.to_thread(self.snapshot_file.save, snapshot)
+        except Exception:
+            log.exception(f"Could not save METAR snapshot {snapshot.version}")
+
+    def _parse_metar(self, m: t.Dict[str, t.Any]) -> Metar:
+        return parse_metar(m, self.poller.last_polling_succeeded)
 
+    async def _parse_batch(self, records: List[t.Dict[str, t.Any]]) -> t.Tuple[List[Metar], int]:
+        return await run_batch(parse_metar_batch, records, self.executor, self.poller.last_polling_succeeded)
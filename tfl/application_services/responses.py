@@ -0,0 +1,209 @@
+from concurrent.futures import Executor
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Type
+
+import asyncio
+import gzip
+import json
+import logging
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from fastapi.utils import create_cloned_field, create_response_field
+from pydantic import BaseModel, ValidationError
+from pydantic.fields import ModelField
+
+from tfl.application_services.adds import run_batch
+
+log = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def response_field(model: Type[BaseModel]) -> ModelField:
+    """
+    The field FastAPI validates a route's return value against when the route
+    declares `response_model=model`.
+    """
+    return create_cloned_field(create_response_field(name=f"Response_{model.__name__}", type_=model))
+
+
+def render_json(item: BaseModel, model: Type[BaseModel]) -> bytes:
+    """
+    Renders an item to the exact JSON body a route with `response_model=model`
+    returns for it.
+    Parameters
+    ----------
+    item
+        The item to render
+    model
+        The response model of the route
+    Returns
+    -------
+    bytes
+
+    """
+    field = response_field(model)
+    # FastAPI converts a returned model to a dict before validating it against
+    # the cloned response model, which is what decides the output.
+    content = item.dict(by_alias=True)
+    value, errors = field.validate(content, {}, loc=('response',))
+    if errors:
+        raise ValidationError(errors if isinstance(errors, list) else [errors], field.type_)
+    return JSONResponse(content=jsonable_encoder(value)).body
+
+
+def render_json_batch(items: List[BaseModel], model: Type[BaseModel]) -> List[bytes]:
+    """
+    Renders a batch of items. This is a module level function so it can be
+    pickled and run in a ProcessPoolExecutor.
+    """
+    return [render_json(item, model) for item in items]
+
+
+def columnar_body(items: Sequence[Any], columns: Dict[str, Callable[[Any], Any]], fields: List[str], **meta) -> bytes:
+    """
+    Renders items as parallel arrays, one per requested field, instead of a
+    list of objects.
+    Parameters
+    ----------
+    items
+        The items to render
+    columns
+        The function returning the value of each available field for an item
+    fields
+        The names of the fields to render, in order
+    meta
+        Extra top level keys of the body
+    Returns
+    -------
+    bytes
+        A JSON object with the meta keys, a count and the columns.
+
+    """
+    content = {
+        **meta,
+        'count': len(items),
+        'columns': {field: [columns[field](item) for item in items] for field in fields},
+    }
+    return json.dumps(content, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+@lru_cache(maxsize=256)
+def accepts_gzip(accept_encoding: str) -> bool:
+    """
+    Whether an Accept-Encoding header allows gzip. A coding with a q-value
+    of 0 is refused, and gzip is taken from a `*` entry when not listed.
+    """
+    qualities = {}
+    for entry in accept_encoding.lower().split(','):
+        coding, *params = (part.strip() for part in entry.split(';'))
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            qualities[coding] = quality
+    for coding in ('gzip', 'x-gzip', '*'):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
+
+
+def compressed_response(body: bytes, accept_encoding: str, minimum_size: int = 500) -> Response:
+    """
+    A JSON response that is gzip compressed when the client accepts it and the
+    body is large enough for it to pay off.
+    """
+    headers = {'Vary': 'Accept-Encoding'}
+    if len(body) >= minimum_size and accepts_gzip(accept_encoding):
+        body = gzip.compress(body, compresslevel=6)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(content=body, media_type=JSONResponse.media_type, headers=headers)
+
+
+class ResponseCache:
+    """
+    JSON bodies of the items of a repository snapshot. The bodies are rendered
+    while a snapshot is built and published with it, so the API serves a
+    station with a dict lookup instead of validating and serialising the model
+    on every request.
+    """
+
+    def __init__(self, model: Type[BaseModel], executor: Optional[Executor] = None, batch_size: int = 50):
+        """
+
+        Parameters
+        ----------
+        model
+            The response model of the routes served from the cache.
+        executor
+            Optional executor the bodies are rendered in.
+        batch_size
+            Number of items rendered between yields to the event loop.
+        """
+        self.model = model
+        self.executor = executor
+        self.batch_size = batch_size
+        self.version = 0
+        self._bodies: Dict[str, Tuple[Any, bytes]] = {}
+
+    async def build(self, items: Dict[str, Any]) -> Dict[str, Tuple[Any, bytes]]:
+        """
+        Renders the bodies for the items of a new snapshot. Items carried over
+        unchanged from the published snapshot keep their existing body.
+        Parameters
+        ----------
+        items
+            The items of the snapshot keyed by lower case station id
+        Returns
+        -------
+        Dict[str, Tuple[Any, bytes]]
+            The item and its body keyed like `items`, ready to be published.
+
+        """
+        bodies = {}
+        pending = []
+        for key, item in items.items():
+            entry = self._bodies.get(key)
+            if entry is not None and entry[0] is item:
+                bodies[key] = entry
+            else:
+                pending.append((key, item))
+        for i in range(0, len(pending), self.batch_size):
+            batch = pending[i:i + self.batch_size]
+            rendered = await run_batch(render_json_batch, [item for _, item in batch], self.executor, self.model)
+            for (key, item), body in zip(batch, rendered):
+                bodies[key] = (item, body)
+            # Give requests a chance to run between batches
+            await asyncio.sleep(0)
+        log.debug(f"Rendered {len(pending)} of {len(items)} {self.model.__name__} responses")
+        return bodies
+
+    def publish(self, version: int, bodies: Dict[str, Tuple[Any, bytes]]):
+        """
+        Replaces the cached bodies with the ones built for snapshot `version`.
+        """
+        self.version = version
+        self._bodies = bodies
+
+    def body(self, item: Any) -> bytes:
+        """
+        The JSON body of an item. Items that are not the ones the cache was
+        built for, such as a repository updated outside of an ingest, are
+        rendered on demand.
+        """
+        entry = self._bodies.get(item.station_id.lower())
+        if entry is not None and entry[0] is item:
+            return entry[1]
+        return render_json(item, self.model)
+
+    def response(self, item: Any) -> Response:
+        return Response(content=self.body(item), media_type=JSONResponse.media_type)
+
+    def list_response(self, items: Iterable[Any]) -> Response:
+        content = b'[' + b','.join(self.body(item) for item in items) + b']'
+        return Response(content=content, media_type=JSONResponse.media_type)
@@ -1,15 +1,23 @@
-from tfl.domain.exceptions import EntityExistsError, EntityNotFoundError
+from tfl.domain.exceptions import EntityNotFoundError
 from tfl.domain.interfaces.weather import ITAFRepository
+from concurrent.futures import Executor
 from gzip import GzipFile
-import aiohttp
+import asyncio
 import xmltodict
 import io
 from tfl.domain.weather import *
 from tfl.domain.factories.weather import WeatherFactory
-from typing import Any, Optional, Dict
+from tfl.domain.services import weather as weather_services
+from tfl.domain.services.weather import as_utc, parse_adds_time
+from typing import Any, Optional, Dict, Iterable, List, Tuple
 
-from dateutil.parser import parse
-from tfl.application_services.adds import ADDSPolling, PollingFile
+from tfl.application_services.adds import ADDSPolling, PollingFile, iter_records, run_batch
+from tfl.application_services.responses import ResponseCache
+from tfl.infrastructure.history import WeatherHistory
+from tfl.infrastructure.snapshot_file import SnapshotFile
+from tfl.domain.core import Snapshot
+from tfl.infrastructure.http import HTTPClient
+from xml.etree.ElementTree import ParseError
 import logging
 
 log = logging.getLogger(__name__)
@@ -18,74 +26,292 @@ class BadResponseError(Exception):
     pass
 
 
+def parse_taf(t: Dict[str, Any], last_polling_succeeded: bool = True) -> TAF:
+    location = None
+    forecasts = []
+    raw_text = t['raw_text']
+    station_id = t['station_id']
+    issue_time = parse_adds_time(t['issue_time'])
+    
+    bulletin_time = parse_adds_time(t['bulletin_time'])
+    valid_from = parse_adds_time(t['valid_time_from'])
+    valid_to = parse_adds_time(t['valid_time_to'])
+    latitude = t.get('latitude')
+    longitude = t.get('longitude')
+    
+    if latitude is not None and longitude is not None:
+        location = Point(latitude=latitude, longitude=longitude)
+
+    
+    forecasts = WeatherFactory.forecasts(t)
+    taf = TAF(
+        raw_text=raw_text,
+        station_id=station_id,
+        issue_time=issue_time,
+        valid_from=valid_from,
+        valid_to=valid_to,
+        bulletin_time=bulletin_time,
+        location=location,
+        forecasts=forecasts,
+        last_polling_succeeded=last_polling_succeeded
+    )
+    return taf
+
+
+def parse_taf_batch(records: List[Dict[str, Any]], last_polling_succeeded: bool = True) -> Tuple[List[TAF], int]:
+    """
+    Parses a batch of raw TAF records. This is a module level function so it
+    can be pickled and run in a ProcessPoolExecutor. Also returns how many
+    timestamps fell back to dateutil, see `parse_metar_batch`.
+    """
+    fallbacks = weather_services.adds_time_fallbacks
+    tafs = [parse_taf(t, last_polling_succeeded) for t in records]
+    return tafs, weather_services.adds_time_fallbacks - fallbacks
+
+
 class TafService:
 
-    def __init__(self, repo: ITAFRepository):
+    def __init__(
+            self,
+            repo: ITAFRepository,
+            http: HTTPClient,
+            streaming: bool = True,
+            executor: Optional[Executor] = None,
+            batch_size: int = 100,
+            responses: Optional[ResponseCache] = None,
+            history: Optional[WeatherHistory] = None,
+            snapshot_file: Optional[SnapshotFile] = None
+    ):
+        """
+
+        Parameters
+        ----------
+        repo
+            The repository the parsed TAFs are saved to.
+        http
+            The shared HTTP client used to download the cache file.
+        streaming
+            Parse the cache file incrementally one <TAF> at a time instead of
+            loading the whole document with xmltodict.
+        executor
+            Optional executor, typically a ProcessPoolExecutor, that parses
+            batches of TAFs off the event loop.
+        batch_size
+            Number of TAFs handed to each parsing batch.
+        responses
+            Optional cache the JSON responses of each new snapshot are
+            rendered into before it is published.
+        history
+            Optional store every new TAF is appended to.
+        snapshot_file
+            Optional file every published snapshot is saved to and restored
+            from at startup.
+        """
         self._repo = repo
-        self.poller = ADDSPolling()
+        self.streaming = streaming
+        self.executor = executor
+        self.batch_size = batch_size
+        self.responses = responses
+        self.history = history
+        self.snapshot_file = snapshot_file
+        self._snapshot_modified: Optional[int] = None
+        self.poller = ADDSPolling(http=http)
         self.poller.add_file('tafs.cache.xml.gz', self.file_updated)
 
     async def file_updated(self, polling_file: PollingFile):
         log.debug("In taf update callback")
-        gz = await self._fetch_taf(polling_file.filename)
-        await self._parse_taf_gzip(gz)
+        gz = await self._fetch_taf(polling_file)
+        if gz is None:
+            return
+        if self.streaming:
+            await self._stream_taf_gzip(gz)
+        else:
+            await self._parse_taf_gzip(gz)
 
-    async def _fetch_taf(self, url) -> GzipFile:
-        async with aiohttp.ClientSession() as session:
-            response = await session.get(url)
-            data = io.BytesIO(await response.read())
-            return GzipFile(fileobj=data)
+    async def _fetch_taf(self, polling_file: PollingFile) -> Optional[GzipFile]:
+        data = await self.poller.fetch(polling_file)
+        if data is None:
+            return
+        return GzipFile(fileobj=io.BytesIO(data))
 
     async def _parse_taf_gzip(self, gz_taf: GzipFile):
-        data = xmltodict.parse(gz_taf.read())
         try:
+            data = xmltodict.parse(gz_taf.read())
             data = data['response']['data']['TAF']
         except KeyError:
             raise BadResponseError("Invalid Response from aviationweather.gov")
         except EOFError:
-            log.error("EOF Error from Gzip Stream on TAF. Ignoring")
-            return
-        for t in data:
-            taf = self._parse_taf(t)
-            try:
-                await self._repo.create(taf)
-            except EntityExistsError:
-                await self._repo.update(taf)
+            # Raised so the poller drops the validators of the truncated download
+            raise BadResponseError("Truncated gzip stream of TAFs from aviationweather.gov")
+        await self._ingest(data)
+
+    async def _stream_taf_gzip(self, gz_taf: GzipFile):
+        try:
+            count = await self._ingest(iter_records(gz_taf, 'TAF'))
+        except ParseError:
+            raise BadResponseError("Invalid Response from aviationweather.gov")
+        except EOFError:
+            # Raised so the poller drops the validators of the truncated download
+            raise BadResponseError("Truncated gzip stream of TAFs from aviationweather.gov")
+        if count == 0:
+            raise BadResponseError("Invalid Response from aviationweather.gov")
+
+    async def _ingest(self, records: Iterable[Dict[str, Any]]) -> int:
+        """
+        Parses the raw TAF records in batches into a new snapshot and
+        publishes it to the repository in one swap.
+        Parameters
+        ----------
+        records
+            The raw TAF dictionaries of the cache file
+        Returns
+        -------
+        int
+            The number of TAFs ingested
+
+        """
+        count = 0
+        time_fallbacks = 0
+        previous = self._repo.snapshot.items
+        items: Dict[str, TAF] = {}
+        batch = []
+        pending = []
+        reports = []
+        try:
+            for t in records:
+                batch.append(t)
+                existing = previous.get(t['station_id'].lower())
+                if existing is None or existing.raw_text != t['raw_text']:
+                    reports.append(t)
+                count += 1
+                if len(batch) >= self.batch_size:
+                    pending.append(asyncio.ensure_future(self._parse_batch(batch)))
+                    batch = []
+                    # Give requests a chance to run between batches
+                    await asyncio.sleep(0)
+            if batch:
+                pending.append(asyncio.ensure_future(self._parse_batch(batch)))
+
+            for task in pending:
+                tafs, fallbacks = await task
+                time_fallbacks += fallbacks
+                for taf in tafs:
+                    items[taf.station_id.lower()] = taf
+        except BaseException:
+            for task in pending:
+                task.cancel()
+            raise
+        if count:
+            bodies = await self.responses.build(items) if self.responses is not None else None
+            snapshot = self._repo.publish(items)
+            if bodies is not None:
+                self.responses.publish(snapshot.version, bodies)
+            if self.history is not None:
+                await self.history.append(reports)
+            if self.snapshot_file is not None:
+                await self._save_snapshot(snapshot)
+            log.info(f"TAF ingest of {count} records published snapshot {snapshot.version}, "
+                     f"{time_fallbacks} timestamps fell back to dateutil")
+        return count
+
+    async def restore(self, render: bool = False) -> bool:
+        """
+        Publishes the snapshot saved by this or another process so TAFs
+        are served before the first poll completes. Items that did not change
+        from the current snapshot are kept.
+        Parameters
+        ----------
+        render
+            Render the response cache for the restored snapshot. Otherwise
+            responses are rendered on demand until the next ingest.
+        Returns
+        -------
+        bool
+            Whether a snapshot was restored
+
+        """
+        if self.snapshot_file is None:
+            return False
+        self._snapshot_modified = self.snapshot_file.modified()
+        saved = await asyncio.to_thread(self.snapshot_file.load)
+        if saved is None:
+            return False
+        previous = self._repo.snapshot.items
+        items = {}
+        for icao, item in saved.items.items():
+            existing = previous.get(icao)
+            items[icao] = existing if existing is not None and existing.raw_text == item.raw_text else item
+        bodies = await self.responses.build(items) if render and self.responses is not None else None
+        snapshot = self._repo.publish(items, built_at=saved.built_at)
+        if bodies is not None:
+            self.responses.publish(snapshot.version, bodies)
+        log.info(f"Restored {len(items)} TAFs built at {saved.built_at}")
+        return True
 
+    async def refresh(self) -> bool:
+        """
+        Restores the snapshot file and reads the new history when another
+        process, the ingest leader, saved a new one.
+        Returns
+        -------
+        bool
+            Whether a new snapshot was restored
+
+        """
+        if self.snapshot_file is None or self.snapshot_file.modified() == self._snapshot_modified:
+            return False
+        if self.history is not None:
+            await self.history.reload()
+        return await self.restore(render=True)
+
+    async def _save_snapshot(self, snapshot: Snapshot):
+        try:
+            await asyncio.to_thread(self.snapshot_file.save, snapshot)
+        except Exception:
+            log.exception(f"Could not save TAF snapshot {snapshot.version}")
 
     def _parse_taf(self, t: Dict[str, Any]) -> TAF:
-        location = None
-        forecasts = []
-        raw_text = t['raw_text']
-        station_id = t['station_id']
-        issue_time = parse(t['issue_time'])
-        
-        bulletin_time = parse(t['bulletin_time'])
-        valid_from = parse(t['valid_time_from'])
-        valid_to = parse(t['valid_time_to'])
-        latitude = t.get('latitude')
-        longitude = t.get('longitude')
-        
-        if latitude is not None and longitude is not None:
-            location = Point(latitude=latitude, longitude=longitude)
-
-        
-        forecasts = WeatherFactory.forecasts(t)
-        taf = TAF(
-            raw_text=raw_text,
-            station_id=station_id,
-            issue_time=issue_time,
-            valid_from=valid_from,
-            valid_to=valid_to,
-            bulletin_time=bulletin_time,
-            location=location,
-            forecasts=forecasts,
-            last_polling_succeeded=self.poller.last_polling_succeeded
-        )
-        return taf
+        return parse_taf(t, self.poller.last_polling_succeeded)
+
+    async def _parse_batch(self, records: List[Dict[str, Any]]) -> Tuple[List[TAF], int]:
+        return await run_batch(parse_taf_batch, records, self.executor, self.poller.last_polling_succeeded)
 
     async def taf(self, icao) -> Optional[TAF]:
         try:
             return await self._repo.find(icao)
         except EntityNotFoundError:
             return
+
+    async def taf_history(
+            self,
+            icao: str,
+            start: Optional[datetime] = None,
+            end: Optional[datetime] = None
+    ) -> List[TAF]:
+        """
+        The TAFs of a station issued between two times, newest first.
+        Parameters
+        ----------
+        icao
+            The string identifier of the airport.
+        start
+            Oldest issue time returned. Naive times are taken as UTC.
+        end
+            Newest issue time returned. Naive times are taken as UTC.
+        Returns
+        -------
+        List[TAF]
+
+        Raises
+        -------
+        EntityNotFoundError
+            The station has no current TAF.
+        """
+        latest = await self._repo.find(icao)
+        start = as_utc(start) if start is not None else None
+        end = as_utc(end) if end is not None else None
+        records = await self.history.parsed_series(icao, parse_taf, start, end) if self.history is not None else []
+        if not records:
+            in_range = (start is None or latest.issue_time >= start) and (end is None or latest.issue_time <= end)
+            return [latest] if in_range else []
+        return [latest if t.raw_text == latest.raw_text else t for t in records]
@@ -2,3 +2,17 @@ import os
 import pathlib
 SECRET_KEY = os.environ.get('SECRET_KEY', 'secret')
 DATA_DIR = pathlib.Path(__file__).parents[1] / "data"
+# Number of worker processes used to parse METAR/TAF batches off the event loop.
+# 0 parses inline on the event loop.
+WEATHER_PARSE_WORKERS = int(os.environ.get('WEATHER_PARSE_WORKERS', 0))
+# Hours of METAR/TAF history kept per station. 0 disables the history.
+WEATHER_HISTORY_HOURS = int(os.environ.get('WEATHER_HISTORY_HOURS', 48))
+WEATHER_HISTORY_DIR = pathlib.Path(os.environ.get('WEATHER_HISTORY_DIR', DATA_DIR / 'history'))
+# Where the last METAR/TAF snapshots are saved for a warm restart
+WEATHER_SNAPSHOT_DIR = pathlib.Path(os.environ.get('WEATHER_SNAPSHOT_DIR', DATA_DIR / 'snapshots'))
+# Lock file electing the one worker that polls ADDS, DTPP and the chart
+# supplements. The other workers reload what it saves. Empty disables the
+# election and every worker polls.
+INGEST_LOCK_FILE = os.environ.get('INGEST_LOCK_FILE', str(DATA_DIR / 'ingest.lock'))
+# Seconds between a following worker's reloads
+INGEST_FOLLOW_SECONDS = float(os.environ.get('INGEST_FOLLOW_SECONDS', 15))
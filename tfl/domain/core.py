@@ -1,6 +1,11 @@
 from pydantic.generics import GenericModel
 from pydantic import BaseModel
-from typing import TypeVar, Generic, NamedTuple
+from pydantic.utils import ValueItems
+from datetime import datetime
+from typing import TypeVar, Generic, NamedTuple, Dict, Any, List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from tfl.domain.services.spatial import SpatialIndex
 
 T = TypeVar("T")
 
@@ -12,16 +17,69 @@ class TFLModel(BaseModel):
             is solved
             """
     @classmethod
-    def get_properties(cls):
-        return [
-            prop for prop in dir(cls)
-            if isinstance(getattr(cls, prop), property) and prop not in ("__values__", "fields")
-        ]
-
-    def dict(self, *args, **kwargs) -> 'DictStrAny':
-        self.__dict__.update({prop: getattr(self, prop) for prop in self.get_properties()})
-
-        return super().dict(*args, **kwargs)
+    def get_properties(cls) -> Tuple[str, ...]:
+        # dir() walks the whole MRO so the names are only looked up once per class
+        try:
+            return _properties[cls]
+        except KeyError:
+            properties = _properties[cls] = tuple(
+                prop for prop in dir(cls)
+                if isinstance(getattr(cls, prop), property) and prop not in ("__values__", "fields")
+            )
+            return properties
+
+    def _iter(
+            self,
+            to_dict: bool = False,
+            by_alias: bool = False,
+            include=None,
+            exclude=None,
+            exclude_unset: bool = False,
+            exclude_defaults: bool = False,
+            exclude_none: bool = False,
+    ):
+        yield from super()._iter(
+            to_dict=to_dict,
+            by_alias=by_alias,
+            include=include,
+            exclude=exclude,
+            exclude_unset=exclude_unset,
+            exclude_defaults=exclude_defaults,
+            exclude_none=exclude_none,
+        )
+        # Properties are added after the fields when converting to a dict.
+        # They are never part of the fields set so exclude_unset drops them.
+        if not to_dict or exclude_unset:
+            return
+        if exclude is not None or self.__exclude_fields__ is not None:
+            exclude = ValueItems.merge(self.__exclude_fields__, exclude)
+        if include is not None or self.__include_fields__ is not None:
+            include = ValueItems.merge(self.__include_fields__, include, intersect=True)
+        value_exclude = ValueItems(self, exclude) if exclude is not None else None
+        value_include = ValueItems(self, include) if include is not None else None
+
+        for prop in self.get_properties():
+            if include is not None and prop not in include:
+                continue
+            if exclude is not None and ValueItems.is_true(exclude.get(prop)):
+                continue
+            v = getattr(self, prop)
+            if exclude_none and v is None:
+                continue
+            yield prop, self._get_value(
+                v,
+                to_dict=to_dict,
+                by_alias=by_alias,
+                include=value_include and value_include.for_element(prop),
+                exclude=value_exclude and value_exclude.for_element(prop),
+                exclude_unset=exclude_unset,
+                exclude_defaults=exclude_defaults,
+                exclude_none=exclude_none,
+            )
+
+
+# Property names of each TFLModel subclass
+_properties: Dict[type, Tuple[str, ...]] = {}
 
 
 class Entity(GenericModel, Generic[T]):
@@ -33,6 +91,8 @@ class ValueObject(TFLModel):
 
     class Config:
         frozen = True
+        # Frozen instances are safe to share, keep them when nested in a model
+        copy_on_model_validation = 'none'
 
 
 class Aggregate(TFLModel):
@@ -50,4 +110,26 @@ class Form(TFLModel):
 
 class HeadAndTailString(NamedTuple):
     head: str
-    tail: str
\ No newline at end of file
+    tail: str
+
+
+class Snapshot(NamedTuple):
+    """
+    An immutable, versioned view of a repository. Ingest builds a complete new
+    snapshot and publishes it with a single reference swap so readers never
+    see a mix of two polling cycles. Sorted views of the items are built with
+    the snapshot and published in the same swap, as is the spatial index of
+    item locations.
+    """
+    version: int
+    built_at: Optional[datetime]
+    items: Dict[str, Any]
+    indexes: Dict[str, List[Any]] = {}
+    spatial: Optional['SpatialIndex'] = None
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            'version': self.version,
+            'built_at': self.built_at,
+            'count': len(self.items),
+        }
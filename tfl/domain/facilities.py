@@ -38,6 +38,10 @@ class DTPPHeader(ValueObject):
         now = datetime.now(timezone.utc)
         return self.valid_from < now < self.valid_to
 
+    @property
+    def is_expired(self):
+        return self.valid_to <= datetime.now(timezone.utc)
+
 class FAAPlate(ValueObject):
     tpp_cycle: int
     icao: str
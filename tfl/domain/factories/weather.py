@@ -1,7 +1,7 @@
 import typing as t
+from functools import lru_cache
 
-from dateutil.parser import parse
-from tfl.domain.services.weather import head_and_tail, merge_forecasts, string_to_decimal_rounded
+from tfl.domain.services.weather import head_and_tail, merge_forecasts, parse_adds_time, string_to_decimal_rounded
 
 from tfl.domain.weather import *
 from tfl.domain.weather_translations import *
@@ -20,6 +20,10 @@ TEMPERATURE = 'temp_c'
 DEWPOINT = 'dewpoint_c'
 WEATHER_CHANGE = 'change_indicator'
 
+# Upper bound on each interning cache. A full METAR cycle produces a few
+# hundred distinct wx codes and a few thousand distinct winds and layers.
+INTERN_CACHE_SIZE = 4096
+
 
 def _get_symbol(abbreviation: str) -> t.Optional[WxCodeSymbol]:
     if abbreviation in wx_intensities.keys():
@@ -44,7 +48,131 @@ def _get_symbol(abbreviation: str) -> t.Optional[WxCodeSymbol]:
         )
 
 
+def _wind(dir, at, gust) -> Wind:
+    return Wind(
+        dir=dir,
+        at=at,
+        gusting=gust,
+    )
+
+
+def _sky_condition(coverage: str, bases: t.Optional[str]) -> SkyCondition:
+    return SkyCondition(
+        coverage=coverage,
+        bases=bases,
+    )
+
+
+def _visibility(vis: str) -> Visibility:
+    sm = string_to_decimal_rounded(vis)
+    return Visibility(sm=sm)
+
+
+def _temperature(temp: str) -> Temperature:
+    c = string_to_decimal_rounded(temp)
+    return Temperature(celsius=c)
+
+
+def _wx_code(code: str) -> WxCode:
+    raw = code
+    intensity = None
+    descriptor = None
+    has_proximity = False
+    phenomenons = []
+
+    # Intensity is always one character and leads the code.
+    symbol = _get_symbol(code[:1])
+    if isinstance(symbol, WxIntensity):
+        intensity = symbol
+        code = code[1:]
+
+    # All remaining symbols are now groups of two characters.
+    while len(code) >= 2:
+        symbol, code = head_and_tail(code, 2)
+
+        wx = _get_symbol(symbol)
+        if isinstance(wx, WxDescriptor):
+            # There should only be one descriptor
+            descriptor = wx
+        if isinstance(wx, WxProximity):
+            has_proximity = True
+        if isinstance(wx, WxPhenomenon):
+            phenomenons.append(wx)
+
+    intensity_text = intensity.text if intensity else ""
+    descriptor_text = descriptor.text if descriptor else ""
+    phs = phenomenons
+    if descriptor and descriptor.symbol != "TS":
+        if descriptor.symbol == "SH":
+            phs = [f"{ph.text} {descriptor.text}" for ph in phs]
+        else:
+            phs = [f"{descriptor.text} {ph.text}" for ph in phs]
+    else:
+        phs = [ph.text for ph in phs]
+    if intensity:
+        ph_text = " and ".join(f"{intensity_text} {ph}" for ph in phs)
+    else:
+        ph_text = " and ".join(f"{ph}" for ph in phs)
+
+    # Weird english rules
+    ds_text = ""
+    if descriptor and len(ph_text) > 0:
+        if descriptor.symbol == "TS":
+            ph_text += " associated with thunderstorms"
+    elif descriptor:
+        # Standalone as a phenomenon
+        ph_text = descriptor.text
+    if has_proximity:
+        ph_text += " in the vicinity"
+
+    return WxCode(
+        raw=raw,
+        text=ph_text,
+        intensity=intensity,
+        descriptor=descriptor,
+        has_proximity=has_proximity,
+        phenomenons=phenomenons
+
+    )
+
+
+# Value objects are frozen so identical inputs can share one instance. The
+# raw strings from the cache file are the keys, before any pydantic work.
+_interned_wind = lru_cache(maxsize=INTERN_CACHE_SIZE)(_wind)
+_interned_sky_condition = lru_cache(maxsize=INTERN_CACHE_SIZE)(_sky_condition)
+_interned_visibility = lru_cache(maxsize=INTERN_CACHE_SIZE)(_visibility)
+_interned_temperature = lru_cache(maxsize=INTERN_CACHE_SIZE)(_temperature)
+_interned_wx_code = lru_cache(maxsize=INTERN_CACHE_SIZE)(_wx_code)
+
+_INTERN_CACHES = {
+    'wind': _interned_wind,
+    'sky_condition': _interned_sky_condition,
+    'visibility': _interned_visibility,
+    'temperature': _interned_temperature,
+    'wx_code': _interned_wx_code,
+}
+
+
 class WeatherFactory:
+    # Return shared instances for repeated inputs. Disable to build a new
+    # value object on every call.
+    intern = True
+
+    @staticmethod
+    def cache_info() -> t.Dict[str, t.Any]:
+        """
+        Hit and miss statistics of the interning caches.
+        Returns
+        -------
+        Dict[str, CacheInfo]
+            The functools CacheInfo of each cache keyed by value object.
+        """
+        return {name: cache.cache_info() for name, cache in _INTERN_CACHES.items()}
+
+    @staticmethod
+    def cache_clear():
+        for cache in _INTERN_CACHES.values():
+            cache.cache_clear()
 
     @staticmethod
     def wind(data: t.Dict[str, t.Any]) -> Wind:
@@ -53,23 +181,18 @@ class WeatherFactory:
             dir = 0
         at = data.get(WIND_SPEED, 0)
         gust = data.get(WIND_GUST, 0)
-        wind = Wind(
-            dir=dir,
-            at=at,
-            gusting=gust,
-        )
-        return wind
+        if WeatherFactory.intern:
+            return _interned_wind(dir, at, gust)
+        return _wind(dir, at, gust)
 
     @staticmethod
     def sky_condition(data: t.Dict[str, t.Any]) -> t.List[SkyCondition]:
         def _create(s: t.Dict[str, t.Any]) -> SkyCondition:
             coverage = s[SKY_COVER]
             bases = s.get(CLOUD_BASES)
-
-            return SkyCondition(
-                    coverage=coverage,
-                    bases=bases,
-            )
+            if WeatherFactory.intern:
+                return _interned_sky_condition(coverage, bases)
+            return _sky_condition(coverage, bases)
 
         container = []
         skc = data.get(SKY_CONDITION, [])
@@ -88,8 +211,9 @@ class WeatherFactory:
         # Fix for visibility to allow +
         if vis[-1] == "+":
             vis = vis[0:-1]
-        sm = string_to_decimal_rounded(vis)
-        return Visibility(sm=sm)
+        if WeatherFactory.intern:
+            return _interned_visibility(vis)
+        return _visibility(vis)
 
     @staticmethod
     def temperature(data: t.Dict[str, t.Any], key=None) -> t.Optional[Temperature]:
@@ -97,8 +221,9 @@ class WeatherFactory:
         temp = data.get(key)
         if temp is None:
             return
-        c = string_to_decimal_rounded(temp)
-        return Temperature(celsius=c)
+        if WeatherFactory.intern:
+            return _interned_temperature(temp)
+        return _temperature(temp)
 
     @staticmethod
     def dewpoint(data: t.Dict[str, t.Any]) -> t.Optional[Dewpoint]:
@@ -118,8 +243,8 @@ class WeatherFactory:
     def forecasts(data: t.Dict[str, t.Any], parent: TAFForecast = None) -> t.List[t.Union[TAFForecast, BECMG, TEMPO]]:
         def _make(f: t.Dict[str, t.Any], parent=None) -> t.Union[TAFForecast, BECMG, TEMPO]:
             change = f.get('change_indicator')
-            fc_from = parse(f['fcst_time_from'])
-            fc_to = parse(f['fcst_time_to'])
+            fc_from = parse_adds_time(f['fcst_time_from'])
+            fc_to = parse_adds_time(f['fcst_time_to'])
             wind = WeatherFactory.wind(f)
             sky_condition = WeatherFactory.sky_condition(f)
             visibility = WeatherFactory.visibility(f)
@@ -138,7 +263,7 @@ class WeatherFactory:
                 'BECMG': BECMG
             }[change](
                 probability=prob,
-                time_becoming=parse(time_becoming) if isinstance(time_becoming, str) else time_becoming,
+                time_becoming=parse_adds_time(time_becoming) if isinstance(time_becoming, str) else time_becoming,
                 valid_from=fc_from,
                 valid_to=fc_to,
                 wind=wind,
@@ -173,66 +298,8 @@ class WeatherFactory:
             container.append(item)
         return container
 
-
     @staticmethod
     def parse_wx_code(code: str) -> WxCode:
-        raw = code
-        intensity = None
-        descriptor = None
-        has_proximity = False
-        phenomenons = []
-
-        # Intensity is always one character and leads the code.
-        symbol = _get_symbol(code[:1])
-        if isinstance(symbol, WxIntensity):
-            intensity = symbol
-            code = code[1:]
-
-        # All remaining symbols are now groups of two characters.
-        while len(code) >= 2:
-            symbol, code = head_and_tail(code, 2)
-
-            wx = _get_symbol(symbol)
-            if isinstance(wx, WxDescriptor):
-                # There should only be one descriptor
-                descriptor = wx
-            if isinstance(wx, WxProximity):
-                has_proximity = True
-            if isinstance(wx, WxPhenomenon):
-                phenomenons.append(wx)
-
-        intensity_text = intensity.text if intensity else ""
-        descriptor_text = descriptor.text if descriptor else ""
-        phs = phenomenons
-        if descriptor and descriptor.symbol != "TS":
-            if descriptor.symbol == "SH":
-                phs = [f"{ph.text} {descriptor.text}" for ph in phs]
-            else:
-                phs = [f"{descriptor.text} {ph.text}" for ph in phs]
-        else:
-            phs = [ph.text for ph in phs]
-        if intensity:
-            ph_text = " and ".join(f"{intensity_text} {ph}" for ph in phs)
-        else:
-            ph_text = " and ".join(f"{ph}" for ph in phs)
-
-        # Weird english rules
-        ds_text = ""
-        if descriptor and len(ph_text) > 0:
-            if descriptor.symbol == "TS":
-                ph_text += " associated with thunderstorms"
-        elif descriptor:
-            # Standalone as a phenomenon
-            ph_text = descriptor.text
-        if has_proximity:
-            ph_text += " in the vicinity"
-
-        return WxCode(
-            raw=raw,
-            text=ph_text,
-            intensity=intensity,
-            descriptor=descriptor,
-            has_proximity=has_proximity,
-            phenomenons=phenomenons
-
-        )
\ No newline at end of file
+        if WeatherFactory.intern:
+            return _interned_wx_code(code)
+        return _wx_code(code)
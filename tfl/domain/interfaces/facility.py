@@ -1,6 +1,6 @@
 from abc import abstractmethod, ABC
 
-from tfl.domain.facilities import Airport
+from tfl.domain.facilities import Airport, FAAPlate
 
 
 class IAirportRepository(ABC):
@@ -9,6 +9,20 @@ class IAirportRepository(ABC):
     async def find(self, icao: str) -> Airport:
         pass
 
+    @abstractmethod
+    async def search_plates(self, icao: str, name: str) -> list[FAAPlate]:
+        pass
+
     @abstractmethod
     async def create(self, airport: Airport) -> None:
         pass
+
+    @abstractmethod
+    async def near(
+            self,
+            latitude: float,
+            longitude: float,
+            radius_nm: float | None = None,
+            limit: int = 50
+    ) -> list[Airport]:
+        pass
@@ -1,5 +1,8 @@
 from asyncio import Protocol
+from datetime import datetime
+from typing import Dict, Optional
 
+from tfl.domain.core import Snapshot
 from tfl.domain.facilities import Airport
 from tfl.domain.weather import Metar, TAF
 from abc import ABC, abstractmethod
@@ -40,6 +43,33 @@ class IMetarRepository(ABC):
     async def longest_metars(self, max_number: int) -> list[Metar]:
         pass
 
+    @abstractmethod
+    async def icaos(self) -> list[str]:
+        pass
+
+    @abstractmethod
+    async def near(
+            self,
+            latitude: float,
+            longitude: float,
+            radius_nm: float | None = None,
+            limit: int = 50
+    ) -> list[Metar]:
+        pass
+
+    @abstractmethod
+    async def within(self, south: float, west: float, north: float, east: float) -> list[Metar]:
+        pass
+
+    @property
+    @abstractmethod
+    def snapshot(self) -> Snapshot:
+        pass
+
+    @abstractmethod
+    def publish(self, items: Dict[str, Metar], built_at: Optional[datetime] = None) -> Snapshot:
+        pass
+
 
 class ITAFRepository(ABC):
 
@@ -59,4 +89,13 @@ class ITAFRepository(ABC):
     async def delete(self, taf: TAF) -> None:
         pass
 
+    @property
+    @abstractmethod
+    def snapshot(self) -> Snapshot:
+        pass
+
+    @abstractmethod
+    def publish(self, items: Dict[str, TAF], built_at: Optional[datetime] = None) -> Snapshot:
+        pass
+
 
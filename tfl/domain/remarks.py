@@ -1,6 +1,6 @@
 from .weather import Remark
 import re
-from typing import Optional, Pattern, List
+from typing import Callable, Optional, Pattern, List, Dict, Tuple, Union
 from decimal import Decimal
 
 from .weather_translations import wx_phenomenon
@@ -18,10 +18,20 @@ CEILING_VARIABLE = re.compile(r"CIG (\d{2})V(\d{2})")
 HOURLY_TEMP = re.compile(r"T(0|1)(\d{3})(0|1)(\d{3})")
 SEA_LEVEL_PRESSURE = re.compile(r"SLP(\d{3})")
 
-def wind_pattern(text: str) -> Optional[Remark]:
-    match = re.search(WIND_PATTERN, text)
-    if match is None:
-        return
+LITERALS = {
+    'PRESFR': 'Pressure falling rapidly',
+    'PRESRR': 'Pressure rising rapidly',
+    '$': 'Maintenance needed on system',
+    'AO2': 'Automated station with precipitation discriminator',
+    'RVRNO': 'RVR missing',
+    'PWINO': 'Precipitation identifier information not available',
+    'PNO': 'Precipitation amount not available',
+    'FZRANO': 'Freezing rain information not available',
+    'TSNO': 'Thunderstorm information not available'
+}
+
+
+def _wind_pattern_remark(match: re.Match) -> Remark:
     wind, wind_time = match.groups()
     wind_dir, gust = wind[:3], wind[3:]
     if len(wind_time) > 2:
@@ -32,41 +42,60 @@ def wind_pattern(text: str) -> Optional[Remark]:
     return Remark(code=match.group(), text=text)
 
 
+def wind_pattern(text: str) -> Optional[Remark]:
+    match = re.search(WIND_PATTERN, text)
+    if match is None:
+        return
+    return _wind_pattern_remark(match)
+
+
 def ao2(text: str) -> Optional[Remark]:
     words = text.split()
     if any('AO2' == w.upper() for w in words):
         return Remark(code='AO2', text='Automated station with precipitation discriminator')
 
 
-def wind_shift(text: str) -> Optional[Remark]:
-    match = re.search(WIND_SHIFT, text)
-    if match is None:
-        return
+def _wind_shift_remark(match: re.Match) -> Remark:
     shift_time = match.groups()[0]
     fmt = f"{shift_time[:2]}:{shift_time[2:]}"
     return Remark(code=match.group(), text=f"Wind shift at {fmt}Z")
 
 
-def surface_visibility(text: str) -> Optional[Remark]:
-    match = re.search(TWR_SFC_VIS, text)
+def wind_shift(text: str) -> Optional[Remark]:
+    match = re.search(WIND_SHIFT, text)
     if match is None:
         return
+    return _wind_shift_remark(match)
+
+
+def _surface_visibility_remark(match: re.Match) -> Remark:
     source, visibility = match.groups()
     source = "Tower" if source == "TWR" else "ASOS"
     return Remark(code=match.group(), text=f"{source} reports {visibility}sm visibility")
 
 
+def surface_visibility(text: str) -> Optional[Remark]:
+    match = re.search(TWR_SFC_VIS, text)
+    if match is None:
+        return
+    return _surface_visibility_remark(match)
+
+
+def _hour_remark(match: re.Match, min=True, prefix_str='') -> Remark:
+    mod, degrees = match.groups()
+    mod = "" if mod == "0" else "-"
+    threshold = "Minimum" if min else "Maximum"
+    degrees = Decimal(degrees) * Decimal('0.1')
+    txt = f"{prefix_str} {threshold} Temp of {mod}{degrees}C"
+    return Remark(code=match.group(), text=txt.strip())
+
+
 def _hour_base(text: str, min=True, prefix_str='') -> Optional[Remark]:
     words = text.split()
     for w in words:
         match = re.match(MINIMUM_TEMP if min else MAXIUMUM_TEMP, w)
         if match is not None:
-            mod, degrees = match.groups()
-            mod = "" if mod == "0" else "-"
-            threshold = "Minimum" if min else "Maximum"
-            degrees = Decimal(degrees) * Decimal('0.1')
-            txt = f"{prefix_str} {threshold} Temp of {mod}{degrees}C"
-            return Remark(code=match.group(), text=txt.strip())
+            return _hour_remark(match, min=min, prefix_str=prefix_str)
 
 
 def six_hour_max(text: str) -> Optional[Remark]:
@@ -77,6 +106,17 @@ def six_hour_min(text: str) -> Optional[Remark]:
     return _hour_base(text, min=True, prefix_str='Six Hour')
 
 
+def _three_hour_precip_remark(match: re.Match) -> Remark:
+    measure = match.groups()[0]
+    if measure == "0000":
+        amount = "a trace of precipitation"
+    elif measure == "////":
+        amount = "a indeterminable amount of precipitation"
+    else:
+        amount = Decimal(measure) * Decimal("0.1")
+        amount = f"{amount} inches of precipitation"
+    return Remark(code=match.group(), text=f"Three Hour Precipitation measure with {amount}")
+
 
 def three_hour_precip(text: str) -> Optional[Remark]:
     words = text.split()
@@ -84,15 +124,7 @@ def three_hour_precip(text: str) -> Optional[Remark]:
         match = re.match(THREE_HOUR_PRECIP, w)
         if match is None:
             continue
-        measure = match.groups()[0]
-        if measure == "0000":
-            amount = "a trace of precipitation"
-        elif measure == "////":
-            amount = "a indeterminable amount of precipitation"
-        else:
-            amount = Decimal(measure) * Decimal("0.1")
-            amount = f"{amount} inches of precipitation"
-        return Remark(code=match.group(), text=f"Three Hour Precipitation measure with {amount}")
+        return _three_hour_precip_remark(match)
 
 
 def _split_and_find_match(text: str, pattern: Pattern[str]) -> Optional[re.Match]:
@@ -102,10 +134,7 @@ def _split_and_find_match(text: str, pattern: Pattern[str]) -> Optional[re.Match
             return match
 
 
-def twenty_four_hour_min_max(text: str) -> Optional[Remark]:
-    match = _split_and_find_match(text, TWENTY_FOUR_HOUR_TEMP)
-    if match is None:
-        return
+def _twenty_four_hour_remark(match: re.Match) -> Remark:
     max_mod, max_temp, min_mod, min_temp = match.groups()
     fmt_max = f"1{max_mod}{max_temp}"
     fmt_min = f"2{min_mod}{min_temp}"
@@ -115,19 +144,27 @@ def twenty_four_hour_min_max(text: str) -> Optional[Remark]:
     return Remark(code=match.group(), text=txt)
 
 
-def snow_depth(text: str) -> Optional[Remark]:
-    match = _split_and_find_match(text, SNOW_DEPTH)
+def twenty_four_hour_min_max(text: str) -> Optional[Remark]:
+    match = _split_and_find_match(text, TWENTY_FOUR_HOUR_TEMP)
     if match is None:
         return
+    return _twenty_four_hour_remark(match)
+
+
+def _snow_depth_remark(match: re.Match) -> Remark:
     depth = match.groups()[0]
     depth = int(depth)
     return Remark(code=match.group(), text=f"Snow depth of {depth} inches")
 
 
-def weather_beginning(text: str) -> Optional[Remark]:
-    match = re.search(WEATHER_BEGINNING, text)
+def snow_depth(text: str) -> Optional[Remark]:
+    match = _split_and_find_match(text, SNOW_DEPTH)
     if match is None:
         return
+    return _snow_depth_remark(match)
+
+
+def _weather_beginning_remark(match: re.Match) -> Remark:
     try:
         phenomenon, begin, end = match.groups()
     except ValueError:
@@ -143,16 +180,26 @@ def weather_beginning(text: str) -> Optional[Remark]:
         txt = f"{txt}, ended at {end_fmt}"
     return Remark(code=match.group(), text=txt)
 
+
+def weather_beginning(text: str) -> Optional[Remark]:
+    match = re.search(WEATHER_BEGINNING, text)
+    if match is None:
+        return
+    return _weather_beginning_remark(match)
+
+
+def _virga_remark(match: Optional[re.Match] = None) -> Remark:
+    return Remark(code="VIRGA", text="Precipitation not reaching the ground")
+
+
 def virga(text: str) -> Optional[Remark]:
     if any('VIRGA' == w.upper() for w in text.split()):
-        return Remark(code="VIRGA", text="Precipitation not reaching the ground")
+        return _virga_remark()
 
-def hourly_temp_dew(text: str) -> Optional[Remark]:
-    match = _split_and_find_match(text, HOURLY_TEMP)
+
+def _hourly_temp_dew_remark(match: re.Match) -> Remark:
     is_neg = lambda s: s == "1"
     tenths = Decimal('0.1')
-    if match is None:
-        return
     temp_mod, temp, dew_mod, dew_temp = match.groups()
     temp = Decimal(temp) * tenths
     dew_temp = Decimal(dew_temp) * tenths
@@ -161,10 +208,15 @@ def hourly_temp_dew(text: str) -> Optional[Remark]:
     txt = f"Hourly Temp {temp_mod}{temp}C and Dewpoint {dew_mod}{dew_temp}C"
     return Remark(code=match.group(), text=txt)
 
-def sea_level_pressure(text: str) -> Optional[Remark]:
-    match = _split_and_find_match(text, SEA_LEVEL_PRESSURE)
+
+def hourly_temp_dew(text: str) -> Optional[Remark]:
+    match = _split_and_find_match(text, HOURLY_TEMP)
     if match is None:
         return
+    return _hourly_temp_dew_remark(match)
+
+
+def _sea_level_pressure_remark(match: re.Match) -> Remark:
     pressure = match.groups()[0]
     first_digit = pressure[0]
     pressure = Decimal(pressure) * Decimal('0.1')
@@ -173,23 +225,19 @@ def sea_level_pressure(text: str) -> Optional[Remark]:
     return Remark(code=match.group(), text=txt)
 
 
+def sea_level_pressure(text: str) -> Optional[Remark]:
+    match = _split_and_find_match(text, SEA_LEVEL_PRESSURE)
+    if match is None:
+        return
+    return _sea_level_pressure_remark(match)
+
+
 def parse_literals(text: str) -> List[Remark]:
-    literals = {
-        'PRESFR': 'Pressure falling rapidly',
-        'PRESRR': 'Pressure rising rapidly',
-        '$': 'Maintenance needed on system',
-        'AO2': 'Automated station with precipitation discriminator',
-        'RVRNO': 'RVR missing',
-        'PWINO': 'Precipitation identifier information not available',
-        'PNO': 'Precipitation amount not available',
-        'FZRANO': 'Freezing rain information not available',
-        'TSNO': 'Thunderstorm information not available'
-    }
     container = []
     for w in text.split():
         w = w.upper()
-        if w in literals.keys():
-            txt = literals[w]
+        if w in LITERALS.keys():
+            txt = LITERALS[w]
             container.append(Remark(code=w, text=txt))
     return container
 
@@ -207,4 +255,129 @@ remarks_pipeline = [
     hourly_temp_dew,
     virga,
     sea_level_pressure
-]
\ No newline at end of file
+]
+
+
+def pipeline_remarks(
+        text: str,
+        pipeline: List[Callable[[str], Union[Optional[Remark], List[Remark]]]] = remarks_pipeline
+) -> List[Remark]:
+    """
+    Runs each function of a pipeline in turn, removing every occurrence of the
+    codes it matched before the next runs. This was how remarks were parsed
+    before `parse_remarks`, and is kept as the reference it is checked against.
+    """
+    remarks = []
+    for func in pipeline:
+        if text == '':
+            return remarks
+        value = func(text)
+        if isinstance(value, list):
+            for v in value:
+                remarks.append(v)
+                text = text.replace(v.code, '')
+        if isinstance(value, Remark):
+            remarks.append(value)
+            text = text.replace(value.code, '')
+    return remarks
+
+
+# Single pass remarks engine. The RMK text is split once and each token is
+# classified by one combined expression, or the keyword table for groups that
+# span several words. Rules then claim their first unclaimed token in pipeline
+# order which mirrors remarks_pipeline removing each matched code before the
+# next function runs.
+TOKEN_PATTERN = re.compile(
+    r"(?P<six_hour_max>1[01]\d{3})"
+    r"|(?P<six_hour_min>2[01]\d{3})"
+    r"|(?P<three_hour_precip>3(?:\d{4}|/{4}))"
+    r"|(?P<twenty_four_hour_min_max>4[01]\d{3}[01]\d{3})"
+    r"|(?P<snow_depth>4/\d{3})"
+    r"|(?P<hourly_temp_dew>T[01]\d{3}[01]\d{3})"
+    r"|(?P<sea_level_pressure>SLP\d{3})"
+)
+
+_TOKEN_PATTERNS: Dict[str, Pattern[str]] = {
+    'six_hour_max': MAXIUMUM_TEMP,
+    'six_hour_min': MINIMUM_TEMP,
+    'three_hour_precip': THREE_HOUR_PRECIP,
+    'twenty_four_hour_min_max': TWENTY_FOUR_HOUR_TEMP,
+    'snow_depth': SNOW_DEPTH,
+    'hourly_temp_dew': HOURLY_TEMP,
+    'sea_level_pressure': SEA_LEVEL_PRESSURE,
+}
+
+# Leading word -> (rule, pattern, number of words in the group)
+_KEYWORDS: Dict[str, Tuple[str, Pattern[str], int]] = {
+    'PK': ('wind_pattern', WIND_PATTERN, 3),
+    'WSHFT': ('wind_shift', WIND_SHIFT, 2),
+    'TWR': ('surface_visibility', TWR_SFC_VIS, 3),
+    'SFC': ('surface_visibility', TWR_SFC_VIS, 3),
+}
+
+# Rules in the same order as remarks_pipeline
+_RULES = {
+    'wind_pattern': _wind_pattern_remark,
+    'wind_shift': _wind_shift_remark,
+    'surface_visibility': _surface_visibility_remark,
+    'six_hour_max': lambda match: _hour_remark(match, min=False, prefix_str='Six Hour'),
+    'six_hour_min': lambda match: _hour_remark(match, min=True, prefix_str='Six Hour'),
+    'three_hour_precip': _three_hour_precip_remark,
+    'twenty_four_hour_min_max': _twenty_four_hour_remark,
+    'snow_depth': _snow_depth_remark,
+    'weather_beginning': _weather_beginning_remark,
+    'hourly_temp_dew': _hourly_temp_dew_remark,
+    'virga': _virga_remark,
+    'sea_level_pressure': _sea_level_pressure_remark,
+}
+
+
+def parse_remarks(text: str) -> List[Remark]:
+    """
+    Parses the RMK section of a METAR in a single pass over its words.
+    Produces the same remarks, in the same order, as `pipeline_remarks`. A
+    group repeated word for word is claimed with its first occurrence, as the
+    pipeline removed every occurrence of a matched code. The one difference
+    is that a code is only removed from whole words, so a six hour group such
+    as 10211 no longer wipes out part of a later T10211006 hourly group.
+    """
+    tokens = text.split()
+    remarks = []
+    candidates: Dict[str, List[Tuple[int, int, Optional[re.Match]]]] = {}
+    for i, token in enumerate(tokens):
+        upper = token.upper()
+        literal = LITERALS.get(upper)
+        if literal is not None:
+            remarks.append(Remark(code=upper, text=literal))
+            continue
+        keyword = _KEYWORDS.get(token)
+        if keyword is not None:
+            rule, pattern, width = keyword
+            match = pattern.match(' '.join(tokens[i:i + width]))
+            if match is not None:
+                candidates.setdefault(rule, []).append((i, i + width, match))
+        match = TOKEN_PATTERN.match(token)
+        if match is not None:
+            rule = match.lastgroup
+            candidates.setdefault(rule, []).append((i, i + 1, _TOKEN_PATTERNS[rule].match(token)))
+        elif upper == 'VIRGA':
+            candidates.setdefault('virga', []).append((i, i + 1, None))
+        if 'B' in token:
+            match = WEATHER_BEGINNING.search(token)
+            if match is not None:
+                candidates.setdefault('weather_beginning', []).append((i, i + 1, match))
+
+    claimed = set()
+    for rule, remark in _RULES.items():
+        for start, end, match in candidates.get(rule, ()):
+            span = range(start, end)
+            if claimed.isdisjoint(span):
+                claimed.update(span)
+                if tokens.count(tokens[start]) > 1:
+                    group = tokens[start:end]
+                    for other in range(len(tokens) - len(group) + 1):
+                        if tokens[other:other + len(group)] == group:
+                            claimed.update(range(other, other + len(group)))
+                remarks.append(remark(match))
+                break
+    return remarks
@@ -1,11 +1,11 @@
 import pathlib
 import re
 from datetime import datetime, timezone
-from typing import Dict, Any, NamedTuple, Optional
+from typing import Dict, Any, Iterator, List, NamedTuple, Optional, Tuple
 
 import xmltodict
 
-from tfl.domain.facilities import DTPPHeader
+from tfl.domain.facilities import DTPPHeader, FAAPlate
 from xml.etree import ElementTree as ET
 DTPP_DATE_PATTERN = re.compile(r'(\d{4})Z\s+(\d+\/\d+\/\d+)')
 
@@ -16,22 +16,163 @@ def convert_dtpp_date(date_string: str) -> datetime:
 
 def get_dtpp_header(path: pathlib.Path) -> Optional[DTPPHeader]:
     try:
-        for _, elem in ET.iterparse(path, events=("start", "end")):
-            if elem.tag == 'digital_tpp':
-                cycle = elem.attrib.get('Cycle')
-                if cycle is None:
-                    # wtf faa
-                    cycle = elem.attrib['cycle']
-                return DTPPHeader(
-                    cycle=cycle,
-                    valid_from=convert_dtpp_date(elem.attrib['from_edate']),
-                    valid_to=convert_dtpp_date(elem.attrib['to_edate']),
-                )
+        with open(path, 'rb') as fh:
+            # The header is the root element, nothing past its start is read
+            for _, elem in ET.iterparse(fh, events=("start",)):
+                if elem.tag == 'digital_tpp':
+                    cycle = elem.attrib.get('Cycle')
+                    if cycle is None:
+                        # wtf faa
+                        cycle = elem.attrib['cycle']
+                    return DTPPHeader(
+                        cycle=cycle,
+                        valid_from=convert_dtpp_date(elem.attrib['from_edate']),
+                        valid_to=convert_dtpp_date(elem.attrib['to_edate']),
+                    )
     except FileNotFoundError:
         return
 
+
+class DTPPHeaderCache:
+    """
+    Parsed metafile headers keyed by path, modification time and size, so
+    checking a cached cycle again is a stat instead of opening and parsing
+    the file.
+    """
+
+    def __init__(self):
+        self._headers: Dict[pathlib.Path, Tuple[Tuple[int, int], Optional[DTPPHeader]]] = {}
+        # Number of headers parsed from files, for instrumentation
+        self.parsed = 0
+
+    def get(self, path: pathlib.Path) -> Optional[DTPPHeader]:
+        """
+        The header of a metafile, None when there is no such file. This does
+        file I/O, call it from a thread.
+        """
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            self._headers.pop(path, None)
+            return
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = self._headers.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        header = get_dtpp_header(path)
+        self.parsed += 1
+        self._headers[path] = (key, header)
+        return header
+
+    def discard(self, path: pathlib.Path):
+        self._headers.pop(path, None)
+
+
 def load_raw_plate_data(path: pathlib.Path) -> Dict[str, Any]:
     with open(path, 'r', encoding='utf-8') as f:
         data = xmltodict.parse(f.read())
         return data
 
+
+def _text(elem: ET.Element, tag: str) -> str:
+    # Surrounding whitespace is dropped, as xmltodict did
+    return (elem.findtext(tag) or '').strip()
+
+
+def iter_plates(path: pathlib.Path) -> Iterator[Tuple[str, List[FAAPlate]]]:
+    """
+    Incrementally parses a d-tpp metafile and yields the plates of each
+    <airport_name> as soon as it has been read. Processed elements are cleared
+    so memory does not grow with the size of the file.
+    Parameters
+    ----------
+    path
+        The metafile
+    Returns
+    -------
+    Iterator[Tuple[str, List[FAAPlate]]]
+        The upper case ICAO identifier and plates of each airport, in file
+        order. Airports without an ICAO identifier have an empty one.
+
+    """
+    cycle = None
+    for event, elem in ET.iterparse(path, events=("start", "end")):
+        if event == "start":
+            if elem.tag == 'digital_tpp':
+                cycle = elem.attrib.get('Cycle')
+                if cycle is None:
+                    # wtf FAA
+                    cycle = elem.attrib['cycle']
+            continue
+        if elem.tag == 'airport_name':
+            icao = elem.attrib.get('icao_ident', '').upper()
+            plates = [
+                FAAPlate(
+                    tpp_cycle=cycle,
+                    icao=icao,
+                    code=_text(r, 'chart_code'),
+                    name=_text(r, 'chart_name'),
+                    pdf_name=_text(r, 'pdf_name')
+                )
+                for r in elem.iterfind('record') if len(r)
+            ]
+            yield icao, plates
+            elem.clear()
+        elif elem.tag in ('city_name', 'state_code'):
+            elem.clear()
+
+
+class PlateChanges(NamedTuple):
+    """
+    The charts of one airport that differ between two cycles. Charts are
+    compared without their cycle, which is part of every plate.
+    """
+    added: List[FAAPlate]
+    removed: List[FAAPlate]
+    # Old and new plate of a chart that kept its PDF but changed name or code
+    renamed: List[Tuple[FAAPlate, FAAPlate]]
+
+
+def chart_key(plate: FAAPlate) -> Tuple[str, str, str]:
+    """
+    What identifies a chart across cycles, everything but the cycle number.
+    """
+    return plate.code, plate.name, plate.pdf_name
+
+
+def diff_airport_plates(old: List[FAAPlate], new: List[FAAPlate]) -> Optional[PlateChanges]:
+    """
+    The changes from one cycle's plates of an airport to the next, None when
+    the same charts are published.
+    """
+    old_charts = {chart_key(p): p for p in old}
+    new_charts = {chart_key(p): p for p in new}
+    if old_charts.keys() == new_charts.keys():
+        return
+    added = [p for c, p in new_charts.items() if c not in old_charts]
+    removed = [p for c, p in old_charts.items() if c not in new_charts]
+    renamed = []
+    removed_by_pdf: Dict[str, List[FAAPlate]] = {}
+    for p in removed:
+        removed_by_pdf.setdefault(p.pdf_name, []).append(p)
+    for p in list(added):
+        candidates = removed_by_pdf.get(p.pdf_name)
+        if candidates:
+            previous = candidates.pop(0)
+            renamed.append((previous, p))
+            added.remove(p)
+            removed.remove(previous)
+    return PlateChanges(added=added, removed=removed, renamed=renamed)
+
+
+def diff_plates(old: Dict[str, List[FAAPlate]], new: Dict[str, List[FAAPlate]]) -> Dict[str, PlateChanges]:
+    """
+    The per airport changes between two cycles keyed by ICAO identifier.
+    Airports whose charts did not change are left out.
+    """
+    changes = {}
+    for icao in old.keys() | new.keys():
+        airport_changes = diff_airport_plates(old.get(icao, []), new.get(icao, []))
+        if airport_changes is not None:
+            changes[icao] = airport_changes
+    return changes
@@ -0,0 +1,142 @@
+import hashlib
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, TypeVar
+
+from tfl.domain.facilities import FAAPlate
+
+T = TypeVar("T")
+
+
+class StaleCursorError(ValueError):
+    """
+    A cursor of another DTPP cycle or catalog build, whose positions no
+    longer line up.
+    """
+
+
+class CatalogPage(NamedTuple):
+    items: list
+    total: int
+    # Position to continue from, None on the last page
+    next: Optional[int]
+
+
+def _page(items: Sequence[T], rows: Optional[List[int]], start: int, offset: int, limit: int) -> CatalogPage:
+    if rows is None:
+        first = start + offset
+        selected = range(first, min(first + limit, len(items)))
+        remaining = first + limit < len(items)
+        total = len(items)
+    else:
+        first = bisect_left(rows, start) + offset
+        selected = rows[first:first + limit]
+        remaining = first + limit < len(rows)
+        total = len(rows)
+    return CatalogPage(
+        items=[items[row] for row in selected],
+        total=total,
+        next=selected[-1] + 1 if remaining and len(selected) else None
+    )
+
+
+class PlateCatalog:
+    """
+    The plates of every airport flattened into one array, with the ICAO
+    identifiers that have plates and the rows of each chart code, so a page
+    is sliced out instead of collecting every plate per request.
+
+    Positions are rows of the flat arrays. They stay valid across chart code
+    filters and across instances built from the same plates. Cursors carry
+    the cycle and a build identifier hashed from the listed charts, so a
+    cursor of a rebuilt catalog with other rows is recognised as stale.
+    """
+
+    def __init__(self, airports: Iterable[Tuple[str, List[FAAPlate]]] = (), cycle: int = 0):
+        """
+
+        Parameters
+        ----------
+        airports
+            The ICAO identifier and plates of each airport, in listing order
+        cycle
+            The DTPP cycle of the plates
+        """
+        self.cycle = cycle
+        self.plates: List[FAAPlate] = []
+        self.icaos: List[str] = []
+        self._plate_rows: Dict[str, List[int]] = defaultdict(list)
+        self._icao_rows: Dict[str, List[int]] = defaultdict(list)
+        build = hashlib.blake2b(digest_size=4)
+        for icao, plates in airports:
+            if not plates:
+                continue
+            build.update(f"{icao}:{','.join(plate.pdf_name for plate in plates)};".encode())
+            icao_row = len(self.icaos)
+            self.icaos.append(icao)
+            for plate in plates:
+                rows = self._plate_rows[plate.code]
+                rows.append(len(self.plates))
+                self.plates.append(plate)
+                icao_rows = self._icao_rows[plate.code]
+                if not icao_rows or icao_rows[-1] != icao_row:
+                    icao_rows.append(icao_row)
+        self._plate_rows = dict(self._plate_rows)
+        self._icao_rows = dict(self._icao_rows)
+        self.build = build.hexdigest()
+
+    def cursor(self, position: int) -> str:
+        """
+        An opaque cursor for a position, tied to the cycle and build of the
+        catalog.
+        """
+        return f"{self.cycle}.{self.build}.{position}"
+
+    def position(self, cursor: str) -> int:
+        """
+        The position of a cursor made by `cursor`.
+        Raises
+        ------
+        ValueError
+            The cursor is malformed
+        StaleCursorError
+            The cursor is of another cycle or build
+        """
+        parts = cursor.split('.')
+        if len(parts) != 3 or not parts[0].isdigit() or not parts[2].isdigit():
+            raise ValueError(f"Malformed cursor {cursor!r}")
+        cycle, build, position = parts
+        if int(cycle) != self.cycle:
+            raise StaleCursorError(f"Cursor of cycle {cycle}, the plates are of cycle {self.cycle}")
+        if build != self.build:
+            raise StaleCursorError("Cursor of an earlier listing of the plates, start again from the first page")
+        return int(position)
+
+    def _rows(self, rows: Dict[str, List[int]], code: Optional[str]) -> Optional[List[int]]:
+        if code is None:
+            return None
+        return rows.get(code.upper(), [])
+
+    def plate_page(self, start: int = 0, offset: int = 0, limit: int = 20, code: Optional[str] = None) -> CatalogPage:
+        """
+        A page of plates.
+        Parameters
+        ----------
+        start
+            Position to continue from, the `next` of the previous page
+        offset
+            Number of matching plates to skip after `start`
+        limit
+            Maximum number of plates
+        code
+            Only plates with this chart code, e.g. IAP
+        """
+        return _page(self.plates, self._rows(self._plate_rows, code), start, offset, limit)
+
+    def icao_page(self, start: int = 0, offset: int = 0, limit: Optional[int] = None, code: Optional[str] = None) -> CatalogPage:
+        """
+        A page of the ICAO identifiers of airports with plates, see `plate_page`.
+        Without a limit every remaining identifier is returned.
+        """
+        limit = limit if limit is not None else len(self.icaos)
+        return _page(self.icaos, self._rows(self._icao_rows, code), start, offset, limit)
@@ -0,0 +1,195 @@
+import copy
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Generic, Iterable, List, Optional, Tuple, TypeVar
+
+from fuzzywuzzy import fuzz
+
+from tfl.domain.facilities import FAAPlate
+from tfl.domain.services.dtpp import chart_key
+
+T = TypeVar("T")
+
+TOKEN_PATTERN = re.compile(r"[A-Z0-9]+")
+RUNWAY_PATTERN = re.compile(r"0*(\d{1,2})([LRC]?)")
+# Words that only connect the parts of a plate name
+STOP_WORDS = frozenset({'RWY', 'RUNWAY', 'OR', 'AND'})
+ALIASES = {'LOCALIZER': 'LOC'}
+
+# Weight of a query token matching a token of a name in each way
+EXACT = 1.0
+RUNWAY_SIDE = 0.9
+PREFIX = 0.8
+FUZZY = 0.7
+FUZZY_CUTOFF = 80
+FUZZY_MIN_LENGTH = 4
+
+
+def normalise_token(token: str) -> str:
+    runway = RUNWAY_PATTERN.fullmatch(token)
+    if runway is not None:
+        # 09L and 9L are the same runway
+        return runway.group(1) + runway.group(2)
+    return ALIASES.get(token, token)
+
+
+def tokenise(name: str) -> List[str]:
+    """
+    The search tokens of a plate name or query: upper case words, such as
+    the approach type, and runway numbers without punctuation, leading zeros
+    or connecting words, so "ILS OR LOC RWY 09L" and "ils 9l" share the
+    tokens ILS and 9L.
+    """
+    return [normalise_token(token) for token in TOKEN_PATTERN.findall(name.upper()) if token not in STOP_WORDS]
+
+
+class NameIndex(Generic[T]):
+    """
+    An inverted index of the tokens of a set of names. A query only looks up
+    its own tokens, and the vocabulary for prefix and fuzzy ones, instead of
+    scoring every name.
+    """
+
+    def __init__(self, names: Iterable[Tuple[str, T]] = ()):
+        """
+
+        Parameters
+        ----------
+        names
+            The name and item of every entry to index, ties rank in this order
+        """
+        self.items: List[T] = []
+        self._lengths: List[int] = []
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        for name, item in names:
+            tokens = set(tokenise(name))
+            row = len(self.items)
+            self.items.append(item)
+            self._lengths.append(len(tokens))
+            for token in tokens:
+                self._postings[token].append(row)
+        self._postings = dict(self._postings)
+        self._vocabulary: List[str] = sorted(self._postings)
+        self._runways: Dict[str, List[str]] = defaultdict(list)
+        for token in self._vocabulary:
+            runway = RUNWAY_PATTERN.fullmatch(token)
+            if runway is not None and runway.group(2):
+                self._runways[runway.group(1)].append(token)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def _expand(self, token: str) -> Dict[str, float]:
+        """
+        The indexed tokens a query token matches and the weight of each.
+        """
+        matches: Dict[str, float] = {}
+        if token in self._postings:
+            matches[token] = EXACT
+        if token.isdigit():
+            # A runway without a side matches all of its sides
+            for runway in self._runways.get(token, ()):
+                matches[runway] = RUNWAY_SIDE
+            return matches
+        if len(token) > 1 and not token[0].isdigit():
+            start = bisect_left(self._vocabulary, token)
+            for candidate in self._vocabulary[start:]:
+                if not candidate.startswith(token):
+                    break
+                matches.setdefault(candidate, PREFIX)
+        if not matches and len(token) >= FUZZY_MIN_LENGTH:
+            for candidate in self._vocabulary:
+                ratio = fuzz.ratio(token, candidate)
+                if ratio >= FUZZY_CUTOFF:
+                    matches[candidate] = FUZZY * ratio / 100
+        return matches
+
+    def rank(self, query: str, match_all: bool = False) -> List[Tuple[T, float]]:
+        """
+        Items whose names share tokens with a query, best first.
+        Parameters
+        ----------
+        query
+            Free text such as "ILS 27" or "rnav z rwy 9l"
+        match_all
+            Only return items matching every token of the query
+        Returns
+        -------
+        List[Tuple[T, float]]
+            Each item with its score between 0 and 1, the mean weight of the
+            query tokens. Equal scores rank names with fewer tokens first.
+
+        """
+        tokens = list(dict.fromkeys(tokenise(query)))
+        if not tokens:
+            return []
+        scores: Dict[int, float] = defaultdict(float)
+        matched: Dict[int, int] = defaultdict(int)
+        for token in tokens:
+            best: Dict[int, float] = {}
+            for candidate, weight in self._expand(token).items():
+                for row in self._postings[candidate]:
+                    if weight > best.get(row, 0):
+                        best[row] = weight
+            for row, weight in best.items():
+                scores[row] += weight
+                matched[row] += 1
+        rows = scores.keys() if not match_all else [row for row, count in matched.items() if count == len(tokens)]
+        ordered = sorted(rows, key=lambda row: (-scores[row], self._lengths[row], row))
+        return [(self.items[row], scores[row] / len(tokens)) for row in ordered]
+
+    def with_items(self, items: List[T]) -> 'NameIndex[T]':
+        """
+        A copy of the index returning other items for the same names, row for
+        row. The token tables are shared, not built again.
+        """
+        index = copy.copy(self)
+        index.items = items
+        return index
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[T]:
+        """
+        Items matching every token of a query, best first.
+        """
+        return [item for item, _ in self.rank(query, match_all=True)[:limit]]
+
+    def best(self, query: str, tolerance: float = 0.07) -> List[T]:
+        """
+        The best matches of a query: the top ranked item and any scoring
+        within `tolerance` of it.
+        """
+        ranked = self.rank(query)
+        if not ranked:
+            return []
+        highest = ranked[0][1]
+        return [item for item, score in ranked if highest - score < tolerance]
+
+
+class PlateSearchIndex(NameIndex[FAAPlate]):
+    """
+    The plates of one airport indexed by name.
+    """
+
+    def __init__(self, plates: Iterable[FAAPlate] = ()):
+        super().__init__((plate.name, plate) for plate in plates)
+
+    def for_plates(self, plates: List[FAAPlate]) -> Optional['PlateSearchIndex']:
+        """
+        The index over the plates of another cycle with the same charts,
+        matched by `chart_key`. None when the charts differ.
+        """
+        if len(plates) != len(self.items):
+            return None
+        by_chart = {chart_key(plate): plate for plate in plates}
+        items = [by_chart.get(chart_key(plate)) for plate in self.items]
+        if any(item is None for item in items):
+            return None
+        return self.with_items(items)
+
+
+def build_plate_search(plates: Dict[str, List[FAAPlate]]) -> Dict[str, PlateSearchIndex]:
+    """
+    A search index of each airport's plates, keyed by ICAO identifier.
+    """
+    return {icao: PlateSearchIndex(airport_plates) for icao, airport_plates in plates.items()}
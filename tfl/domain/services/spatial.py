@@ -0,0 +1,135 @@
+import math
+from collections import defaultdict
+from typing import Dict, Generic, Iterable, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+EARTH_RADIUS_NM = 3440.065
+# Half the circumference, no two points on earth are further apart
+MAX_DISTANCE_NM = math.pi * EARTH_RADIUS_NM
+
+
+def distance_nm(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Great circle distance between two points in nautical miles.
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_NM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class SpatialIndex(Generic[T]):
+    """
+    Buckets items into a grid of fixed size latitude/longitude cells so a
+    radius or bounding box query only looks at the cells it overlaps instead
+    of every item.
+    """
+
+    def __init__(self, points: Iterable[Tuple[float, float, T]] = (), cell_size: float = 1.0):
+        """
+
+        Parameters
+        ----------
+        points
+            Latitude, longitude and item of every point to index
+        cell_size
+            Size of a grid cell in degrees
+        """
+        self.cell_size = cell_size
+        self._columns = math.ceil(360 / cell_size)
+        self._rows = math.ceil(180 / cell_size)
+        self._cells: Dict[Tuple[int, int], List[Tuple[float, float, T]]] = defaultdict(list)
+        self._count = 0
+        for latitude, longitude, item in points:
+            self.add(latitude, longitude, item)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _row(self, latitude: float) -> int:
+        return min(max(int((latitude + 90) // self.cell_size), 0), self._rows - 1)
+
+    def _column(self, longitude: float) -> int:
+        return int(((longitude + 180) % 360) // self.cell_size) % self._columns
+
+    def _columns_between(self, west: float, east: float) -> Iterable[int]:
+        first = math.floor((west + 180) / self.cell_size)
+        last = math.floor((east + 180) / self.cell_size)
+        if last - first + 1 >= self._columns:
+            return range(self._columns)
+        # Columns past either edge wrap around the antimeridian
+        return [column % self._columns for column in range(first, last + 1)]
+
+    def add(self, latitude: float, longitude: float, item: T):
+        self._cells[(self._row(latitude), self._column(longitude))].append((latitude, longitude, item))
+        self._count += 1
+
+    def near(
+            self,
+            latitude: float,
+            longitude: float,
+            radius_nm: Optional[float] = None,
+            limit: Optional[int] = None
+    ) -> List[Tuple[float, T]]:
+        """
+        Items within a radius of a point, closest first.
+        Parameters
+        ----------
+        latitude
+            Latitude of the center point
+        longitude
+            Longitude of the center point
+        radius_nm
+            Search radius in nautical miles. Without a radius the search
+            widens until `limit` items are found.
+        limit
+            Maximum number of items returned
+        Returns
+        -------
+        List[Tuple[float, T]]
+            The distance in nautical miles and item of each match.
+
+        """
+        if radius_nm is not None:
+            return self._near(latitude, longitude, radius_nm, limit)
+        radius_nm = 25.0
+        wanted = limit if limit is not None else 1
+        while True:
+            found = self._near(latitude, longitude, radius_nm, limit)
+            if len(found) >= min(wanted, self._count) or radius_nm >= MAX_DISTANCE_NM:
+                return found
+            radius_nm *= 4
+
+    def _near(self, latitude: float, longitude: float, radius_nm: float, limit: Optional[int]) -> List[Tuple[float, T]]:
+        dlat = radius_nm / 60
+        widest = abs(latitude) + dlat
+        if widest >= 89.9:
+            dlon = 360.0
+        else:
+            dlon = min(dlat / math.cos(math.radians(widest)), 360.0)
+        found = []
+        for row in range(self._row(latitude - dlat), self._row(latitude + dlat) + 1):
+            for column in self._columns_between(longitude - dlon, longitude + dlon):
+                for lat, lon, item in self._cells.get((row, column), ()):
+                    distance = distance_nm(latitude, longitude, lat, lon)
+                    if distance <= radius_nm:
+                        found.append((distance, item))
+        found.sort(key=lambda match: match[0])
+        return found[:limit] if limit is not None else found
+
+    def within(self, south: float, west: float, north: float, east: float) -> List[T]:
+        """
+        Items inside a bounding box. A box whose west edge is greater than
+        its east edge crosses the antimeridian.
+        """
+        if west > east:
+            east += 360
+        found = []
+        for row in range(self._row(south), self._row(north) + 1):
+            for column in self._columns_between(west, east):
+                for lat, lon, item in self._cells.get((row, column), ()):
+                    if south <= lat <= north and (west <= lon <= east or west <= lon + 360 <= east):
+                        found.append(item)
+        return found
@@ -1,14 +1,29 @@
 from __future__ import annotations
 
-import re
+import logging
+from datetime import datetime
 from decimal import Decimal, ROUND_UP
-from typing import List, Dict, Tuple
+from typing import List, Tuple
 
+from dateutil.parser import parse
+from dateutil.tz import tzutc
 from fuzzywuzzy import process, fuzz
 
 from tfl.domain.core import HeadAndTailString
+from tfl.domain.services.plate_search import NameIndex
 from tfl.domain.weather_translations import *
 
+log = logging.getLogger(__name__)
+
+# The same tzinfo dateutil attaches to a trailing Z so both paths give
+# identical datetimes.
+UTC = tzutc()
+
+# Number of timestamps that were not in the ADDS format and went through
+# dateutil in this process. Batches parsed in a pool process report their own
+# count, see parse_metar_batch.
+adds_time_fallbacks = 0
+
 
 def string_to_decimal_rounded(unit: str, precision='0.1', strategy=ROUND_UP) -> Decimal:
     return Decimal(unit).quantize(Decimal(precision), strategy)
@@ -22,6 +37,39 @@ def translate_flight_rule_abbr_to_text(abbr: str) -> str:
     return wx_flight_rules.get(abbr, 'Unknown Abbreviation')
 
 
+def parse_adds_time(value: str) -> datetime:
+    """
+    Parses an ADDS timestamp. The cache files use a fixed YYYY-MM-DDTHH:MM:SSZ
+    format, which is read with datetime.fromisoformat. Anything else falls back
+    to dateutil and is counted in adds_time_fallbacks.
+    Parameters
+    ----------
+    value
+        The timestamp text of the cache file.
+    Returns
+    -------
+    datetime
+        A timezone aware datetime in UTC.
+    """
+    global adds_time_fallbacks
+    if len(value) == 20 and value[10] == 'T' and value[19] == 'Z':
+        try:
+            return datetime.fromisoformat(value[:19]).replace(tzinfo=UTC)
+        except ValueError:
+            pass
+    adds_time_fallbacks += 1
+    log.debug(f"Irregular ADDS timestamp {value!r}, parsing with dateutil")
+    return parse(value)
+
+
+def as_utc(value: datetime) -> datetime:
+    """
+    Treats a naive datetime, such as one given in a query string without an
+    offset, as UTC.
+    """
+    return value.replace(tzinfo=UTC) if value.tzinfo is None else value
+
+
 def head_and_tail(line: str, n: int) -> HeadAndTailString:
     head, tail = line[:n], line[n:]
     return HeadAndTailString(head=head, tail=tail)
@@ -57,18 +105,10 @@ def get_string_ratios(input: str, comparable: Tuple[str]) -> List[Tuple[str, int
 
 
 def get_best_plates(text: str, comparables: str | List[str]) -> List[str]:
-    def sanitize_plate_name(name: str):
-        # To help with matching, remove stuff out of the name as much as possible
-        pattern = r"\s(runway|rwy|or)\s"
-        name = str(re.sub(pattern, ' ', name))
-        return name
-    comparable_mapping: Dict[str, str] = {sanitize_plate_name(name):name for name in comparables}
-    ratios = get_string_ratios(sanitize_plate_name(text), tuple(comparable_mapping.keys()))
-    print(f"Input is: {text}")
-    print(f"Comparing to {' | '.join(comparable_mapping.keys())}")
-    print("Ratios are")
-    print(ratios)
-    highest_ratio = ratios[0][1]
-    threshold = 7
-    return [comparable_mapping[r[0]] for r in ratios if highest_ratio - r[1] < threshold]
-
+    """
+    The names that best match a text, see `NameIndex.best`. A single name is
+    taken as the only candidate.
+    """
+    if isinstance(comparables, str):
+        comparables = [comparables]
+    return NameIndex((name, name) for name in comparables).best(text)
@@ -1,4 +1,5 @@
 from decimal import Decimal
+from enum import Enum
 from typing import Optional, List
 from datetime import datetime
 from tfl.domain.core import ValueObject, Aggregate, Form
@@ -252,3 +253,19 @@ class ICAO(str):
 class ICAOSearchForm(Form):
     icao: ICAO
 
+
+class MetarOrder(str, Enum):
+    """
+    Orders the METAR repository keeps a sorted index for.
+    """
+    longest = 'longest'
+    newest = 'newest'
+    flight_rule = 'flight_rule'
+
+
+class TAFOrder(str, Enum):
+    """
+    Orders the TAF repository keeps a sorted index for.
+    """
+    longest = 'longest'
+    newest = 'newest'
@@ -7,4 +7,8 @@ if TYPE_CHECKING:
 
 
 async def on_dtpp_change(header: DTPPHeader, version: DTPPVersionFile):
-    airport_repository.load_dtpp(version.file_path)
+    await airport_repository.load_dtpp(version.file_path)
+
+
+async def on_dtpp_stage(header: DTPPHeader, version: DTPPVersionFile):
+    await airport_repository.stage_dtpp(version.file_path)
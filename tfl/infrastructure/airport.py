@@ -1,13 +1,18 @@
+import asyncio
 import json
 import pathlib
-from typing import Optional, Dict, List
+from typing import NamedTuple, Optional, Dict, List
 
 from tfl.domain.exceptions import EntityExistsError, EntityNotFoundError
 from tfl.domain.facilities import Airport, FAAPlate
 from tfl.domain.interfaces.facility import IAirportRepository
+from tfl.domain.services.spatial import SpatialIndex
 import logging
 
-from tfl.domain.services.dtpp import load_raw_plate_data
+from tfl.domain.services.dtpp import PlateChanges, diff_plates, iter_plates
+from tfl.domain.services.plate_catalog import PlateCatalog
+from tfl.domain.services.plate_search import PlateSearchIndex, build_plate_search
+from tfl.infrastructure.plate_index import index_path, read_plate_index, write_plate_index
 
 log = logging.getLogger(__name__)
 BASE_DIR = pathlib.Path(__file__).parent.resolve()
@@ -27,86 +32,177 @@ def load_airport_data(path, plates=None) -> Dict[str, Airport]:
     return container
 
 
-def enforce_list(item):
-    if not isinstance(item, list):
-        return [item]
-    return item
-
-
 def parse_raw_plate_data(path: pathlib.Path) -> Dict[str, List[FAAPlate]]:
-    container = {}
-    d = load_raw_plate_data(path)
-    cycle = d['digital_tpp'].get('@Cycle')
-    if cycle is None:
-        # wtf FAA
-        cycle = d['digital_tpp']['@cycle']
-    
-    for state_obj in enforce_list(d['digital_tpp']['state_code']):
-        for city in enforce_list(state_obj['city_name']):
-            airport = city['airport_name']
-            # why is this data like this?
-            if isinstance(airport, list):
-                for o in enforce_list(airport):
-                    icao = o['@icao_ident']
-                    icao = icao.upper()
-                    if icao not in container.keys():
-                        container[icao] = []
-                    for r in enforce_list(o['record']):
-                        if not isinstance(r, dict):
-                            continue
-                        plate = FAAPlate(
-                            tpp_cycle=cycle,
-                            icao=icao,
-                            code=r['chart_code'],
-                            name=r['chart_name'],
-                            pdf_name=r['pdf_name']
-                        )
-                        container[icao].append(plate)
-            else:
-                icao = city['airport_name']['@icao_ident']
-                icao = icao.upper()
-                if icao not in container.keys():
-                    container[icao] = []
-                for r in enforce_list(city['airport_name']['record']):
-                    if not isinstance(r, dict):
-                        continue
-                    plate = FAAPlate(
-                        tpp_cycle=cycle,
-                        icao=icao,
-                        code=r['chart_code'],
-                        name=r['chart_name'],
-                        pdf_name=r['pdf_name']
-                    )
-                    container[icao].append(plate)
+    container: Dict[str, List[FAAPlate]] = {}
+    for icao, plates in iter_plates(path):
+        container.setdefault(icao, []).extend(plates)
     return container
 
 
+def plates_cycle(plates: Dict[str, List[FAAPlate]]) -> int:
+    """
+    The DTPP cycle of a set of plates, 0 when there are none.
+    """
+    return next((p.tpp_cycle for airport_plates in plates.values() for p in airport_plates), 0)
+
+
+def load_plate_data(path: pathlib.Path) -> Dict[str, List[FAAPlate]]:
+    """
+    The plates of a DTPP metafile. They are read from the binary index next
+    to the metafile when there is one for it, otherwise the metafile is parsed
+    and the index is written for the next time.
+    """
+    modified = path.stat().st_mtime_ns
+    plates = read_plate_index(index_path(path), source_modified=modified)
+    if plates is not None:
+        return plates
+    plates = parse_raw_plate_data(path)
+    cycle = plates_cycle(plates)
+    try:
+        write_plate_index(index_path(path), cycle, plates, modified)
+    except OSError as e:
+        log.warning(f"Could not write the plate index of {path.name}: {e}")
+    return plates
+
+
+class StagedCycle(NamedTuple):
+    path: pathlib.Path
+    modified: int
+    # The applied plates the changes were computed against
+    base: Dict[str, List[FAAPlate]]
+    plates: Dict[str, List[FAAPlate]]
+    changes: Dict[str, PlateChanges]
+    # Search indexes of the airports whose charts changed
+    search: Dict[str, PlateSearchIndex]
+
+
 class AirportRepository(IAirportRepository):
 
 
     def __init__(self):
         blah = AIRPORTS_PATH
         self.repo: Dict[str, Airport] = load_airport_data(AIRPORTS_PATH)
-
-    def load_dtpp(self, path: pathlib.Path):
-        dtpp = parse_raw_plate_data(path)
-        for icao, plates in dtpp.items():
-            if icao in self.repo.keys():
-                self.repo[icao].plates = plates
-        log.info("DTPP Plate Data loaded to Airport Repository")
-
+        self.spatial: SpatialIndex[Airport] = self._build_spatial_index()
+        # Plates of the applied DTPP cycle and the changes its switch made
+        self.dtpp: Dict[str, List[FAAPlate]] = {}
+        self.dtpp_changes: Dict[str, PlateChanges] = {}
+        # Name search of the applied plates of each airport
+        self.plate_search: Dict[str, PlateSearchIndex] = {}
+        # All plates of the airports flattened for listing
+        self.plate_catalog: PlateCatalog = PlateCatalog()
+        self._dtpp_source: Optional[tuple] = None
+        self._staged: Optional[StagedCycle] = None
+
+    def _build_spatial_index(self) -> SpatialIndex[Airport]:
+        return SpatialIndex(
+            (float(airport.latitude), float(airport.longitude), airport)
+            for airport in self.repo.values()
+        )
+
+    def _build_plate_catalog(self) -> PlateCatalog:
+        return PlateCatalog(
+            ((icao, airport.plates) for icao, airport in self.repo.items()), self.plate_catalog.cycle
+        )
+
+    async def stage_dtpp(self, path: pathlib.Path) -> Dict[str, PlateChanges]:
+        """
+        Parses an upcoming DTPP cycle and diffs it against the applied one
+        ahead of its switchover. The applied plates are served until the
+        cycle is loaded with `load_dtpp`, which then only swaps it in.
+        Parameters
+        ----------
+        path
+            The metafile of the upcoming cycle
+        Returns
+        -------
+        Dict[str, PlateChanges]
+            The changes of each airport whose charts differ
+
+        """
+        modified = path.stat().st_mtime_ns
+        base = self.dtpp
+        plates = await asyncio.to_thread(load_plate_data, path)
+        changes = await asyncio.to_thread(diff_plates, base, plates)
+        search = await asyncio.to_thread(build_plate_search, {icao: plates.get(icao, []) for icao in changes})
+        self._staged = StagedCycle(
+            path=path, modified=modified, base=base, plates=plates, changes=changes, search=search
+        )
+        log.info(f"Staged DTPP {path.name} with chart changes at {len(changes)} airports")
+        return changes
+
+    async def load_dtpp(self, path: pathlib.Path):
+        """
+        Switches the airports to the plates of a DTPP cycle. A cycle staged
+        with `stage_dtpp` is not parsed again. Airports whose charts did not
+        change keep their search indexes, over the plates of the new cycle.
+        """
+        source = (path, path.stat().st_mtime_ns)
+        if source == self._dtpp_source:
+            log.debug(f"DTPP {path.name} is already loaded")
+            return
+        staged = self._staged
+        changed_search = None
+        if staged is not None and (staged.path, staged.modified) == source:
+            plates = staged.plates
+            if staged.base is self.dtpp:
+                changes, changed_search = staged.changes, staged.search
+        else:
+            plates = await asyncio.to_thread(load_plate_data, path)
+        if changed_search is None:
+            changes = await asyncio.to_thread(diff_plates, self.dtpp, plates)
+            changed_search = await asyncio.to_thread(
+                build_plate_search, {icao: plates.get(icao, []) for icao in changes}
+            )
+        search: Dict[str, PlateSearchIndex] = {}
+        for icao, airport_plates in plates.items():
+            index = changed_search.get(icao)
+            if index is None and icao in self.plate_search:
+                index = self.plate_search[icao].for_plates(airport_plates)
+            search[icao] = index if index is not None else PlateSearchIndex(airport_plates)
+        updated = 0
+        for icao in plates.keys() | self.dtpp.keys():
+            airport = self.repo.get(icao)
+            if airport is None:
+                continue
+            airport.plates = plates.get(icao, [])
+            updated += 1
+        airports = [(icao, airport.plates) for icao, airport in self.repo.items()]
+        self.plate_catalog = await asyncio.to_thread(PlateCatalog, airports, plates_cycle(plates))
+        self.dtpp = plates
+        self.dtpp_changes = changes
+        self.plate_search = search
+        self._dtpp_source = source
+        self._staged = None
+        log.info(f"DTPP {path.name} loaded to Airport Repository: {updated} airports updated, "
+                 f"chart changes at {len(changes)}")
+
+    async def search_plates(self, icao: str, name: str) -> List[FAAPlate]:
+        """
+        The plates of an airport whose names match every word of a query,
+        best first. Runway numbers match with or without their side and
+        leading zero, and misspelt words match the closest plate words.
+        """
+        airport = await self.find(icao)
+        index = self.plate_search.get(airport.icao.upper())
+        if index is None:
+            return []
+        return index.search(name)
 
     async def create(self, airport: Airport) -> None:
         icao = airport.icao.upper()
         if icao in self.repo.keys():
             raise EntityExistsError(f"{icao} already in repository")
         self.repo[icao] = airport
+        self.spatial.add(float(airport.latitude), float(airport.longitude), airport)
+        self.plate_catalog = self._build_plate_catalog()
 
     async def update(self, airport: Airport):
         try:
             self.repo[airport.icao.lower()] = airport
         except KeyError:
             raise EntityNotFoundError(f"{airport.icao} not found.")
+        self.spatial = self._build_spatial_index()
+        self.plate_catalog = self._build_plate_catalog()
 
     async def find(self, icao: str) -> Optional[Airport]:
         try:
@@ -119,6 +215,21 @@ class AirportRepository(IAirportRepository):
             del self.repo[icao]
         except KeyError:
             raise EntityNotFoundError(f"{icao} not found.")
+        self.spatial = self._build_spatial_index()
+        self.plate_catalog = self._build_plate_catalog()
 
     async def all(self) -> List[Airport]:
-        return list(self.repo.values())
\ No newline at end of file
+        return list(self.repo.values())
+
+    async def near(
+            self,
+            latitude: float,
+            longitude: float,
+            radius_nm: Optional[float] = None,
+            limit: int = 50
+    ) -> List[Airport]:
+        """
+        Return the airports closest to a point, closest first. Without a
+        radius the `limit` closest airports are returned however far they are.
+        """
+        return [airport for _, airport in self.spatial.near(latitude, longitude, radius_nm, limit)]
\ No newline at end of file
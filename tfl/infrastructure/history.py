@@ -0,0 +1,295 @@
+import asyncio
+import logging
+import pathlib
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+from tfl.domain.services.weather import as_utc, parse_adds_time
+
+log = logging.getLogger(__name__)
+
+# Observation time in epoch seconds and length of the encoded record
+ENTRY_HEADER = struct.Struct('<qI')
+SEGMENT_SUFFIX = '.seg'
+
+T = TypeVar("T")
+
+
+class StationHistory:
+    """
+    Observations of one station ordered by time. Times are kept in an array
+    of epoch seconds and the records as encoded bytes, not as models.
+    """
+    __slots__ = ('times', 'records')
+
+    def __init__(self):
+        self.times = array('q')
+        self.records: List[bytes] = []
+
+    def add(self, time: int, record: bytes) -> bool:
+        """
+        Adds an observation and returns whether it was new. A record with the
+        same time replaces the stored one, a correction for example.
+        """
+        if not self.times or time > self.times[-1]:
+            self.times.append(time)
+            self.records.append(record)
+            return True
+        i = bisect_left(self.times, time)
+        if i < len(self.times) and self.times[i] == time:
+            if self.records[i] == record:
+                return False
+            self.records[i] = record
+            return True
+        self.times.insert(i, time)
+        self.records.insert(i, record)
+        return True
+
+    def trim(self, oldest: int, max_entries: int):
+        start = max(bisect_left(self.times, oldest), len(self.times) - max_entries)
+        if start > 0:
+            del self.times[:start]
+            del self.records[:start]
+
+    def between(self, start: int, end: int) -> List[bytes]:
+        return self.records[bisect_left(self.times, start):bisect_right(self.times, end)]
+
+
+class WeatherHistory:
+    """
+    Append-only history of the raw ADDS records of each station over a
+    retention window. Records are stored encoded, and every addition is also
+    appended to an hourly segment file so the history survives a restart.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            encode: Callable[[Dict[str, Any]], bytes],
+            decode: Callable[[bytes], Dict[str, Any]],
+            time_field: str,
+            retention: timedelta = timedelta(hours=48),
+            path: Optional[pathlib.Path] = None,
+            max_per_station: int = 256,
+            max_parsed: int = 4096
+    ):
+        """
+
+        Parameters
+        ----------
+        name
+            Prefix of the segment files
+        encode
+            Encodes a raw record to bytes
+        decode
+            Decodes bytes back to the raw record
+        time_field
+            The record field with the observation or issue time
+        retention
+            How long records are kept
+        path
+            Directory of the segment files. Without one the history is only
+            kept in memory.
+        max_per_station
+            Upper bound on the records kept for one station
+        max_parsed
+            Number of parsed records `parsed_series` keeps for reuse, the
+            least recently requested are dropped first
+        """
+        self.name = name
+        self.encode = encode
+        self.decode = decode
+        self.time_field = time_field
+        self.retention = retention
+        self.path = path
+        self.max_per_station = max_per_station
+        self.max_parsed = max_parsed
+        self._parsed: OrderedDict[bytes, Any] = OrderedDict()
+        self._stations: Dict[str, StationHistory] = {}
+        # Bytes of each segment file already read by load
+        self._offsets: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return sum(len(station.times) for station in self._stations.values())
+
+    def _oldest(self) -> int:
+        return int((datetime.now(timezone.utc) - self.retention).timestamp())
+
+    def _add(self, icao: str, time: int, record: bytes, oldest: int) -> bool:
+        station = self._stations.get(icao)
+        if station is None:
+            station = self._stations[icao] = StationHistory()
+        added = station.add(time, record)
+        if added:
+            station.trim(oldest, self.max_per_station)
+        return added
+
+    async def append(self, records: Iterable[Dict[str, Any]]) -> int:
+        """
+        Adds raw records to the history. Records already stored are skipped.
+        Parameters
+        ----------
+        records
+            The raw ADDS record dictionaries
+        Returns
+        -------
+        int
+            The number of records added
+
+        """
+        oldest = self._oldest()
+        entries = []
+        for r in records:
+            time = int(parse_adds_time(r[self.time_field]).timestamp())
+            if time < oldest:
+                continue
+            encoded = self.encode(r)
+            if self._add(r['station_id'].lower(), time, encoded, oldest):
+                entries.append(ENTRY_HEADER.pack(time, len(encoded)) + encoded)
+        self.prune()
+        if entries and self.path is not None:
+            await asyncio.to_thread(self._write_segment, b''.join(entries))
+        return len(entries)
+
+    def _between(self, station: StationHistory, start: Optional[datetime], end: Optional[datetime]) -> List[bytes]:
+        start_ts = int(as_utc(start).timestamp()) if start is not None else 0
+        end_ts = int(as_utc(end).timestamp()) if end is not None else 2 ** 62
+        return station.between(start_ts, end_ts)[::-1]
+
+    def series(self, icao: str, start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        The records of a station between two times, newest first. Naive
+        times are taken as UTC.
+        """
+        station = self._stations.get(icao.lower())
+        if station is None:
+            return []
+        return [self.decode(record) for record in self._between(station, start, end)]
+
+    async def parsed_series(
+            self,
+            icao: str,
+            parse: Callable[[Dict[str, Any]], T],
+            start: Optional[datetime] = None,
+            end: Optional[datetime] = None
+    ) -> List[T]:
+        """
+        `series` with every record parsed to a model. Records not parsed by
+        an earlier call are decoded and parsed in a thread. The last
+        `max_parsed` models are kept for repeated requests. A history must
+        always be given the same `parse`.
+        """
+        station = self._stations.get(icao.lower())
+        if station is None:
+            return []
+        records = self._between(station, start, end)
+        found = {}
+        missing = []
+        for record in records:
+            model = self._parsed.get(record)
+            if model is None:
+                missing.append(record)
+            else:
+                self._parsed.move_to_end(record)
+                found[record] = model
+        if missing:
+            models = await asyncio.to_thread(lambda: [parse(self.decode(record)) for record in missing])
+            found.update(zip(missing, models))
+            self._parsed.update(zip(missing, models))
+            while len(self._parsed) > self.max_parsed:
+                self._parsed.popitem(last=False)
+        return [found[record] for record in records]
+
+    def prune(self):
+        """
+        Drops the records older than the retention window.
+        """
+        oldest = self._oldest()
+        for icao in list(self._stations):
+            station = self._stations[icao]
+            station.trim(oldest, self.max_per_station)
+            if not station.times:
+                del self._stations[icao]
+
+    def _segments(self) -> List[Tuple[pathlib.Path, datetime]]:
+        if self.path is None or not self.path.exists():
+            return []
+        segments = []
+        for segment in self.path.glob(f"{self.name}-*{SEGMENT_SUFFIX}"):
+            try:
+                hour = datetime.strptime(segment.stem[len(self.name) + 1:], '%Y%m%d%H').replace(tzinfo=timezone.utc)
+            except ValueError:
+                continue
+            segments.append((segment, hour))
+        return sorted(segments, key=lambda s: s[1])
+
+    def _expired(self, hour: datetime) -> bool:
+        return hour + timedelta(hours=1) < datetime.now(timezone.utc) - self.retention
+
+    def _write_segment(self, data: bytes):
+        self.path.mkdir(parents=True, exist_ok=True)
+        hour = datetime.now(timezone.utc).strftime('%Y%m%d%H')
+        with open(self.path / f"{self.name}-{hour}{SEGMENT_SUFFIX}", 'ab') as fh:
+            fh.write(data)
+        for segment, hour in self._segments():
+            if self._expired(hour):
+                segment.unlink(missing_ok=True)
+
+    def _read(self) -> List[Tuple[int, bytes]]:
+        entries = []
+        offsets = {}
+        for segment, hour in self._segments():
+            if self._expired(hour):
+                continue
+            start = self._offsets.get(segment.name, 0)
+            with open(segment, 'rb') as fh:
+                fh.seek(start)
+                data = fh.read()
+            offset = 0
+            while offset + ENTRY_HEADER.size <= len(data):
+                time, size = ENTRY_HEADER.unpack_from(data, offset)
+                if offset + ENTRY_HEADER.size + size > len(data):
+                    log.debug(f"Incomplete record at the end of {segment.name}")
+                    break
+                offset += ENTRY_HEADER.size
+                entries.append((time, data[offset:offset + size]))
+                offset += size
+            offsets[segment.name] = start + offset
+        self._offsets = offsets
+        return entries
+
+    def _apply(self, entries: List[Tuple[int, bytes]]) -> int:
+        oldest = self._oldest()
+        count = 0
+        for time, encoded in entries:
+            if time < oldest:
+                continue
+            icao = self.decode(encoded)['station_id'].lower()
+            count += self._add(icao, time, encoded, oldest)
+        log.info(f"Loaded {count} {self.name} history records")
+        return count
+
+    def load(self) -> int:
+        """
+        Reads the segment files inside the retention window into memory.
+        Records read by an earlier call are skipped, so this can be called
+        repeatedly to follow segments another process appends to. A record
+        cut short by a crash, or still being written, is not read.
+        Returns
+        -------
+        int
+            The number of records loaded
+
+        """
+        return self._apply(self._read())
+
+    async def reload(self) -> int:
+        """
+        `load` with the files read in a thread. The records are added on the
+        event loop so requests never see a station half updated.
+        """
+        return self._apply(await asyncio.to_thread(self._read))
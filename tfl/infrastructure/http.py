@@ -0,0 +1,80 @@
+from typing import Optional
+
+import aiohttp
+import logging
+
+log = logging.getLogger(__name__)
+
+# Seconds an idle connection is kept, longer than the five minute ADDS poll
+# interval so each poll reuses the connection of the previous one
+KEEPALIVE_TIMEOUT = 6 * 60.0
+
+
+class HTTPClient:
+    """
+    Application scoped aiohttp session. All outbound fetches share one
+    connection pool so DNS lookups, TCP and TLS handshakes are reused between
+    polls instead of being paid on every request.
+    """
+
+    def __init__(
+            self,
+            limit: int = 20,
+            limit_per_host: int = 4,
+            keepalive_timeout: float = KEEPALIVE_TIMEOUT,
+            dns_cache_ttl: int = 600,
+            connect_timeout: float = 30.0,
+            read_timeout: float = 120.0
+    ):
+        """
+
+        Parameters
+        ----------
+        limit
+            Total number of simultaneous connections in the pool.
+        limit_per_host
+            Simultaneous connections to a single host.
+        keepalive_timeout
+            Seconds an idle connection is kept open for reuse. It should
+            be longer than the poll intervals of the services sharing the
+            client, or every poll opens a new connection.
+        dns_cache_ttl
+            Seconds resolved addresses are cached.
+        connect_timeout
+            Seconds to wait for a connection to be established.
+        read_timeout
+            Seconds to wait between reads. There is no total timeout as the
+            DTPP and chart supplement downloads are large.
+        """
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.timeout = aiohttp.ClientTimeout(total=None, sock_connect=connect_timeout, sock_read=read_timeout)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """
+        The shared session. It is created lazily so it is always bound to the
+        running event loop.
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=self.dns_cache_ttl,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    async def start(self):
+        log.info("Starting shared HTTP client")
+        return self.session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            log.info("Closing shared HTTP client")
+            await self._session.close()
+        self._session = None
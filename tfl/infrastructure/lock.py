@@ -0,0 +1,56 @@
+import fcntl
+import logging
+import os
+import pathlib
+from typing import IO, Optional
+
+log = logging.getLogger(__name__)
+
+
+class FileLock:
+    """
+    An exclusive, non-blocking lock on a file, held until it is released or
+    the process exits. Workers sharing a data directory use it to pick the
+    one that does work they would otherwise all repeat.
+    """
+
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self._fh: Optional[IO] = None
+
+    @property
+    def held(self) -> bool:
+        return self._fh is not None
+
+    def acquire(self) -> bool:
+        """
+        Takes the lock if no other process holds it.
+        Returns
+        -------
+        bool
+            Whether this process holds the lock
+        """
+        if self._fh is not None:
+            return True
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fh = open(self.path, 'a+')
+        try:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            fh.close()
+            return False
+        # The pid of the holder, for whoever is looking at the data directory
+        fh.seek(0)
+        fh.truncate()
+        fh.write(str(os.getpid()))
+        fh.flush()
+        self._fh = fh
+        log.debug(f"Acquired {self.path}")
+        return True
+
+    def release(self):
+        if self._fh is None:
+            return
+        fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+        self._fh.close()
+        self._fh = None
@@ -1,26 +1,129 @@
-from typing import Optional, Dict
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
 
 
-from tfl.domain.weather import Metar
+from tfl.domain.core import Snapshot
+from tfl.domain.weather import Metar, MetarOrder
 from tfl.domain.exceptions import EntityExistsError, EntityNotFoundError
 from tfl.domain.interfaces.weather import IMetarRepository
+from tfl.domain.services.spatial import SpatialIndex
 from typing import Any
+
+# Worst conditions first, stations without a flight category last
+FLIGHT_RULE_SEVERITY = {'LIFR': 0, 'IFR': 1, 'MVFR': 2, 'VFR': 3}
+
+# Sort key and reverse flag of each index built with a snapshot
+METAR_ORDERS: Dict[MetarOrder, Tuple[Callable[[Metar], Any], bool]] = {
+    MetarOrder.longest: (lambda m: len(m.raw_text), True),
+    MetarOrder.newest: (lambda m: m.time, True),
+    MetarOrder.flight_rule: (
+        lambda m: FLIGHT_RULE_SEVERITY.get(m.flight_rule.code, 4) if m.flight_rule else 4, False
+    ),
+}
+
+
+def build_indexes(items: Dict[str, Metar]) -> Dict[MetarOrder, List[Metar]]:
+    return {
+        order: sorted(items.values(), key=key, reverse=reverse)
+        for order, (key, reverse) in METAR_ORDERS.items()
+    }
+
+
+# Fields of a raw ADDS METAR record kept in the history, in encoded order.
+# These are the fields parse_metar reads.
+METAR_HISTORY_FIELDS = (
+    'station_id', 'raw_text', 'observation_time', 'latitude', 'longitude', 'temp_c', 'dewpoint_c',
+    'wind_dir_degrees', 'wind_speed_kt', 'wind_gust_kt', 'visibility_statute_mi', 'altim_in_hg',
+    'wx_string', 'flight_category', 'sky_condition',
+)
+FIELD_SEPARATOR = '\x1f'
+
+
+def encode_metar_record(m: Dict[str, Any]) -> bytes:
+    """
+    Encodes a raw METAR record as its history fields joined by a unit
+    separator. Sky conditions are written as `COVER:BASE` pairs joined by `|`.
+    """
+    sky = m.get('sky_condition') or []
+    if isinstance(sky, dict):
+        sky = [sky]
+    values = [m.get(field) or '' for field in METAR_HISTORY_FIELDS[:-1]]
+    values.append('|'.join(f"{s['@sky_cover']}:{s.get('@cloud_base_ft_agl') or ''}" for s in sky))
+    return FIELD_SEPARATOR.join(values).encode('utf-8')
+
+
+def decode_metar_record(data: bytes) -> Dict[str, Any]:
+    """
+    Decodes a record written by `encode_metar_record`. Fields that were
+    missing from the original record are left out.
+    """
+    values = data.decode('utf-8').split(FIELD_SEPARATOR)
+    record = {field: value for field, value in zip(METAR_HISTORY_FIELDS[:-1], values) if value}
+    if values[-1]:
+        record['sky_condition'] = []
+        for pair in values[-1].split('|'):
+            cover, _, bases = pair.partition(':')
+            condition = {'@sky_cover': cover}
+            if bases:
+                condition['@cloud_base_ft_agl'] = bases
+            record['sky_condition'].append(condition)
+    return record
+
+
+def build_spatial_index(items: Dict[str, Metar]) -> SpatialIndex[Metar]:
+    return SpatialIndex(
+        (float(metar.location.latitude), float(metar.location.longitude), metar)
+        for metar in items.values() if metar.location is not None
+    )
+
+
 class MetarRepository(IMetarRepository):
 
     def __init__(self):
-        self.repo: Dict[str, Metar] = {}
+        self._snapshot = Snapshot(
+            version=0,
+            built_at=None,
+            items={},
+            indexes=build_indexes({}),
+            spatial=SpatialIndex()
+        )
+
+    @property
+    def repo(self) -> Dict[str, Metar]:
+        return self._snapshot.items
+
+    @property
+    def snapshot(self) -> Snapshot:
+        return self._snapshot
+
+    def publish(self, items: Dict[str, Metar], built_at: Optional[datetime] = None) -> Snapshot:
+        """
+        Replaces the contents of the repository with a fully built set of
+        Metars keyed by lower case station id. The sorted and spatial indexes
+        are rebuilt for the new snapshot. `built_at` defaults to now and is given when
+        restoring a snapshot saved earlier.
+        """
+        self._snapshot = Snapshot(
+            version=self._snapshot.version + 1,
+            built_at=built_at if built_at is not None else datetime.now(timezone.utc),
+            items=items,
+            indexes=build_indexes(items),
+            spatial=build_spatial_index(items)
+        )
+        return self._snapshot
 
     async def create(self, metar: Metar) -> None:
         icao = metar.station_id.lower()
         if icao in self.repo.keys():
             raise EntityExistsError(f"{icao} already in repository")
-        self.repo[icao] = metar
+        # Snapshots are never changed in place, a copy is published
+        self.publish({**self.repo, icao: metar})
 
     async def update(self, metar: Metar):
-        try:
-            self.repo[metar.station_id.lower()] = metar
-        except KeyError:
+        icao = metar.station_id.lower()
+        if icao not in self.repo.keys():
             raise EntityNotFoundError(f"{metar.station_id} not found.")
+        self.publish({**self.repo, icao: metar})
 
     async def find(self, icao: str) -> Optional[Metar]:
         try:
@@ -30,23 +133,84 @@ class MetarRepository(IMetarRepository):
 
     async def delete(self, metar: Metar) -> None:
         icao = metar.station_id.lower()
-        try:
-            del self.repo[icao]
-        except KeyError:
+        if icao not in self.repo.keys():
             raise EntityNotFoundError(f"{icao} not found.")
+        self.publish({key: value for key, value in self.repo.items() if key != icao})
+
+    async def icaos(self) -> list[str]:
+        return list(self.repo.keys())
+
+    async def near(
+            self,
+            latitude: float,
+            longitude: float,
+            radius_nm: float | None = None,
+            limit: int = 50
+    ) -> list[Metar]:
+        """
+        Return the Metars of the stations closest to a point, closest first.
+        Parameters
+        ----------
+        latitude
+            Latitude of the point
+        longitude
+            Longitude of the point
+        radius_nm
+            Only stations within this many nautical miles. Without a radius
+            the `limit` closest stations are returned however far they are.
+        limit
+            Maximum number of Metars returned
+        Returns
+        -------
+        list[Metar]
+        """
+        return [metar for _, metar in self._snapshot.spatial.near(latitude, longitude, radius_nm, limit)]
+
+    async def within(self, south: float, west: float, north: float, east: float) -> list[Metar]:
+        """
+        Return the Metars of the stations inside a bounding box. A box whose
+        west edge is greater than its east edge crosses the antimeridian.
+        """
+        return self._snapshot.spatial.within(south, west, north, east)
 
     async def longest_metars(self, max_number: int) -> list[Metar]:
-        return sorted(self.repo.values(), key=lambda metar: len(metar.raw_text), reverse=True)[:max_number]
+        return self._snapshot.indexes[MetarOrder.longest][:max_number]
 
-    async def all(self, offset: int = 0, limit: int = 50, stations: str | None = None, sorting: tuple[Any, bool] | None = None):
+    async def all(self, offset: int = 0, limit: int = 50, stations: str | None = None, sorting: MetarOrder | tuple[Any, bool] | None = None):
         """
         Return all Metars in the repository, paginated.
+        Parameters
+        ----------
+        offset
+            Number of Metars to skip
+        limit
+            Maximum number of Metars returned
+        stations
+            Optional comma separated station ids. Only those stations are
+            returned, in the order they were requested.
+        sorting
+            Either a MetarOrder, served from the snapshot's sorted index, or a
+            sort key and reverse flag applied before paginating
+        Returns
+        -------
+        list
         """
-        values = sorted(self.repo.values(), key=sorting[0], reverse=sorting[1]) if sorting else self.repo.values()
+        snapshot = self._snapshot
+        items = snapshot.items
+        order = None
+        if isinstance(sorting, str):
+            order = MetarOrder(sorting)
+            sorting = METAR_ORDERS[order]
         if stations:
-            stations = stations.split(',')
-            metars = [metar for metar in values if metar.station_id.lower() in map(str.lower, stations)]
+            # Looked up by key rather than scanning the whole repository
+            requested = dict.fromkeys(s.strip().lower() for s in stations.split(','))
+            metars = [items[icao] for icao in requested if icao in items]
+            if sorting:
+                metars.sort(key=sorting[0], reverse=sorting[1])
+        elif order is not None:
+            metars = snapshot.indexes[order]
+        elif sorting:
+            metars = sorted(items.values(), key=sorting[0], reverse=sorting[1])
         else:
-            metars = list(values)
+            metars = list(items.values())
         return metars[offset:offset + limit]
-    
\ No newline at end of file
@@ -0,0 +1,167 @@
+import logging
+import os
+import pathlib
+import struct
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from tfl.domain.facilities import FAAPlate
+
+log = logging.getLogger(__name__)
+
+PLATE_INDEX_MAGIC = b'TFLP'
+# Bumped when the layout of the index changes
+PLATE_INDEX_FORMAT = 1
+
+# magic, format, cycle, modification time of the metafile in nanoseconds and
+# the number of strings, airports and plates
+HEADER = struct.Struct('<4sHxxIqIII')
+# offset of each string in the string table, plus the end of the last one
+OFFSET = struct.Struct('<I')
+# icao string, first plate, number of plates
+AIRPORT = struct.Struct('<III')
+# code, name and pdf name strings
+PLATE = struct.Struct('<III')
+
+
+def index_path(path: pathlib.Path) -> pathlib.Path:
+    """
+    The index of a DTPP_*.xml metafile, saved next to it.
+    """
+    return path.with_suffix('.idx')
+
+
+def write_plate_index(path: pathlib.Path, cycle: int, plates: Dict[str, List[FAAPlate]], source_modified: int):
+    """
+    Writes the plates of a cycle as a table of unique strings followed by
+    fixed width airport and plate records that refer to them by number.
+    Parameters
+    ----------
+    path
+        The index file
+    cycle
+        The DTPP cycle of the plates
+    plates
+        The plates of each airport keyed by ICAO identifier
+    source_modified
+        Modification time of the metafile the plates were parsed from, so a
+        replaced metafile is parsed again
+    """
+    strings: Dict[str, int] = {}
+
+    def string(value: str) -> int:
+        number = strings.get(value)
+        if number is None:
+            number = strings[value] = len(strings)
+        return number
+
+    airport_records = bytearray()
+    plate_records = bytearray()
+    first = 0
+    for icao, airport_plates in plates.items():
+        airport_records += AIRPORT.pack(string(icao), first, len(airport_plates))
+        for plate in airport_plates:
+            plate_records += PLATE.pack(string(plate.code), string(plate.name), string(plate.pdf_name))
+        first += len(airport_plates)
+
+    encoded = [value.encode('utf-8') for value in strings]
+    offsets = bytearray()
+    position = 0
+    for value in encoded:
+        offsets += OFFSET.pack(position)
+        position += len(value)
+    offsets += OFFSET.pack(position)
+
+    header = HEADER.pack(
+        PLATE_INDEX_MAGIC, PLATE_INDEX_FORMAT, cycle, source_modified, len(encoded), len(plates), first
+    )
+    partial = path.with_name(f"{path.name}.partial")
+    with open(partial, 'wb') as fh:
+        fh.write(header)
+        fh.write(offsets)
+        fh.write(airport_records)
+        fh.write(plate_records)
+        fh.write(b''.join(encoded))
+    os.replace(partial, path)
+
+
+class PlateIndex:
+    """
+    A plate index read into memory. Plates are decoded airport by airport
+    while iterating, each unique string of the index only once.
+    """
+
+    def __init__(self, path: pathlib.Path):
+        with open(path, 'rb') as fh:
+            self._data = fh.read()
+        magic, version, self.cycle, self.source_modified, string_count, airport_count, plate_count = \
+            HEADER.unpack_from(self._data, 0)
+        if magic != PLATE_INDEX_MAGIC or version != PLATE_INDEX_FORMAT:
+            raise ValueError(f"{path} is not a plate index of format {PLATE_INDEX_FORMAT}")
+        self._airport_count = airport_count
+        self._offsets = HEADER.size
+        self._airports = self._offsets + (string_count + 1) * OFFSET.size
+        self._plates = self._airports + airport_count * AIRPORT.size
+        self._strings = self._plates + plate_count * PLATE.size
+        end = self._strings + OFFSET.unpack_from(self._data, self._offsets + string_count * OFFSET.size)[0]
+        if end != len(self._data):
+            raise ValueError(f"{path} is truncated")
+        self._decoded: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return self._airport_count
+
+    def _string(self, number: int) -> str:
+        value = self._decoded.get(number)
+        if value is None:
+            start, end = struct.unpack_from('<II', self._data, self._offsets + number * OFFSET.size)
+            value = self._decoded[number] = self._data[self._strings + start:self._strings + end].decode('utf-8')
+        return value
+
+    def __iter__(self) -> Iterator[Tuple[str, List[FAAPlate]]]:
+        for icao_number, first, count in AIRPORT.iter_unpack(self._data[self._airports:self._plates]):
+            icao = self._string(icao_number)
+            plates = []
+            for code, name, pdf_name in PLATE.iter_unpack(
+                    self._data[self._plates + first * PLATE.size:self._plates + (first + count) * PLATE.size]
+            ):
+                # The values were validated when the metafile was parsed
+                plates.append(FAAPlate.construct(
+                    tpp_cycle=self.cycle,
+                    icao=icao,
+                    code=self._string(code),
+                    name=self._string(name),
+                    pdf_name=self._string(pdf_name)
+                ))
+            yield icao, plates
+
+    def to_dict(self) -> Dict[str, List[FAAPlate]]:
+        return dict(self)
+
+
+def read_plate_index(path: pathlib.Path, source_modified: Optional[int] = None) -> Optional[Dict[str, List[FAAPlate]]]:
+    """
+    Reads all plates of an index.
+    Parameters
+    ----------
+    path
+        The index file
+    source_modified
+        When given, an index built from a metafile with another modification
+        time is ignored
+    Returns
+    -------
+    Optional[Dict[str, List[FAAPlate]]]
+        None when there is no usable index
+
+    """
+    try:
+        index = PlateIndex(path)
+        if source_modified is not None and index.source_modified != source_modified:
+            log.info(f"Plate index {path.name} is older than its metafile")
+            return
+        return index.to_dict()
+    except FileNotFoundError:
+        return
+    except (ValueError, struct.error) as e:
+        log.warning(f"Ignoring plate index {path.name}: {e}")
+        return
@@ -0,0 +1,114 @@
+import hashlib
+import logging
+import os
+import pathlib
+import pickle
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, NamedTuple, Optional, Type
+
+from pydantic import BaseModel
+
+from tfl.domain.core import Snapshot
+
+log = logging.getLogger(__name__)
+
+# Bumped when the layout of the saved file changes. Changes to the models
+# of the items are picked up from their schema, see `snapshot_format`.
+SNAPSHOT_FORMAT = 1
+
+
+def snapshot_format(model: Type[BaseModel]) -> str:
+    """
+    The format key of snapshots of a model: the file layout and a hash of the
+    model's schema, including its nested models. Pickled items are restored
+    without validation, so a snapshot saved before a field was added, removed
+    or retyped must not be loaded.
+    """
+    schema = model.schema_json(sort_keys=True).encode('utf-8')
+    return f"{SNAPSHOT_FORMAT}:{hashlib.sha256(schema).hexdigest()}"
+
+
+class SavedSnapshot(NamedTuple):
+    built_at: datetime
+    items: Dict[str, Any]
+
+
+class SnapshotFile:
+    """
+    The last published snapshot of a weather repository saved to a local file
+    so a restarted process can serve it before its first poll completes.
+    The items are pickled in one dump, which keeps the value objects shared
+    between them the same instance when loaded.
+    """
+
+    def __init__(self, path: pathlib.Path, model: Type[BaseModel], max_age: timedelta = timedelta(hours=2)):
+        """
+
+        Parameters
+        ----------
+        path
+            The snapshot file
+        model
+            The model of the items, snapshots of another version of it are
+            not loaded
+        max_age
+            Snapshots built longer ago than this are not loaded
+        """
+        self.path = path
+        self.format = snapshot_format(model)
+        self.max_age = max_age
+
+    def modified(self) -> Optional[int]:
+        """
+        The modification time of the file in nanoseconds, None when there is
+        no file.
+        """
+        try:
+            return self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+
+    def save(self, snapshot: Snapshot):
+        """
+        Writes the items of a snapshot. The file is written next to the
+        existing one and renamed over it so a reader never sees a partial file.
+        """
+        data = pickle.dumps(
+            {'format': self.format, 'built_at': snapshot.built_at, 'items': snapshot.items},
+            protocol=pickle.HIGHEST_PROTOCOL
+        )
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        partial = self.path.with_name(f"{self.path.name}.partial")
+        with open(partial, 'wb') as fh:
+            fh.write(data)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(partial, self.path)
+        log.debug(f"Saved snapshot {snapshot.version} to {self.path} ({len(data)} bytes)")
+
+    def load(self) -> Optional[SavedSnapshot]:
+        """
+        Reads the saved snapshot.
+        Returns
+        -------
+        Optional[SavedSnapshot]
+            None when there is no file, it was saved by code with another file
+            layout or model schema or it is older than `max_age`.
+
+        """
+        try:
+            with open(self.path, 'rb') as fh:
+                data = pickle.load(fh)
+        except FileNotFoundError:
+            return
+        except Exception:
+            log.exception(f"Could not load snapshot {self.path}")
+            return
+        if not isinstance(data, dict) or data.get('format') != self.format:
+            log.warning(f"Ignoring snapshot {self.path} of an unknown format")
+            return
+        built_at = data['built_at']
+        if built_at is None or datetime.now(timezone.utc) - built_at > self.max_age:
+            log.info(f"Ignoring snapshot {self.path} built at {built_at}")
+            return
+        return SavedSnapshot(built_at=built_at, items=data['items'])
@@ -1,30 +1,84 @@
-from typing import Dict, Optional
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
 
-from tfl.domain.weather import TAF
+from tfl.domain.core import Snapshot
+from tfl.domain.weather import TAF, TAFOrder
 from tfl.domain.exceptions import EntityNotFoundError, EntityExistsError
 from tfl.domain.interfaces.weather import ITAFRepository
+import json
 import logging
+import zlib
 from typing import Any
 
 log = logging.getLogger(__name__)
 
+# Sort key and reverse flag of each index built with a snapshot
+TAF_ORDERS: Dict[TAFOrder, Tuple[Callable[[TAF], Any], bool]] = {
+    TAFOrder.longest: (lambda t: len(t.raw_text), True),
+    TAFOrder.newest: (lambda t: t.issue_time, True),
+}
+
+
+def build_indexes(items: Dict[str, TAF]) -> Dict[TAFOrder, List[TAF]]:
+    return {
+        order: sorted(items.values(), key=key, reverse=reverse)
+        for order, (key, reverse) in TAF_ORDERS.items()
+    }
+
+
+def encode_taf_record(t: Dict[str, Any]) -> bytes:
+    """
+    Encodes a raw TAF record for the history. Forecast groups are nested so
+    the record is stored as compressed JSON.
+    """
+    return zlib.compress(json.dumps(t, separators=(',', ':')).encode('utf-8'))
+
+
+def decode_taf_record(data: bytes) -> Dict[str, Any]:
+    return json.loads(zlib.decompress(data))
+
+
 class TAFRepository(ITAFRepository):
 
     def __init__(self):
-        self.repo: Dict[str, TAF] = {}
+        self._snapshot = Snapshot(version=0, built_at=None, items={}, indexes=build_indexes({}))
+
+    @property
+    def repo(self) -> Dict[str, TAF]:
+        return self._snapshot.items
+
+    @property
+    def snapshot(self) -> Snapshot:
+        return self._snapshot
+
+    def publish(self, items: Dict[str, TAF], built_at: Optional[datetime] = None) -> Snapshot:
+        """
+        Replaces the contents of the repository with a fully built set of
+        TAFs keyed by lower case station id. The sorted indexes are rebuilt
+        for the new snapshot. `built_at` defaults to now and is given when
+        restoring a snapshot saved earlier.
+        """
+        self._snapshot = Snapshot(
+            version=self._snapshot.version + 1,
+            built_at=built_at if built_at is not None else datetime.now(timezone.utc),
+            items=items,
+            indexes=build_indexes(items)
+        )
+        return self._snapshot
 
     async def create(self, taf: TAF) -> None:
         icao = taf.station_id.lower()
         if icao in self.repo.keys():
             raise EntityExistsError(f"{icao} already in repository")
-        self.repo[icao] = taf
+        # Snapshots are never changed in place, a copy is published
+        self.publish({**self.repo, icao: taf})
 
     async def update(self, taf: TAF) -> TAF:
-        try:
-            self.repo[taf.station_id.lower()] = taf
-            return taf
-        except KeyError:
+        icao = taf.station_id.lower()
+        if icao not in self.repo.keys():
             raise EntityNotFoundError(f"{taf.station_id} not found.")
+        self.publish({**self.repo, icao: taf})
+        return taf
 
     async def find(self, icao: str) -> Optional[TAF]:
         try:
@@ -34,20 +88,46 @@ class TAFRepository(ITAFRepository):
 
     async def delete(self, taf: TAF) -> None:
         icao = taf.station_id.lower()
-        try:
-            del self.repo[icao]
-        except KeyError:
+        if icao not in self.repo.keys():
             raise EntityNotFoundError(f"{icao} not found.")
+        self.publish({key: value for key, value in self.repo.items() if key != icao})
 
 
-    async def all(self, offset: int = 0, limit: int = 50, stations: str | None = None, sorting: tuple[Any, bool] | None = None):
+    async def all(self, offset: int = 0, limit: int = 50, stations: str | None = None, sorting: TAFOrder | tuple[Any, bool] | None = None):
         """
-        Return all Metars in the repository, paginated.
+        Return all TAFs in the repository, paginated.
+        Parameters
+        ----------
+        offset
+            Number of TAFs to skip
+        limit
+            Maximum number of TAFs returned
+        stations
+            Optional comma separated station ids. Only those stations are
+            returned, in the order they were requested.
+        sorting
+            Either a TAFOrder, served from the snapshot's sorted index, or a
+            sort key and reverse flag applied before paginating
+        Returns
+        -------
+        list
         """
-        values = sorted(self.repo.values(), key=sorting[0], reverse=sorting[1]) if sorting else self.repo.values()
+        snapshot = self._snapshot
+        items = snapshot.items
+        order = None
+        if isinstance(sorting, str):
+            order = TAFOrder(sorting)
+            sorting = TAF_ORDERS[order]
         if stations:
-            stations = stations.split(',')
-            tafs = [taf for taf in values if taf.station_id.lower() in map(str.lower, stations)]
+            # Looked up by key rather than scanning the whole repository
+            requested = dict.fromkeys(s.strip().lower() for s in stations.split(','))
+            tafs = [items[icao] for icao in requested if icao in items]
+            if sorting:
+                tafs.sort(key=sorting[0], reverse=sorting[1])
+        elif order is not None:
+            tafs = snapshot.indexes[order]
+        elif sorting:
+            tafs = sorted(items.values(), key=sorting[0], reverse=sorting[1])
         else:
-            tafs = list(values)
+            tafs = list(items.values())
         return tafs[offset:offset + limit]
\ No newline at end of file
@@ -2,28 +2,60 @@ from tfl.application_services.auth import AuthService
 from tfl.application_services.dtpp import DTPPService
 from tfl.application_services.member import MemberService
 from tfl.application_services.metar import MetarService
+from tfl.application_services.responses import ResponseCache
 from tfl.application_services.taf import TafService
 from tfl.application_services.dcs import ChartSupplementService
 from tfl.infrastructure.airport import AirportRepository
+from tfl.infrastructure.history import WeatherHistory
+from tfl.infrastructure.http import HTTPClient
+from tfl.infrastructure.lock import FileLock
+from tfl.infrastructure.snapshot_file import SnapshotFile
 from tfl.infrastructure.member import InMemoryMemberRepository
-from tfl.infrastructure.metar import MetarRepository
-from tfl.infrastructure.taf import TAFRepository
+from tfl.infrastructure.metar import MetarRepository, decode_metar_record, encode_metar_record
+from tfl.infrastructure.taf import TAFRepository, decode_taf_record, encode_taf_record
+from tfl.domain.weather import Metar, TAF
 from passlib.context import CryptContext
-from .configuration import DATA_DIR
+from .configuration import (
+    DATA_DIR, INGEST_LOCK_FILE, WEATHER_HISTORY_DIR, WEATHER_HISTORY_HOURS, WEATHER_PARSE_WORKERS,
+    WEATHER_SNAPSHOT_DIR
+)
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
 import pathlib
 import logging
 
 log = logging.getLogger(__name__)
 
 password_handler = CryptContext(schemes=["bcrypt"], deprecated="auto")
+http_client = HTTPClient()
+weather_executor = ProcessPoolExecutor(WEATHER_PARSE_WORKERS) if WEATHER_PARSE_WORKERS > 0 else None
 taf_repository = TAFRepository()
 metar_repository = MetarRepository()
 member_repository = InMemoryMemberRepository()
-metar_service = MetarService(metar_repository)
-taf_service = TafService(taf_repository)
+metar_responses = ResponseCache(Metar, executor=weather_executor)
+taf_responses = ResponseCache(TAF, executor=weather_executor)
+metar_history = taf_history = None
+if WEATHER_HISTORY_HOURS > 0:
+    metar_history = WeatherHistory(
+        'metars', encode_metar_record, decode_metar_record, 'observation_time',
+        retention=timedelta(hours=WEATHER_HISTORY_HOURS), path=WEATHER_HISTORY_DIR
+    )
+    taf_history = WeatherHistory(
+        'tafs', encode_taf_record, decode_taf_record, 'issue_time',
+        retention=timedelta(hours=WEATHER_HISTORY_HOURS), path=WEATHER_HISTORY_DIR
+    )
+metar_service = MetarService(
+    metar_repository, http=http_client, executor=weather_executor, responses=metar_responses, history=metar_history,
+    snapshot_file=SnapshotFile(WEATHER_SNAPSHOT_DIR / 'metars.snapshot', Metar)
+)
+taf_service = TafService(
+    taf_repository, http=http_client, executor=weather_executor, responses=taf_responses, history=taf_history,
+    snapshot_file=SnapshotFile(WEATHER_SNAPSHOT_DIR / 'tafs.snapshot', TAF)
+)
+ingest_lock = FileLock(pathlib.Path(INGEST_LOCK_FILE)) if INGEST_LOCK_FILE else None
 member_service = MemberService(member_repository, password_handler)
 auth_service = AuthService(member_repository, password_handler)
 airport_repository = AirportRepository()
-dtpp_service = DTPPService(DATA_DIR)
+dtpp_service = DTPPService(DATA_DIR, http=http_client)
 dcs_path = (pathlib.Path(__file__).parents[1] / 'data').resolve()
 dcs_service = ChartSupplementService(dcs_path)